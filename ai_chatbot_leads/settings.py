@@ -28,6 +28,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'chat.middleware.ServerTimingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -37,6 +38,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'chat.middleware.RateLimitHeadersMiddleware',
 ]
 
 ROOT_URLCONF = 'ai_chatbot_leads.urls'
@@ -145,7 +147,14 @@ REST_FRAMEWORK = {
         'rest_framework.renderers.JSONRenderer',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
-    'PAGE_SIZE': 20
+    'PAGE_SIZE': 20,
+    'DEFAULT_THROTTLE_CLASSES': [
+        'chat.throttling.IPThrottle',
+        'chat.throttling.SessionThrottle',
+    ],
+    # Reverse proxies in front of the app. The per-IP limit trusts only that many X-Forwarded-For
+    # entries; with 0 it keys on REMOTE_ADDR, so clients cannot pick their own IP with the header
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', '0')),
 }
 
 # CORS settings
@@ -155,12 +164,150 @@ CORS_ALLOW_ALL_ORIGINS = True  # Only for development
 OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
 FAISS_PATH = os.environ.get('FAISS_PATH', str(BASE_DIR / 'faiss_index'))
 
-# Cache settings for rate limiting
+# LLM model routing
+LLM_PRIMARY_MODEL = os.environ.get('LLM_PRIMARY_MODEL', 'gpt-3.5-turbo')
+LLM_FAST_MODEL = os.environ.get('LLM_FAST_MODEL', 'gpt-4o-mini')
+# Average recent latency (seconds) above which calls fall back to LLM_FAST_MODEL
+LLM_LATENCY_THRESHOLD = float(os.environ.get('LLM_LATENCY_THRESHOLD', '3.0'))
+# Load testing only: when set, LLM calls are answered by a local stub after this many seconds
+LLM_STUB_LATENCY = float(os.environ['LLM_STUB_LATENCY']) if os.environ.get('LLM_STUB_LATENCY') else None
+# Reproducible perf runs: 'record' appends every LLM call (content, usage, latency) to LLM_CASSETTE,
+# 'replay' answers from it instead of OpenAI. {pid} gives each worker its own file; replay reads them all.
+# LLM_CASSETTE_LATENCY_SCALE=1 makes replay sleep for the recorded latencies (0 answers at once)
+LLM_CASSETTE_MODE = os.environ.get('LLM_CASSETTE_MODE', '')
+LLM_CASSETTE = os.environ.get('LLM_CASSETTE', str(BASE_DIR / 'cassettes' / 'llm-{pid}.jsonl.gz'))
+LLM_CASSETTE_LATENCY_SCALE = float(os.environ.get('LLM_CASSETTE_LATENCY_SCALE', '0'))
+
+# Two-tier cache: each worker keeps a small LRU (L1, MAX_ENTRIES, L1_TIMEOUT seconds) in front of
+# the shared tier (L2, the cache alias in LOCATION). Writes go through to L2, so workers see each
+# other's entries once their short L1 copy expires. The shared tier is file-backed by default, which
+# covers the workers of one host; set SHARED_CACHE_BACKEND/SHARED_CACHE_LOCATION to a networked store
+# (e.g. django.core.cache.backends.redis.RedisCache, redis://host:6379/0) to share it across hosts.
+SHARED_CACHE_BACKEND = os.environ.get('SHARED_CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache')
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
-    }
+        'BACKEND': 'chat.cache.TieredCache',
+        'LOCATION': 'shared',
+        'OPTIONS': {'MAX_ENTRIES': 1000, 'L1_TIMEOUT': 5},
+    },
+    'shared': {
+        'BACKEND': SHARED_CACHE_BACKEND,
+        'LOCATION': os.environ.get('SHARED_CACHE_LOCATION', str(BASE_DIR / '.cache')),
+        'OPTIONS': {'MAX_ENTRIES': 10000} if SHARED_CACHE_BACKEND.endswith('FileBasedCache') else {},
+    },
+    # Rate-limit buckets need an atomic add(), which the file backend does not have. A networked shared
+    # tier (Redis, Memcached) is used for them directly; otherwise each worker process keeps its own
+    # buckets in memory, so with N workers a client can get up to N times the configured limits
+    'ratelimit': (
+        {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'ratelimit',
+            'OPTIONS': {'MAX_ENTRIES': 100000},
+        }
+        if SHARED_CACHE_BACKEND.endswith('FileBasedCache') else
+        {
+            'BACKEND': SHARED_CACHE_BACKEND,
+            'LOCATION': os.environ.get('SHARED_CACHE_LOCATION', str(BASE_DIR / '.cache')),
+            'KEY_PREFIX': 'ratelimit',
+        }
+    ),
+}
+
+# Chat request deadline (seconds). Every stage of a chat turn takes its timeout from this budget.
+CHAT_REQUEST_SLO = float(os.environ.get('CHAT_REQUEST_SLO', '8.0'))
+CHAT_LLM_TIMEOUT = float(os.environ.get('CHAT_LLM_TIMEOUT', '5.0'))  # cap for a single OpenAI call
+CHAT_MIN_LLM_TIMEOUT = 0.5  # don't start an OpenAI call with less than this left
+CHAT_DB_RESERVE = 0.5  # budget held back for the final DB writes
+CHAT_DB_WRITE_TIMEOUT = 5.0  # PostgreSQL statement_timeout floor for those writes, however late the request is
+CHAT_MIN_QUALIFY_BUDGET = 2.0  # skip lead qualification when less than this is left
+CHAT_RETRIEVAL_ENABLED = os.environ.get('CHAT_RETRIEVAL_ENABLED', 'False').lower() == 'true'
+CHAT_MIN_RETRIEVAL_BUDGET = 1.0
+
+# Per-stage timings in a Server-Timing response header (visible in browser devtools),
+# and optionally one structured JSON log line per request on the 'chat.timing' logger
+SERVER_TIMING_ENABLED = os.environ.get('SERVER_TIMING_ENABLED', 'True').lower() == 'true'
+SERVER_TIMING_LOG = os.environ.get('SERVER_TIMING_LOG', 'False').lower() == 'true'
+
+# Staff-only profiling: /api/debug/profile/ and /api/debug/memory/, and `kill -USR2 <worker pid>`,
+# which samples for PROFILE_SIGNAL_SECONDS and writes the results to PROFILE_DIR.
+# An in-request profile holds its worker for the whole sample, so keep it well under GUNICORN_TIMEOUT (30s)
+PROFILE_MAX_SECONDS = 10
+PROFILE_SIGNAL_SECONDS = int(os.environ.get('PROFILE_SIGNAL_SECONDS', '30'))
+PROFILE_DIR = os.environ.get('PROFILE_DIR', str(BASE_DIR / 'profiles'))
+
+# Keep the rendered frontend (and its gzip/brotli bodies) in memory; off under DEBUG so template edits show up
+FRONTEND_CACHE = os.environ.get('FRONTEND_CACHE', str(not DEBUG)).lower() == 'true'
+
+# Assistant replies at least this long are stored zlib-compressed (0 stores them as plain text).
+# Fixed replies (quick responses, fallbacks) are always stored as a reference to one CannedResponse row
+MESSAGE_COMPRESS_MIN_LENGTH = int(os.environ.get('MESSAGE_COMPRESS_MIN_LENGTH', '512'))
+
+# Session history pages (keyset pagination on /api/session/<id>/history/)
+HISTORY_PAGE_SIZE = 50
+HISTORY_MAX_PAGE_SIZE = 200
+
+# In-process metrics (/api/metrics/): disabled unless a bearer token is configured
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# Batch chat (/api/chat/batch/) for QA and evaluation jobs: disabled unless a bearer token is configured
+CHAT_BATCH_TOKEN = os.environ.get('CHAT_BATCH_TOKEN')
+CHAT_BATCH_MAX_ITEMS = 500
+# Time budget for a whole batch. start.sh runs one sync worker, and a batch holds it, so the default
+# stays well under CHAT_REQUEST_SLO to bound how long chat requests queue behind it. Raise it only
+# with more than one worker (and always below GUNICORN_TIMEOUT, 30s in start.sh).
+# Items that would start after it are returned as 'skipped', and finished sessions are already saved
+CHAT_BATCH_DEADLINE = float(os.environ.get('CHAT_BATCH_DEADLINE', '4.0'))
+CHAT_BATCH_CONCURRENCY = int(os.environ.get('CHAT_BATCH_CONCURRENCY', '4'))  # default when a batch doesn't ask
+CHAT_BATCH_MAX_CONCURRENCY = int(os.environ.get('CHAT_BATCH_MAX_CONCURRENCY', '16'))
+
+# Streaming exports (/api/export/...): disabled over HTTP unless a bearer token is configured
+EXPORT_TOKEN = os.environ.get('EXPORT_TOKEN')
+EXPORT_CHUNK_SIZE = 2000
+# Seconds a row must be old before an export hands out a cursor past it, so writes still committing are not skipped
+EXPORT_LAG = float(os.environ.get('EXPORT_LAG', '60'))
+
+# Analytics (/api/stats/): served from the daily rollups that the refresh_rollups command maintains
+STATS_DEFAULT_DAYS = 30
+STATS_MAX_DAYS = 366
+
+# Retention for prune_sessions: sessions with leads are always kept
+SESSION_RETENTION_DAYS = int(os.environ.get('SESSION_RETENTION_DAYS', '90'))
+SESSION_SHORT_RETENTION_DAYS = 7  # drive-by sessions (SESSION_SHORT_MAX_MESSAGES or fewer messages)
+SESSION_SHORT_MAX_MESSAGES = 2
+SESSION_ARCHIVE_DIR = os.environ.get('SESSION_ARCHIVE_DIR', str(BASE_DIR / 'archive'))
+
+# Lead qualification: 'queue' hands it to the run_lead_worker command, 'inline' runs it in the request
+LEAD_QUALIFICATION_MODE = os.environ.get('LEAD_QUALIFICATION_MODE', 'queue')
+LEAD_WORKER_CONCURRENCY = int(os.environ.get('LEAD_WORKER_CONCURRENCY', '2'))
+LEAD_JOB_MAX_ATTEMPTS = 3
+LEAD_JOB_STALE_AFTER = 300  # seconds before a running job from a dead worker is retried
+
+# Lead upserts: how a repeat sighting's interest score merges with the stored one ('max' or 'decay')
+LEAD_SCORE_MERGE = os.environ.get('LEAD_SCORE_MERGE', 'max')
+LEAD_SCORE_HALF_LIFE_DAYS = 30
+LEAD_NOTES_MAX_LENGTH = 4000
+
+# Per-session qualification state: evidence snippets kept in the summary sent with each new message
+LEAD_STATE_MAX_EVIDENCE = 5
+
+# Token-bucket rate limits: capacity is the burst size, refill_rate is tokens per second.
+# Per-IP buckets key on the client address DRF derives with REST_FRAMEWORK['NUM_PROXIES']: behind a
+# proxy (Render, Railway, nginx) set NUM_PROXIES=1, or every visitor shares the proxy's bucket.
+# `manage.py bench_rate_limiter` measures what a check costs on the configured cache
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'True').lower() == 'true'
+# Buckets must not be served from a worker's L1 copy and need an atomic add(); see CACHES['ratelimit']
+RATE_LIMIT_CACHE = 'ratelimit'
+RATE_LIMITS = {
+    # Endpoints that call OpenAI
+    'llm': {
+        'ip': {'capacity': 20, 'refill_rate': 0.5},
+        'session': {'capacity': 10, 'refill_rate': 0.2},
+    },
+    # Cheap endpoints (health, history, leads, frontend)
+    'default': {
+        'ip': {'capacity': 120, 'refill_rate': 5.0},
+        'session': {'capacity': 60, 'refill_rate': 2.0},
+    },
 }
 
 # Logging
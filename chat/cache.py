@@ -0,0 +1,122 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from django.core.cache import caches
+from django.core.cache.backends.base import BaseCache, DEFAULT_TIMEOUT
+
+from .services.metrics import metrics
+
+
+_MISSING = object()
+
+
+class TieredCache(BaseCache):
+    """
+    Django cache backend: a small in-process LRU (L1) in front of a shared cache (L2).
+    
+    Reads try L1, then L2, copying L2 hits into L1. Writes go through to L2 first.
+    L1 entries live at most L1_TIMEOUT seconds, which bounds how long a worker can
+    serve a value another worker has since changed or deleted.
+    
+    Settings:
+        LOCATION: Alias of the shared cache in CACHES
+        OPTIONS['MAX_ENTRIES']: L1 size per process
+        OPTIONS['L1_TIMEOUT']: Seconds an L1 copy is trusted
+    """
+    
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.l2_alias = location or 'shared'
+        self.l1_timeout = float(options.get('L1_TIMEOUT', 5))
+        # key -> (monotonic expiry, pickled value); pickled like LocMemCache so callers can't mutate entries
+        self._l1 = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @property
+    def l2(self):
+        return caches[self.l2_alias]
+    
+    def _l1_get(self, key):
+        with self._lock:
+            entry = self._l1.get(key)
+            if entry is None:
+                return _MISSING
+            expires, pickled = entry
+            if expires <= time.monotonic():
+                del self._l1[key]
+                return _MISSING
+            self._l1.move_to_end(key)
+        return pickle.loads(pickled)
+    
+    def _l1_set(self, key, value, timeout):
+        ttl = self.l1_timeout if timeout is None else min(self.l1_timeout, timeout)
+        if ttl <= 0:
+            self._l1_delete(key)
+            return
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._l1[key] = (time.monotonic() + ttl, pickled)
+            self._l1.move_to_end(key)
+            while len(self._l1) > self._max_entries:
+                self._l1.popitem(last=False)
+    
+    def _l1_delete(self, key):
+        with self._lock:
+            self._l1.pop(key, None)
+    
+    def _timeout(self, timeout):
+        """Relative timeout in seconds (None for forever), as passed to set()."""
+        return self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+    
+    def get(self, key, default=None, version=None):
+        l1_key = self.make_and_validate_key(key, version=version)
+        value = self._l1_get(l1_key)
+        if value is not _MISSING:
+            metrics.increment('cache.hit', tier='l1')
+            return value
+        
+        value = self.l2.get(key, _MISSING, version=version)
+        if value is _MISSING:
+            metrics.increment('cache.miss')
+            return default
+        metrics.increment('cache.hit', tier='l2')
+        # The L2 entry's remaining lifetime is unknown, so the L1 copy gets the short TTL
+        self._l1_set(l1_key, value, None)
+        return value
+    
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        l1_key = self.make_and_validate_key(key, version=version)
+        self.l2.set(key, value, timeout, version=version)
+        self._l1_set(l1_key, value, self._timeout(timeout))
+    
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        l1_key = self.make_and_validate_key(key, version=version)
+        # Only L2 can decide, so add() stays atomic wherever the shared backend's is
+        if not self.l2.add(key, value, timeout, version=version):
+            return False
+        self._l1_set(l1_key, value, self._timeout(timeout))
+        return True
+    
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._l1_delete(self.make_and_validate_key(key, version=version))
+        return self.l2.touch(key, timeout, version=version)
+    
+    def delete(self, key, version=None):
+        self._l1_delete(self.make_and_validate_key(key, version=version))
+        return self.l2.delete(key, version=version)
+    
+    def has_key(self, key, version=None):
+        if self._l1_get(self.make_and_validate_key(key, version=version)) is not _MISSING:
+            return True
+        return self.l2.has_key(key, version=version)
+    
+    def incr(self, key, delta=1, version=None):
+        self._l1_delete(self.make_and_validate_key(key, version=version))
+        return self.l2.incr(key, delta, version=version)
+    
+    def clear(self):
+        with self._lock:
+            self._l1.clear()
+        self.l2.clear()
@@ -0,0 +1,68 @@
+from datetime import datetime, time
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+
+
+def _parse_score(params, name):
+    value = params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        raise ValidationError({name: 'Must be a number between 0 and 1.'})
+
+
+def _parse_when(params, name, end_of_day=False):
+    """Accept an ISO datetime or a plain date (start or end of that day)."""
+    value = params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        # Dates first: fromisoformat would otherwise read a bare date as midnight
+        day = parse_date(value)
+        if day is not None:
+            parsed = datetime.combine(day, time.max if end_of_day else time.min)
+        else:
+            parsed = parse_datetime(value)
+            if parsed is None:
+                raise ValueError(value)
+    except ValueError:
+        raise ValidationError({name: 'Must be an ISO 8601 date or datetime.'})
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def filter_leads(queryset, params):
+    """
+    Apply the /api/leads/ query filters.
+    
+    Supported parameters: min_score, max_score, created_after, created_before
+    (ISO date or datetime, inclusive) and has_email (true/false).
+    
+    Raises:
+        ValidationError: If a parameter does not parse (rendered as a 400)
+    """
+    min_score = _parse_score(params, 'min_score')
+    if min_score is not None:
+        queryset = queryset.filter(interest_score__gte=min_score)
+    max_score = _parse_score(params, 'max_score')
+    if max_score is not None:
+        queryset = queryset.filter(interest_score__lte=max_score)
+    
+    created_after = _parse_when(params, 'created_after')
+    if created_after is not None:
+        queryset = queryset.filter(created_at__gte=created_after)
+    created_before = _parse_when(params, 'created_before', end_of_day=True)
+    if created_before is not None:
+        queryset = queryset.filter(created_at__lte=created_before)
+    
+    has_email = params.get('has_email')
+    if has_email not in (None, ''):
+        if has_email.lower() not in ('true', 'false', '1', '0'):
+            raise ValidationError({'has_email': 'Must be true or false.'})
+        queryset = queryset.filter(email__isnull=has_email.lower() not in ('true', '1'))
+    
+    return queryset
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from chat.models import Session
+from chat.services.conversation import conversation_store
+
+
+class Command(BaseCommand):
+    help = 'Recompute message_count, last_message_at, has_lead and max_interest_score for existing sessions'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Sessions recounted per transaction',
+        )
+        parser.add_argument(
+            '--only-empty',
+            action='store_true',
+            help='Only recount sessions whose message_count is still 0 (e.g. rows written before the counters existed)',
+        )
+    
+    def handle(self, *args, **options):
+        """Walk sessions in id order, recounting one bounded batch per transaction."""
+        batch_size = max(options['batch_size'], 1)
+        sessions = Session.objects.order_by('id')
+        if options['only_empty']:
+            sessions = sessions.filter(message_count=0)
+        total = 0
+        last_id = None
+        
+        while True:
+            batch = sessions if last_id is None else sessions.filter(id__gt=last_id)
+            with transaction.atomic():
+                # Lock first: turns on these sessions wait, and the recount (a later
+                # statement) sees every message committed before the lock was taken
+                ids = list(batch.select_for_update().values_list('id', flat=True)[:batch_size])
+                if not ids:
+                    break
+                last_id = ids[-1]
+                total += conversation_store.recount_sessions(ids)
+            self.stdout.write(f"Up to session {last_id}: {total} sessions recounted")
+        
+        self.stdout.write(self.style.SUCCESS(f"Recounted {total} sessions"))
@@ -0,0 +1,339 @@
+import http.client
+import json
+import random
+import statistics
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from chat.models import Session
+from chat.services.llm_cassette import RecordingClient, ReplayClient
+from chat.services.llm_client import get_llm_client
+from chat.services.llm_stub import StubOpenAI
+
+
+TURN_KINDS = ('quick', 'cached', 'llm', 'lead')
+
+# Answered from LLMClient's quick-response table, no LLM call
+QUICK_PROMPTS = ['hi', 'pricing', 'how much does it cost?', 'contact']
+# Must not contain a quick-response keyword (note 'hi' matches inside words), so each one reaches the LLM
+LLM_PROMPTS = [
+    "Do you work on OCR for scanned invoices? ref {n}",
+    "Can you explain vector search over our docs? ref {n}",
+    "Could you summarise our support tickets every day? ref {n}",
+    "Is retrieval over PDFs accurate enough for legal docs? ref {n}",
+]
+# Contact details plus intent, so the turn also goes through lead qualification
+LEAD_PROMPTS = [
+    "I'm Dana Lee, dana{n}@example.com - please send me a quote for a custom model",
+    "Sam here (sam{n}@example.com), we'd like to hire you for an automation",
+]
+
+
+def _percentile(values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def _summary_ms(latencies):
+    values = sorted(latencies)
+    if not values:
+        return {'count': 0}
+    return {
+        'count': len(values),
+        'mean': round(statistics.mean(values) * 1000, 2),
+        'p50': round(_percentile(values, 50) * 1000, 2),
+        'p95': round(_percentile(values, 95) * 1000, 2),
+        'p99': round(_percentile(values, 99) * 1000, 2),
+    }
+
+
+class InProcessTarget:
+    """Sends turns through Django's test client in this process, counting DB queries."""
+    
+    name = 'in-process'
+    
+    def __init__(self):
+        self._local = threading.local()
+    
+    def post(self, body):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = Client()
+        with CaptureQueriesContext(connection) as captured:
+            response = client.post('/api/chat/', data=body, content_type='application/json')
+        queries = sum(1 for q in captured.captured_queries if q['sql'].split(None, 1)[0].upper() not in ('BEGIN', 'COMMIT', 'SAVEPOINT', 'RELEASE'))
+        return response.status_code, response.json() if response.status_code == 200 else None, queries
+    
+    def close(self):
+        # Worker threads get their own DB connection; the caller's stays open
+        if threading.current_thread() is not threading.main_thread():
+            connection.close()
+
+
+class HTTPTarget:
+    """Sends turns to a running server over keep-alive HTTP connections, one per thread."""
+    
+    def __init__(self, url):
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https') or not parts.netloc:
+            raise CommandError(f"Invalid --target URL: {url}")
+        self.name = url
+        self.scheme = parts.scheme
+        self.netloc = parts.netloc
+        self.path = parts.path.rstrip('/') + '/api/chat/'
+        self._local = threading.local()
+    
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            factory = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+            conn = self._local.conn = factory(self.netloc, timeout=60)
+        return conn
+    
+    def post(self, body):
+        payload = json.dumps(body).encode('utf-8')
+        try:
+            conn = self._connection()
+            conn.request('POST', self.path, body=payload, headers={'Content-Type': 'application/json'})
+            response = conn.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException):
+            # Drop the broken connection; the next turn reconnects
+            self.close()
+            raise
+        return response.status, json.loads(data) if response.status == 200 else None, None
+    
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class Command(BaseCommand):
+    help = 'Replay a mix of scripted conversations against the chat API and report throughput, latency and errors as JSON'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target',
+            help='Base URL of a running server (e.g. http://localhost:8000); default is the in-process test client',
+        )
+        parser.add_argument(
+            '--conversations',
+            type=int,
+            default=20,
+            help='Conversations to replay',
+        )
+        parser.add_argument(
+            '--turns',
+            type=int,
+            default=5,
+            help='Turns per conversation',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=1,
+            help='Conversations in flight at once; turns within a conversation stay in order',
+        )
+        parser.add_argument(
+            '--mix',
+            default='quick=3,cached=2,llm=4,lead=1',
+            help='Relative weights of turn kinds: quick (quick-response table), cached (repeat of the '
+                 'previous LLM prompt), llm (new LLM prompt), lead (contact details, triggers qualification)',
+        )
+        parser.add_argument(
+            '--llm-latency',
+            type=float,
+            default=0.2,
+            help='Seconds the stubbed LLM takes per call (in-process only; start a server with '
+                 'LLM_STUB_LATENCY to stub it there)',
+        )
+        parser.add_argument(
+            '--record',
+            metavar='CASSETTE',
+            help='In-process: call the real OpenAI client and record every call to this cassette',
+        )
+        parser.add_argument(
+            '--replay',
+            metavar='CASSETTE',
+            help='In-process: answer LLM calls from this cassette instead of the stub',
+        )
+        parser.add_argument(
+            '--replay-latency-scale',
+            type=float,
+            default=1.0,
+            help='With --replay, sleep for this multiple of each recorded latency (0 = no delay)',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Random seed, so runs on different commits replay the same conversations',
+        )
+        parser.add_argument(
+            '--rate-limit',
+            action='store_true',
+            help='Keep rate limiting on for in-process runs',
+        )
+        parser.add_argument(
+            '--output',
+            help='Also write the JSON report to this file',
+        )
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Keep the sessions an in-process run creates instead of deleting them',
+        )
+    
+    def _llm_double(self, options, current):
+        """The client to swap into LLMClient for an in-process run, and its name for the report."""
+        if options['replay']:
+            return ReplayClient(options['replay'], options['replay_latency_scale']), 'replay'
+        if options['record']:
+            if current is None:
+                raise CommandError('--record needs a working OpenAI client; set OPENAI_API_KEY')
+            return RecordingClient(current, options['record']), 'record'
+        return StubOpenAI(options['llm_latency']), 'stub'
+    
+    def _parse_mix(self, mix):
+        weights = {}
+        try:
+            for item in mix.split(','):
+                kind, weight = item.split('=')
+                weights[kind.strip()] = float(weight)
+        except ValueError:
+            raise CommandError(f"Invalid --mix: {mix}")
+        unknown = set(weights) - set(TURN_KINDS)
+        if unknown or not any(weights.values()):
+            raise CommandError(f"--mix needs positive weights for some of {', '.join(TURN_KINDS)}")
+        return weights
+    
+    def _script(self, rng, weights, conversations, turns):
+        """Build every conversation up front as a list of (kind, message)."""
+        kinds = list(weights)
+        scripts = []
+        for _ in range(conversations):
+            script, last_llm_prompt = [], None
+            for _ in range(turns):
+                kind = rng.choices(kinds, weights=[weights[k] for k in kinds])[0]
+                if kind == 'cached' and last_llm_prompt is None:
+                    # Nothing to repeat yet, so this turn primes the reply cache instead
+                    kind = 'llm'
+                n = rng.randrange(10 ** 6)
+                if kind == 'quick':
+                    message = rng.choice(QUICK_PROMPTS)
+                elif kind == 'cached':
+                    message = last_llm_prompt
+                elif kind == 'llm':
+                    message = last_llm_prompt = rng.choice(LLM_PROMPTS).format(n=n)
+                else:
+                    message = rng.choice(LEAD_PROMPTS).format(n=n)
+                script.append((kind, message))
+            scripts.append(script)
+        return scripts
+    
+    def _converse(self, target, script, results):
+        session_id = None
+        try:
+            for kind, message in script:
+                body = {'message': message}
+                if session_id:
+                    body['session_id'] = session_id
+                started = time.perf_counter()
+                try:
+                    status_code, data, queries = target.post(body)
+                except Exception as e:
+                    status_code, data, queries = type(e).__name__, None, None
+                elapsed = time.perf_counter() - started
+                if data:
+                    session_id = data.get('session_id', session_id)
+                results.append({'kind': kind, 'status': status_code, 'seconds': elapsed, 'queries': queries})
+        finally:
+            target.close()
+        return session_id
+    
+    def _replay(self, target, scripts, concurrency):
+        results = []
+        started = time.perf_counter()
+        if concurrency == 1:
+            session_ids = [self._converse(target, script, results) for script in scripts]
+        else:
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                session_ids = list(executor.map(lambda script: self._converse(target, script, results), scripts))
+        return results, time.perf_counter() - started, [s for s in session_ids if s]
+    
+    def _report(self, results, duration):
+        ok = [r for r in results if r['status'] == 200]
+        by_kind = defaultdict(list)
+        for r in ok:
+            by_kind[r['kind']].append(r['seconds'])
+        queries = [r['queries'] for r in ok if r['queries'] is not None]
+        return {
+            'turns': len(results),
+            'duration_s': round(duration, 3),
+            'throughput_rps': round(len(results) / duration, 2) if duration else None,
+            'latency_ms': _summary_ms([r['seconds'] for r in ok]),
+            'by_kind': {kind: _summary_ms(by_kind[kind]) for kind in TURN_KINDS if by_kind[kind]},
+            'db_queries_per_turn': round(statistics.mean(queries), 2) if queries else None,
+            'error_rate': round(1 - len(ok) / len(results), 4) if results else 0.0,
+            'status_codes': dict(Counter(str(r['status']) for r in results)),
+        }
+    
+    def handle(self, *args, **options):
+        """Replay the scripted conversations and print a JSON report."""
+        weights = self._parse_mix(options['mix'])
+        conversations = max(options['conversations'], 1)
+        turns = max(options['turns'], 1)
+        concurrency = max(options['concurrency'], 1)
+        scripts = self._script(random.Random(options['seed']), weights, conversations, turns)
+        
+        config = {
+            'target': options['target'] or 'in-process',
+            'conversations': conversations,
+            'turns_per_conversation': turns,
+            'concurrency': concurrency,
+            'mix': weights,
+            'seed': options['seed'],
+        }
+        
+        if options['target']:
+            results, duration, _ = self._replay(HTTPTarget(options['target']), scripts, concurrency)
+        else:
+            llm = get_llm_client()
+            saved = (getattr(llm, 'client', None), llm._initialized)
+            double, config['llm'] = self._llm_double(options, saved[0] if saved[1] else None)
+            if config['llm'] == 'stub':
+                config['llm_latency_s'] = options['llm_latency']
+            else:
+                config['cassette'] = options['replay'] or double.path
+            llm.client, llm._initialized = double, True
+            try:
+                with override_settings(
+                    RATE_LIMIT_ENABLED=options['rate_limit'],
+                    ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+                ):
+                    results, duration, session_ids = self._replay(InProcessTarget(), scripts, concurrency)
+            finally:
+                llm.client, llm._initialized = saved
+                if isinstance(double, RecordingClient):
+                    double.close()
+            if not options['keep']:
+                Session.objects.filter(id__in=session_ids).delete()
+        
+        report = dict(config, **self._report(results, duration))
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(output + '\n')
+        self.stdout.write(output)
@@ -0,0 +1,82 @@
+import json
+import statistics
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+
+from chat.services.rate_limiter import TokenBucketLimiter
+
+
+class Command(BaseCommand):
+    help = 'Measure the per-request overhead of the token-bucket rate limiter on the configured cache'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=2000,
+            help='consume() calls to time',
+        )
+        parser.add_argument(
+            '--keys',
+            type=int,
+            default=50,
+            help='Distinct buckets the calls are spread over',
+        )
+        parser.add_argument(
+            '--cache',
+            default=None,
+            help='Cache alias to benchmark (defaults to RATE_LIMIT_CACHE)',
+        )
+        parser.add_argument(
+            '--budget-ms',
+            type=float,
+            default=1.0,
+            help='Per-request budget the report compares the mean against',
+        )
+        parser.add_argument(
+            '--fail-over-budget',
+            action='store_true',
+            help='Exit non-zero when the mean per-request cost exceeds --budget-ms',
+        )
+    
+    def handle(self, *args, **options):
+        """Time consume() on throwaway buckets and print a JSON report."""
+        alias = options['cache'] or settings.RATE_LIMIT_CACHE
+        if alias not in settings.CACHES:
+            raise CommandError(f"Unknown cache alias: {alias}")
+        iterations = max(options['iterations'], 1)
+        keys = max(options['keys'], 1)
+        limiter = TokenBucketLimiter(alias)
+        prefix = f"bench:ratelimit:{time.monotonic_ns()}"
+        
+        # Warm up the connection to networked backends so the first call isn't counted
+        limiter.consume(f"{prefix}:warmup", capacity=1000, refill_rate=100.0)
+        
+        durations = []
+        for i in range(iterations):
+            started = time.perf_counter()
+            limiter.consume(f"{prefix}:{i % keys}", capacity=1000, refill_rate=100.0)
+            durations.append(time.perf_counter() - started)
+        
+        cache = caches[alias]
+        cache.delete_many([f"{prefix}:{i}" for i in range(keys)] + [f"{prefix}:warmup"])
+        
+        durations.sort()
+        mean_ms = statistics.mean(durations) * 1000
+        report = {
+            'cache': alias,
+            'backend': f"{type(cache).__module__}.{type(cache).__name__}",
+            'calls': iterations,
+            'buckets': keys,
+            'mean_ms': round(mean_ms, 4),
+            'p50_ms': round(durations[len(durations) // 2] * 1000, 4),
+            'p95_ms': round(durations[int(len(durations) * 0.95)] * 1000, 4),
+            'p99_ms': round(durations[int(len(durations) * 0.99)] * 1000, 4),
+            'budget_ms': options['budget_ms'],
+            'within_budget': mean_ms <= options['budget_ms'],
+        }
+        self.stdout.write(json.dumps(report, indent=2))
+        if options['fail_over_budget'] and not report['within_budget']:
+            raise CommandError(f"Rate limiter costs {mean_ms:.4f} ms per request, over the {options['budget_ms']} ms budget")
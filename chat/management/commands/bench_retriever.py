@@ -0,0 +1,218 @@
+import json
+import os
+import random
+import resource
+import tempfile
+import time
+import tracemalloc
+from django.core.management.base import BaseCommand, CommandError
+
+from chat.services.retriever import FAISSRetriever
+
+
+def _corpus(size, rng, vocabulary_size=5000, words_per_doc=40):
+    """Deterministic synthetic documents drawn from a made-up vocabulary."""
+    syllables = ['ka', 'lo', 'mi', 'ne', 'su', 'ta', 'vo', 'ri', 'de', 'po', 'an', 'el']
+    vocabulary = [''.join(rng.choices(syllables, k=rng.randint(2, 4))) + str(i) for i in range(vocabulary_size)]
+    return [
+        {
+            'title': ' '.join(rng.choices(vocabulary, k=4)),
+            'content': ' '.join(rng.choices(vocabulary, k=words_per_doc)),
+        }
+        for _ in range(size)
+    ], vocabulary
+
+
+def _ms_summary(latencies):
+    values = sorted(latencies)
+    return {
+        'p50_ms': round(values[len(values) // 2] * 1000, 4),
+        'p95_ms': round(values[min(len(values) - 1, int(len(values) * 0.95))] * 1000, 4),
+    }
+
+
+def _flatten(report, prefix=''):
+    """{'1000': {'search': {'3': {'p50_ms': 1}}}} -> {'1000.search.3.p50_ms': 1}"""
+    flat = {}
+    for key, value in report.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)):
+            flat[name] = value
+    return flat
+
+
+def find_regressions(current, baseline, tolerance):
+    """
+    Compare two runs metric by metric.
+    
+    Throughput metrics (``*_per_s``) regress when they drop by more than ``tolerance``;
+    everything else (seconds, milliseconds, bytes) when it grows by more than that.
+    
+    Returns:
+        List of dicts with metric, baseline, current and change (fraction)
+    """
+    current, baseline = _flatten(current), _flatten(baseline)
+    regressions = []
+    for metric, before in sorted(baseline.items()):
+        after = current.get(metric)
+        if after is None or not before:
+            continue
+        change = (after - before) / before
+        worse = -change if metric.endswith('_per_s') else change
+        if worse > tolerance:
+            regressions.append({'metric': metric, 'baseline': before, 'current': after, 'change': round(change, 3)})
+    return regressions
+
+
+class Command(BaseCommand):
+    help = 'Benchmark FAISSRetriever on synthetic corpora and flag regressions against a saved baseline'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            default='1000,100000,1000000',
+            help='Comma-separated corpus sizes (documents)',
+        )
+        parser.add_argument(
+            '--top-k',
+            default='1,3,10',
+            help='Comma-separated top_k values to time search at',
+        )
+        parser.add_argument(
+            '--queries',
+            type=int,
+            default=200,
+            help='Search queries timed per top_k',
+        )
+        parser.add_argument(
+            '--embed-sample',
+            type=int,
+            default=20000,
+            help='Documents embedded for the embedding throughput figure',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Random seed for the synthetic corpus and queries',
+        )
+        parser.add_argument(
+            '--output',
+            help='Also write the JSON report to this file',
+        )
+        parser.add_argument(
+            '--save-baseline',
+            help='Write this run as the baseline JSON to this path',
+        )
+        parser.add_argument(
+            '--baseline',
+            help='Baseline JSON to compare against',
+        )
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=0.25,
+            help='Relative slowdown (0.25 = 25%%) tolerated before a metric counts as a regression',
+        )
+        parser.add_argument(
+            '--fail-on-regression',
+            action='store_true',
+            help='Exit with an error when any metric regressed',
+        )
+    
+    def _parse_ints(self, value, option):
+        try:
+            numbers = [int(part) for part in value.split(',') if part.strip()]
+        except ValueError:
+            raise CommandError(f"{option} must be comma-separated integers: {value}")
+        if not numbers or min(numbers) < 1:
+            raise CommandError(f"{option} must be positive integers: {value}")
+        return numbers
+    
+    def _bench_size(self, size, top_ks, options, workdir):
+        rng = random.Random(options['seed'])
+        documents, vocabulary = _corpus(size, rng)
+        index_path = os.path.join(workdir, f"bench_{size}")
+        retriever = FAISSRetriever(index_path=index_path)
+        result = {'documents': size}
+        
+        sample = [f"{doc['title']} {doc['content']}" for doc in documents[:options['embed_sample']]]
+        started = time.perf_counter()
+        for text in sample:
+            retriever._simple_embedding(text)
+        result['embed_docs_per_s'] = round(len(sample) / (time.perf_counter() - started), 1)
+        
+        # add_documents embeds, adds and saves, as seed_faqs does
+        started = time.perf_counter()
+        retriever.add_documents(documents)
+        result['add_documents_s'] = round(time.perf_counter() - started, 4)
+        
+        started = time.perf_counter()
+        retriever._save_index()
+        result['save_s'] = round(time.perf_counter() - started, 4)
+        result['disk_bytes'] = os.path.getsize(f"{index_path}.index") + os.path.getsize(f"{index_path}.docs")
+        
+        started = time.perf_counter()
+        FAISSRetriever(index_path=index_path)
+        result['load_s'] = round(time.perf_counter() - started, 4)
+        
+        queries = [' '.join(rng.choices(vocabulary, k=rng.randint(2, 8))) for _ in range(options['queries'])]
+        result['search'] = {}
+        for top_k in top_ks:
+            latencies = []
+            for query in queries:
+                started = time.perf_counter()
+                retriever.search(query, top_k=top_k)
+                latencies.append(time.perf_counter() - started)
+            result['search'][str(top_k)] = _ms_summary(latencies)
+        
+        # IndexFlatIP keeps every vector as float32; the documents list is measured on a fresh load
+        result['index_bytes'] = retriever.index.ntotal * retriever.dimension * 4
+        del retriever, documents
+        tracemalloc.start()
+        loaded = FAISSRetriever(index_path=index_path)
+        result['documents_bytes'] = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del loaded
+        # ru_maxrss is KiB on Linux; it only grows, so later sizes include earlier peaks
+        result['max_rss_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+        return result
+    
+    def handle(self, *args, **options):
+        """Run every corpus size and print a JSON report, comparing to --baseline if given."""
+        sizes = self._parse_ints(options['sizes'], '--sizes')
+        top_ks = self._parse_ints(options['top_k'], '--top-k')
+        options['queries'] = max(options['queries'], 1)
+        
+        report = {'seed': options['seed'], 'sizes': {}}
+        with tempfile.TemporaryDirectory() as workdir:
+            for size in sizes:
+                self.stderr.write(f"Benchmarking {size} documents...")
+                report['sizes'][str(size)] = self._bench_size(size, top_ks, options, workdir)
+        
+        if options['baseline']:
+            with open(options['baseline'], 'r', encoding='utf-8') as f:
+                baseline = json.load(f)
+            # Sizes, seeds and memory peaks only compare like for like
+            report['regressions'] = find_regressions(report['sizes'], baseline['sizes'], options['tolerance'])
+        
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(output + '\n')
+        if options['save_baseline']:
+            with open(options['save_baseline'], 'w', encoding='utf-8') as f:
+                f.write(json.dumps({'seed': report['seed'], 'sizes': report['sizes']}, indent=2) + '\n')
+        self.stdout.write(output)
+        
+        regressions = report.get('regressions')
+        if regressions:
+            for regression in regressions:
+                self.stderr.write(
+                    f"REGRESSION {regression['metric']}: {regression['baseline']} -> {regression['current']} "
+                    f"({regression['change']:+.0%})"
+                )
+            if options['fail_on_regression']:
+                raise CommandError(f"{len(regressions)} retriever metrics regressed beyond {options['tolerance']:.0%}")
@@ -0,0 +1,127 @@
+import json
+import statistics
+import time
+import uuid
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from chat.models import Session, Message
+from chat.services.conversation import ConversationStore, SessionRef
+
+
+def _legacy_turn(session_id, user_text, reply):
+    """The per-turn writes the chat view used to make, each in autocommit."""
+    if session_id:
+        try:
+            session = Session.objects.get(id=session_id)
+        except Session.DoesNotExist:
+            session = Session.objects.create()
+    else:
+        session = Session.objects.create()
+    Message.objects.create(session=session, text=user_text, sender='user')
+    Message.objects.create(session=session, text=reply, sender='assistant')
+    return session.id, session.id
+
+
+def _count(captured_queries):
+    """
+    Split captured SQL into data statements and commits.
+    
+    Django logs BEGIN/COMMIT for explicit transactions; a write outside one
+    commits on its own (autocommit), which on SQLite means its own fsync.
+    """
+    statements = commits = 0
+    in_transaction = False
+    for query in captured_queries:
+        verb = query['sql'].split(None, 1)[0].upper()
+        if verb == 'BEGIN':
+            in_transaction = True
+        elif verb == 'COMMIT':
+            in_transaction = False
+            commits += 1
+        elif verb not in ('SAVEPOINT', 'RELEASE', 'ROLLBACK'):
+            statements += 1
+            if not in_transaction and verb in ('INSERT', 'UPDATE', 'DELETE'):
+                commits += 1
+    return statements, commits
+
+
+def _batched_turn(session_id, user_text, reply):
+    """The single-transaction turn write when the session has to be touched."""
+    store = ConversationStore()
+    ref = SessionRef(session_id, 'unverified') if session_id else SessionRef(uuid.uuid4(), 'new')
+    session, _, _ = store.persist_turn(ref, user_text, reply)
+    return session.id, session.id
+
+
+class Command(BaseCommand):
+    help = 'Compare queries and wall time per chat turn for the legacy, and single-transaction write paths'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sessions',
+            type=int,
+            default=50,
+            help='Conversations simulated per write path',
+        )
+        parser.add_argument(
+            '--turns',
+            type=int,
+            default=4,
+            help='Turns per conversation (the first one creates the session)',
+        )
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Keep the benchmark sessions instead of deleting them',
+        )
+    
+    def _run(self, write_turn, sessions, turns):
+        durations, statements, commits, created = [], [], [], []
+        for _ in range(sessions):
+            # The session id the client sends back next turn
+            handle = None
+            for turn in range(turns):
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    session_id, handle = write_turn(handle, f"benchmark question {turn}", "benchmark reply " * 20)
+                    durations.append(time.perf_counter() - started)
+                turn_statements, turn_commits = _count(captured.captured_queries)
+                statements.append(turn_statements)
+                commits.append(turn_commits)
+            created.append(session_id)
+        
+        durations.sort()
+        return created, {
+            'turns': len(durations),
+            'statements_per_turn': round(statistics.mean(statements), 2),
+            'commits_per_turn': round(statistics.mean(commits), 2),
+            'mean_ms': round(statistics.mean(durations) * 1000, 3),
+            'p50_ms': round(durations[len(durations) // 2] * 1000, 3),
+            'p95_ms': round(durations[int(len(durations) * 0.95)] * 1000, 3),
+        }
+    
+    def handle(self, *args, **options):
+        """Run every write path against the configured database and print a JSON report."""
+        sessions = max(options['sessions'], 1)
+        turns = max(options['turns'], 1)
+        
+        # Warm up connection setup so neither path pays for it
+        Session.objects.exists()
+        
+        legacy_ids, legacy = self._run(_legacy_turn, sessions, turns)
+        batched_ids, batched = self._run(_batched_turn, sessions, turns)
+        
+        if not options['keep']:
+            Session.objects.filter(id__in=legacy_ids + batched_ids).delete()
+        
+        report = {
+            'database': connection.vendor,
+            'legacy': legacy,
+            'single_transaction': batched,
+            'statement_reduction': round(1 - batched['statements_per_turn'] / legacy['statements_per_turn'], 3),
+            'commit_reduction': round(1 - batched['commits_per_turn'] / legacy['commits_per_turn'], 3),
+            'speedup': round(legacy['mean_ms'] / batched['mean_ms'], 2) if batched['mean_ms'] else None,
+        }
+        self.stdout.write(json.dumps(report, indent=2))
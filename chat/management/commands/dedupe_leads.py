@@ -0,0 +1,100 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from chat.models import Lead, LeadJob
+from chat.services.conversation import conversation_store
+from chat.services.lead_qualifier import lead_qualifier
+
+
+class Command(BaseCommand):
+    help = 'Assign identity keys to existing leads and collapse duplicates into one canonical lead'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Leads processed per transaction',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report what would be merged without changing anything',
+        )
+    
+    def _process_batch(self, leads, dry_run, stats):
+        """
+        Key each lead; merge it into the canonical lead for that key if one exists.
+        
+        Runs inside the caller's transaction, which also recounts the sessions whose
+        leads were merged away or rescored, so has_lead and max_interest_score never
+        describe leads that are gone.
+        """
+        keyed = {}
+        for lead in leads:
+            key = Lead.build_identity_key(lead.email, lead.name, lead.source_session_id)
+            if key is not None:
+                keyed.setdefault(key, []).append(lead)
+            else:
+                stats['unkeyed'] += 1
+        
+        canonical = {lead.identity_key: lead for lead in Lead.objects.select_for_update().filter(identity_key__in=keyed)}
+        affected_sessions = set()
+        
+        for key, group in keyed.items():
+            # The oldest row wins so lead ids already shared with a CRM stay stable
+            target = canonical.get(key) or group.pop(0)
+            duplicates = group
+            for duplicate in duplicates:
+                lead_qualifier.merge_lead(
+                    target,
+                    duplicate.name,
+                    Lead.normalize_email(duplicate.email),
+                    duplicate.interest_score,
+                    duplicate.notes
+                )
+            stats['merged'] += len(duplicates)
+            stats['keyed'] += 1 if target.identity_key is None else 0
+            
+            if dry_run:
+                continue
+            
+            if duplicates:
+                affected_sessions.add(target.source_session_id)
+                affected_sessions.update(duplicate.source_session_id for duplicate in duplicates)
+                duplicate_ids = [duplicate.id for duplicate in duplicates]
+                LeadJob.objects.filter(lead_id__in=duplicate_ids).update(lead=target)
+                Lead.objects.filter(id__in=duplicate_ids).delete()
+            target.email = Lead.normalize_email(target.email)
+            target.identity_key = key
+            target.save(update_fields=['name', 'email', 'interest_score', 'notes', 'identity_key', 'updated_at'])
+        
+        if affected_sessions:
+            conversation_store.recount_sessions(affected_sessions)
+    
+    def handle(self, *args, **options):
+        """Walk unkeyed leads oldest first in bounded batches."""
+        dry_run = options['dry_run']
+        stats = {'keyed': 0, 'merged': 0, 'unkeyed': 0}
+        last_id = 0
+        
+        while True:
+            with transaction.atomic():
+                leads = list(
+                    Lead.objects
+                    .select_for_update()
+                    .filter(identity_key__isnull=True, id__gt=last_id)
+                    .order_by('id')[:options['batch_size']]
+                )
+                if not leads:
+                    break
+                last_id = leads[-1].id
+                self._process_batch(leads, dry_run, stats)
+            
+            self.stdout.write(f"Up to lead {last_id}: {stats['keyed']} keyed, {stats['merged']} duplicates merged")
+        
+        verb = 'Would merge' if dry_run else 'Merged'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {stats['merged']} duplicate leads; {stats['keyed']} canonical leads keyed, "
+            f"{stats['unkeyed']} leads without contact info left as is"
+        ))
@@ -0,0 +1,84 @@
+import json
+import os
+from django.core.management.base import BaseCommand, CommandError
+
+from chat.pagination import InvalidPage
+from chat.services.exporter import exporter, EXPORT_FORMATS, LEAD_EXPORT_FIELDS, TRANSCRIPT_EXPORT_FIELDS
+
+
+class Command(BaseCommand):
+    help = 'Stream leads or chat transcripts to CSV/NDJSON, optionally picking up where the last export stopped'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=['leads', 'transcripts'])
+        parser.add_argument(
+            '--format',
+            choices=list(EXPORT_FORMATS),
+            default='ndjson',
+            help='Output format',
+        )
+        parser.add_argument(
+            '--output',
+            default='-',
+            help='File to write (default: stdout)',
+        )
+        parser.add_argument(
+            '--since',
+            help='Only export rows after this cursor',
+        )
+        parser.add_argument(
+            '--state',
+            help='JSON file holding the last exported cursor; read before and updated after a successful export',
+        )
+        parser.add_argument(
+            '--lag',
+            type=float,
+            default=None,
+            help='Leave rows younger than this many seconds for the next export (default: EXPORT_LAG)',
+        )
+    
+    def _read_state(self, path):
+        if not path or not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('cursor')
+    
+    def _write_state(self, path, cursor):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'cursor': cursor}, f)
+        os.replace(tmp_path, path)
+    
+    def handle(self, *args, **options):
+        """Stream the dataset line by line so memory stays flat however many rows there are."""
+        since = options['since'] or self._read_state(options['state'])
+        lag = None if options['lag'] is None else max(options['lag'], 0.0)
+        try:
+            if options['dataset'] == 'leads':
+                rows, fields = exporter.lead_rows(since, lag=lag), LEAD_EXPORT_FIELDS
+            else:
+                rows, fields = exporter.transcript_rows(since, lag=lag), TRANSCRIPT_EXPORT_FIELDS
+        except InvalidPage as e:
+            raise CommandError(str(e))
+        
+        progress = {'rows': 0, 'cursor': since}
+        
+        def tracked(rows):
+            for row in rows:
+                progress['rows'] += 1
+                progress['cursor'] = row['cursor']
+                yield row
+        
+        lines = exporter.render(tracked(rows), fields, options['format'])
+        if options['output'] == '-':
+            for line in lines:
+                self.stdout.write(line, ending='')
+        else:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as f:
+                f.writelines(lines)
+        
+        if options['state'] and progress['cursor']:
+            self._write_state(options['state'], progress['cursor'])
+        
+        # Report on stderr so stdout stays a clean data stream
+        self.stderr.write(f"Exported {progress['rows']} {options['dataset']} rows; next --since {progress['cursor'] or '(none)'}")
@@ -0,0 +1,205 @@
+import gzip
+import json
+import os
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q, Subquery
+from django.utils import timezone
+
+from chat.models import Session, Message, Lead, LeadJob
+from chat.services.conversation import conversation_store
+
+
+class Command(BaseCommand):
+    help = 'Archive inactive sessions and their messages to compressed JSONL, then delete them in small batches'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--inactive-days',
+            type=int,
+            default=settings.SESSION_RETENTION_DAYS,
+            help='Prune sessions with no activity for this many days',
+        )
+        parser.add_argument(
+            '--short-inactive-days',
+            type=int,
+            default=settings.SESSION_SHORT_RETENTION_DAYS,
+            help='Prune drive-by sessions (see --short-max-messages) sooner, after this many days',
+        )
+        parser.add_argument(
+            '--short-max-messages',
+            type=int,
+            default=settings.SESSION_SHORT_MAX_MESSAGES,
+            help='Sessions with at most this many messages count as drive-by sessions',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='Sessions archived and deleted per batch',
+        )
+        parser.add_argument(
+            '--delete-chunk',
+            type=int,
+            default=5000,
+            help='Maximum messages removed by one DELETE statement',
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0.1,
+            help='Seconds to sleep between batches so live traffic can take the write lock',
+        )
+        parser.add_argument(
+            '--archive-dir',
+            default=settings.SESSION_ARCHIVE_DIR,
+            help='Directory for the .jsonl.gz archive',
+        )
+        parser.add_argument(
+            '--no-archive',
+            action='store_true',
+            help='Delete without writing an archive',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many sessions would be pruned',
+        )
+    
+    def _candidates(self, options, now):
+        """
+        Sessions past retention that no lead or unfinished lead job refers to.
+        
+        Returns:
+            Tuple of (queryset ordered by (updated_at, id), activity cutoff a
+            session must still be older than when it is deleted)
+        """
+        cutoff = now - timedelta(days=options['inactive_days'])
+        short_cutoff = now - timedelta(days=options['short_inactive_days'])
+        messages = Message.objects.filter(session=OuterRef('pk'))
+        
+        # Per-session subqueries ride the (session, timestamp, id) index instead of
+        # aggregating the whole message table for every batch
+        last_message = Subquery(messages.order_by('-timestamp', '-id').values('timestamp')[:1])
+        over_short_limit = Subquery(messages.order_by('id').values('id')[options['short_max_messages']:options['short_max_messages'] + 1])
+        
+        # Session.updated_at is touched on every turn, but sessions written before that
+        # only have their messages to show activity, so both must be old
+        inactive = Q(updated_at__lt=cutoff) & (Q(last_message__isnull=True) | Q(last_message__lt=cutoff))
+        drive_by = (
+            Q(updated_at__lt=short_cutoff, over_short_limit__isnull=True)
+            & (Q(last_message__isnull=True) | Q(last_message__lt=short_cutoff))
+        )
+        activity_cutoff = max(cutoff, short_cutoff)
+        
+        candidates = (
+            Session.objects
+            .filter(updated_at__lt=activity_cutoff)
+            .exclude(Exists(Lead.objects.filter(source_session=OuterRef('pk'))))
+            .exclude(Exists(LeadJob.objects.filter(session=OuterRef('pk'), status__in=['pending', 'running'])))
+            .annotate(last_message=last_message, over_short_limit=over_short_limit)
+            .filter(inactive | drive_by)
+            .order_by('updated_at', 'id')
+        )
+        return candidates, activity_cutoff
+    
+    def _archive(self, archive, session_ids):
+        """Write one JSON line per session, messages inline, and make it durable."""
+        sessions = Session.objects.filter(id__in=session_ids).order_by('updated_at', 'id')
+        for session in sessions.iterator():
+            messages = (
+                Message.objects
+                .filter(session=session)
+                .order_by('timestamp', 'id')
+                .values_list('id', 'sender', 'text', 'canned_id', 'body', 'timestamp')
+            )
+            record = {
+                'id': str(session.id),
+                'created_at': session.created_at.isoformat(),
+                'updated_at': session.updated_at.isoformat(),
+                'messages': [
+                    {
+                        'id': message_id, 'sender': sender, 'timestamp': timestamp.isoformat(),
+                        'text': Message.resolve_text(text, canned_id, body),
+                    }
+                    for message_id, sender, text, canned_id, body, timestamp in messages.iterator()
+                ],
+            }
+            archive.write((json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8'))
+        archive.flush()
+        os.fsync(archive.fileobj.fileno())
+    
+    def _delete(self, session_ids, delete_chunk, cutoff):
+        """
+        Delete the batch's messages in bounded chunks, then the sessions.
+        
+        Each statement runs in its own short transaction. Only messages older than
+        the cutoff are removed and a session is only deleted once it has no messages
+        left, so a session that comes back to life mid-prune keeps its new turns.
+        """
+        deleted_messages = 0
+        old_messages = Message.objects.filter(session_id__in=session_ids, timestamp__lt=cutoff)
+        while True:
+            with transaction.atomic():
+                chunk = list(old_messages.order_by('id').values_list('id', flat=True)[:delete_chunk])
+                if not chunk:
+                    break
+                deleted_messages += Message.objects.filter(id__in=chunk).delete()[0]
+        
+        with transaction.atomic():
+            has_messages = Exists(Message.objects.filter(session=OuterRef('pk')))
+            has_lead = Exists(Lead.objects.filter(source_session=OuterRef('pk')))
+            sessions = Session.objects.filter(id__in=session_ids, updated_at__lt=cutoff).filter(~has_messages, ~has_lead)
+            deleted_sessions = sessions.delete()[1].get(Session._meta.label, 0)
+            # Sessions that came back to life keep their newer messages; fix up their counters
+            if deleted_messages and deleted_sessions < len(session_ids):
+                conversation_store.recount_sessions(session_ids)
+        return deleted_sessions, deleted_messages
+    
+    def handle(self, *args, **options):
+        """Prune in batches: archive a batch, delete it, pause, repeat."""
+        now = timezone.now()
+        candidates, cutoff = self._candidates(options, now)
+        
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f"Would prune {candidates.count()} sessions"))
+            return
+        
+        archive = None
+        archive_path = None
+        if not options['no_archive']:
+            os.makedirs(options['archive_dir'], exist_ok=True)
+            archive_path = os.path.join(options['archive_dir'], f"sessions-{now:%Y%m%dT%H%M%S}.jsonl.gz")
+            archive = gzip.open(archive_path, 'ab')
+        
+        total_sessions = total_messages = 0
+        position = None
+        try:
+            while True:
+                page = candidates
+                if position is not None:
+                    # Keyset walk: sessions kept back (reactivated mid-prune) are not rescanned
+                    updated_at, session_id = position
+                    page = page.filter(Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, id__gt=session_id))
+                rows = list(page.values_list('id', 'updated_at')[:options['batch_size']])
+                if not rows:
+                    break
+                position = (rows[-1][1], rows[-1][0])
+                batch = [session_id for session_id, _ in rows]
+                
+                if archive is not None:
+                    self._archive(archive, batch)
+                sessions, messages = self._delete(batch, options['delete_chunk'], cutoff)
+                total_sessions += sessions
+                total_messages += messages
+                self.stdout.write(f"Pruned {total_sessions} sessions, {total_messages} messages")
+                time.sleep(options['pause'])
+        finally:
+            if archive is not None:
+                archive.close()
+        
+        where = f" (archived to {archive_path})" if archive_path else ''
+        self.stdout.write(self.style.SUCCESS(f"Pruned {total_sessions} sessions and {total_messages} messages{where}"))
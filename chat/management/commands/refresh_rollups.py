@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from chat.services.rollups import rollups
+
+
+class Command(BaseCommand):
+    help = 'Fold messages and leads created since the last run into the daily analytics rollups'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10000,
+            help='Rows per source folded in per transaction',
+        )
+        parser.add_argument(
+            '--lag',
+            type=float,
+            default=60.0,
+            help='Leave rows younger than this many seconds for the next run',
+        )
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Drop all rollups and recompute them from every message and lead',
+        )
+    
+    def handle(self, *args, **options):
+        """Run one incremental refresh (or a full rebuild) and report rows processed."""
+        refresh = rollups.rebuild if options['rebuild'] else rollups.refresh
+        processed = refresh(max(options['batch_size'], 1), max(options['lag'], 0.0))
+        summary = ', '.join(f"{count} {source}s" for source, count in processed.items())
+        self.stdout.write(self.style.SUCCESS(f"Rolled up {summary}"))
@@ -0,0 +1,249 @@
+import json
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.functions import Lower, Trim
+from django.utils import timezone
+
+from chat.models import Message, Lead
+from chat.services.conversation import conversation_store
+from chat.services.lead_qualifier import lead_qualifier
+from chat.services.llm_client import llm_client
+
+
+def _histogram(scores):
+    """Bucket interest scores into tenths."""
+    buckets = [0] * 10
+    for score in scores:
+        buckets[min(int(score * 10), 9)] += 1
+    return {f"{i / 10:.1f}-{(i + 1) / 10:.1f}": count for i, count in enumerate(buckets)}
+
+
+class Command(BaseCommand):
+    help = 'Re-score stored user messages with the current lead qualification prompt and threshold'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=20,
+            help='Messages packed into each LLM classification request',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=4,
+            help='Maximum LLM requests in flight',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Rows fetched per database round-trip',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            default='requalify_checkpoint.json',
+            help='File recording the last processed message id',
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Ignore an existing checkpoint and start from the first message',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report how the score distribution would shift without writing anything',
+        )
+    
+    def _load_checkpoint(self, path):
+        if not os.path.exists(path):
+            return 0
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('last_message_id', 0)
+    
+    def _save_checkpoint(self, path, last_message_id, processed):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'last_message_id': last_message_id,
+                'processed': processed,
+                'updated_at': timezone.now().isoformat(),
+            }, f)
+        os.replace(tmp_path, path)
+    
+    def _batches(self, start_id, batch_size, chunk_size):
+        """Stream (id, session_id, text) rows in id order, grouped into LLM batches."""
+        rows = (
+            Message.objects
+            .filter(sender='user', id__gt=start_id)
+            .order_by('id')
+            .values_list('id', 'session_id', 'text')
+            .iterator(chunk_size=chunk_size)
+        )
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    
+    def _score_key(self, lead):
+        """Key of a lead in the score distribution; leads a dry run would create have no id yet."""
+        return lead.pk if lead.pk is not None else f"new:{lead.identity_key}"
+    
+    def _existing(self, candidates):
+        """
+        Stored leads for each candidate identity key, as lists.
+        
+        Leads dedupe_leads has not keyed yet have a NULL identity_key and may still
+        be duplicated, so they are matched by recomputing their key.
+        """
+        existing = {}
+        for lead in Lead.objects.filter(identity_key__in=candidates):
+            existing.setdefault(lead.identity_key, []).append(lead)
+        
+        emails = [key[len('email:'):] for key in candidates if key.startswith('email:')]
+        session_ids = {session_id for session_id, _, _ in candidates.values()}
+        unkeyed = (
+            Lead.objects
+            .filter(identity_key__isnull=True)
+            .annotate(normalized_email=Lower(Trim('email')))
+            .filter(Q(normalized_email__in=emails) | Q(source_session_id__in=session_ids))
+            .order_by('id')
+        )
+        for lead in unkeyed:
+            key = Lead.build_identity_key(lead.email, lead.name, lead.source_session_id)
+            if key in candidates:
+                existing.setdefault(key, []).append(lead)
+        return existing
+    
+    def _apply(self, batch, results, scores, dry_run, stats, simulated, fresh):
+        """
+        Turn one batch of classifications into bulk Lead creates and updates.
+        
+        A touched lead's score is replaced with the highest score its messages got
+        in this run (tracked in ``fresh``), so a stricter prompt can lower it. A dry
+        run keeps the leads it would have written in ``simulated`` so later batches
+        see them, and its counts match a real run.
+        """
+        candidates = {}
+        for (message_id, session_id, text), result in zip(batch, results):
+            if not (result.get('name') or result.get('email')):
+                continue
+            stats['scored'] += 1
+            key = Lead.build_identity_key(result.get('email'), result.get('name'), session_id)
+            fresh[key] = max(fresh.get(key, 0.0), result['interest_score'])
+            # Keep the strongest signal per lead within the batch
+            if key not in candidates or result['interest_score'] > candidates[key][2]['interest_score']:
+                candidates[key] = (session_id, text, result)
+        
+        if not candidates:
+            return
+        
+        existing = self._existing(candidates)
+        existing.update((key, simulated[key]) for key in candidates if key in simulated)
+        
+        now = timezone.now()
+        to_create, to_update = [], []
+        for key, (session_id, text, result) in candidates.items():
+            if key in existing:
+                for lead in existing[key]:
+                    if lead.interest_score != fresh[key]:
+                        lead.interest_score = fresh[key]
+                        # bulk_update() skips auto_now fields
+                        lead.updated_at = now
+                        to_update.append(lead)
+            elif lead_qualifier.should_save_lead(result):
+                lead = Lead(
+                    name=result.get('name'),
+                    email=Lead.normalize_email(result.get('email')),
+                    interest_score=fresh[key],
+                    source_session_id=session_id,
+                    notes=f"Qualified from message: {text[:200]}",
+                    identity_key=key
+                )
+                existing[key] = [lead]
+                to_create.append(lead)
+        
+        stats['created'] += len(to_create)
+        stats['updated'] += len(to_update)
+        if dry_run:
+            simulated.update((key, existing[key]) for key in candidates if key in existing)
+        else:
+            with transaction.atomic():
+                # A live upsert may have created one of these identities since it was read
+                Lead.objects.bulk_create(to_create, ignore_conflicts=True)
+                Lead.objects.bulk_update(to_update, ['interest_score', 'updated_at'])
+                # Scores can go down, so the session summaries are recomputed rather than raised
+                conversation_store.recount_sessions({lead.source_session_id for lead in to_create + to_update})
+            if to_create:
+                # ignore_conflicts leaves ids unset; report the rows that were actually stored
+                to_create = list(Lead.objects.filter(identity_key__in=[lead.identity_key for lead in to_create]))
+        for lead in to_create + to_update:
+            scores[self._score_key(lead)] = lead.interest_score
+    
+    def handle(self, *args, **options):
+        """Stream user messages, classify them in packed batches and write lead changes."""
+        dry_run = options['dry_run']
+        checkpoint = options['checkpoint']
+        start_id = 0 if options['restart'] else self._load_checkpoint(checkpoint)
+        concurrency = max(options['concurrency'], 1)
+        
+        if start_id:
+            self.stdout.write(f'Resuming after message {start_id}')
+        
+        scores = dict(Lead.objects.values_list('id', 'interest_score'))
+        before = _histogram(scores.values())
+        stats = {'messages': 0, 'scored': 0, 'created': 0, 'updated': 0}
+        simulated, fresh = {}, {}
+        
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            in_flight = deque()
+            batches = self._batches(start_id, options['batch_size'], options['chunk_size'])
+            
+            def drain_one():
+                # Results are applied in submission order so the checkpoint never skips a batch
+                batch, future = in_flight.popleft()
+                try:
+                    results = future.result()
+                except Exception as e:
+                    # Leave the checkpoint on the last fully applied batch so a rerun retries this one
+                    for _, pending in in_flight:
+                        pending.cancel()
+                    raise CommandError(
+                        f"Classification failed for messages {batch[0][0]}-{batch[-1][0]}: {e}. "
+                        f"{stats['messages']} messages were applied; run again to resume."
+                    )
+                self._apply(batch, results, scores, dry_run, stats, simulated, fresh)
+                stats['messages'] += len(batch)
+                if not dry_run:
+                    self._save_checkpoint(checkpoint, batch[-1][0], stats['messages'])
+                self.stdout.write(f"Processed {stats['messages']} messages (last id {batch[-1][0]})")
+            
+            for batch in batches:
+                in_flight.append((batch, executor.submit(
+                    llm_client.classify_batch, [row[2] for row in batch], raise_errors=True
+                )))
+                if len(in_flight) >= concurrency:
+                    drain_one()
+            while in_flight:
+                drain_one()
+        
+        after = _histogram(scores.values())
+        report = {
+            'dry_run': dry_run,
+            'messages': stats['messages'],
+            'messages_with_contact_info': stats['scored'],
+            'leads_created': stats['created'],
+            'leads_rescored': stats['updated'],
+            'score_distribution': {'before': before, 'after': after},
+        }
+        self.stdout.write(json.dumps(report, indent=2))
+        self.stdout.write(self.style.SUCCESS('Dry run complete' if dry_run else 'Re-qualification complete'))
@@ -0,0 +1,82 @@
+import logging
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from chat.services.lead_queue import lead_queue
+
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Process queued lead qualification jobs'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=settings.LEAD_WORKER_CONCURRENCY,
+            help='Number of jobs qualified in parallel',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=1.0,
+            help='Seconds to sleep when the queue is empty',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Drain the queue once and exit',
+        )
+    
+    def _process(self, job):
+        try:
+            return lead_queue.process(job)
+        finally:
+            # Each worker thread has its own DB connection; don't leak them
+            connections.close_all()
+    
+    def handle(self, *args, **options):
+        """Claim pending jobs and qualify them with bounded concurrency."""
+        concurrency = max(options['concurrency'], 1)
+        self._stopping = False
+        
+        def stop(signum, frame):
+            self._stopping = True
+        
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        
+        self.stdout.write(f'Lead worker started (concurrency={concurrency})')
+        processed = 0
+        
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            while not self._stopping:
+                # Drop connections the database closed or broke so one outage doesn't end the worker
+                close_old_connections()
+                try:
+                    lead_queue.requeue_stale()
+                    jobs = lead_queue.claim(concurrency)
+                    
+                    if not jobs:
+                        if options['once']:
+                            break
+                        time.sleep(options['poll_interval'])
+                        continue
+                    
+                    for job in executor.map(self._process, jobs):
+                        processed += 1
+                        self.stdout.write(f'Job {job.id}: {job.status}' + (f' (lead {job.lead_id})' if job.lead_id else ''))
+                except Exception:
+                    # Claimed jobs left running are picked up again by requeue_stale
+                    logger.exception('Lead worker iteration failed; retrying')
+                    if options['once']:
+                        raise
+                    time.sleep(options['poll_interval'])
+        
+        self.stdout.write(self.style.SUCCESS(f'Lead worker stopped after {processed} jobs'))
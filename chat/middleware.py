@@ -0,0 +1,55 @@
+import json
+import logging
+from django.conf import settings
+from django.db import connection
+
+from .services.timing import request_timer
+
+
+logger = logging.getLogger('chat.timing')
+
+
+class RateLimitHeadersMiddleware:
+    """Add X-RateLimit-* headers for requests that went through a token-bucket throttle."""
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        response = self.get_response(request)
+        
+        result = getattr(request, 'rate_limit', None)
+        if result is not None:
+            response['X-RateLimit-Limit'] = str(int(result['limit']))
+            response['X-RateLimit-Remaining'] = str(result['remaining'])
+        return response
+
+
+class ServerTimingMiddleware:
+    """
+    Time each request's stages and report them in a Server-Timing header.
+    
+    Views and services mark stages with ``chat.services.timing.span``; every DB
+    query is timed as ``db``. With SERVER_TIMING_LOG on, each request also logs
+    one JSON line with the same breakdown.
+    """
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        if not settings.SERVER_TIMING_ENABLED:
+            return self.get_response(request)
+        
+        with request_timer() as timer, connection.execute_wrapper(timer.db_wrapper):
+            response = self.get_response(request)
+        
+        response['Server-Timing'] = timer.header()
+        if settings.SERVER_TIMING_LOG:
+            logger.info(json.dumps(dict(
+                timer.as_dict(),
+                method=request.method,
+                path=request.path,
+                status=response.status_code,
+            )))
+        return response
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:31
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0002_leadjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lead',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='lead',
+            name='identity_key',
+            field=models.CharField(blank=True, editable=False, max_length=320, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='lead',
+            constraint=models.UniqueConstraint(fields=('identity_key',), name='chat_lead_identity_key_uniq'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0003_lead_identity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SessionLeadState',
+            fields=[
+                ('session', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='lead_state', serialize=False, to='chat.session')),
+                ('name', models.CharField(blank=True, max_length=255, null=True)),
+                ('email', models.EmailField(blank=True, max_length=254, null=True)),
+                ('interest_score', models.FloatField(default=0.0)),
+                ('is_lead', models.BooleanField(default=False)),
+                ('evidence', models.JSONField(blank=True, default=list)),
+                ('messages_scored', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:40
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0004_session_lead_state'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='message',
+            options={'ordering': ['timestamp', 'id']},
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-19 06:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0006_message_session_ts_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(fields=['created_at', 'id'], name='chat_lead_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(fields=['interest_score', 'created_at'], name='chat_lead_score_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(condition=models.Q(('email__isnull', False)), fields=['created_at', 'id'], name='chat_lead_email_created_idx'),
+        ),
+    ]
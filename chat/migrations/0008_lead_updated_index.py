@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 07:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0007_lead_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(fields=['updated_at', 'id'], name='chat_lead_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 07:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0008_lead_updated_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='session',
+            index=models.Index(fields=['updated_at', 'id'], name='chat_session_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,155 @@
+# Generated by Django 4.2.7 on 2026-10-19 08:14
+
+import hashlib
+import zlib
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+BATCH_SIZE = 2000
+
+# The fixed assistant replies (chat.services.llm_client.CANNED_REPLIES) as they were when this
+# migration was written. Frozen here so later edits to the replies don't change what it converts
+CANNED_REPLIES = frozenset([
+    "Chatbots: $150-300, Automation: $200-400, AI models: $300-600, Full-stack: $500-1200. What's your timeline and budget for this project?",
+    "Contact Swastik: https://www.upwork.com/freelancers/~01a3695131c30e858f - Free consultations! What's your project timeline?",
+    "Excellent! What's your business and what specific AI solution are you thinking about?",
+    "Excellent! What's your business type and what's your main goal with AI?",
+    "Excellent! What's your company size and what's your biggest operational challenge right now?",
+    "Excellent! What's your project about and what's your timeline?",
+    "Excellent! What's your project scope and what's your budget range?",
+    "Great! What industry is your business in? And what's your main challenge that AI could help solve?",
+    "Great! What's your budget range for this project? And when do you need it completed?",
+    "Great! What's your project about and what's your budget range?",
+    "Great! What's your project scope and what's your timeline?",
+    "Great! What's your timeline for this project and what's your main challenge?",
+    "Hello! I'm Swastik's AI assistant. I help businesses with AI solutions like chatbots, automation, and custom AI models. What's your business looking to achieve with AI?",
+    "Hire Swastik: https://www.upwork.com/freelancers/~01a3695131c30e858f - Budget-friendly AI solutions! What's your project about?",
+    "I apologize, but I'm currently unavailable. Please try again later.",
+    "I apologize, but I'm experiencing technical difficulties. Please try again in a moment.",
+    "I apologize, but I'm experiencing technical difficulties. Please try again later.",
+    'I can help with: Service information, pricing details, project consultation. What specific challenge is your business facing?',
+    "Perfect for startups! Swastik offers budget-friendly AI solutions with 20% discount and payment plans. What's your startup's main challenge?",
+    "Perfect! What specific AI solution do you need? And what's your timeline for this project?",
+    "Perfect! What's your project about and what's your budget range?",
+    "Perfect! What's your project scope and what's your budget range?",
+    "Perfect! What's your project scope and what's your timeline?",
+    "Pricing: Chatbots $150-300, Automation $200-400, AI models $300-600, Full-stack $500-1200. What's your budget range for this project?",
+    "Swastik builds custom chatbots for $150-300. What's your main use case - customer service, lead generation, or sales support?",
+    'Swastik creates automation workflows using Botpress, Make.com, Zapier, n8n. Starting at $200-400! What processes do you want to automate?',
+    "Swastik delivers full-stack AI projects for $500-1200. Complete solutions with frontend, backend, and AI integration! What's your project scope?",
+    'Swastik develops custom AI models for $300-600. Text classification, sentiment analysis, predictive modeling! What data do you have?',
+    'Swastik offers: Chatbots ($150-300), Automation ($200-400), AI models ($300-600), Full-stack projects ($500-1200). What type of project are you considering?',
+    "Swastik's Upwork: https://www.upwork.com/freelancers/~01a3695131c30e858f",
+])
+
+
+def compact_messages(apps, schema_editor):
+    """
+    Point existing fixed assistant replies at CannedResponse rows and compress long ones.
+
+    Walks assistant messages in id order, BATCH_SIZE at a time, with one bulk UPDATE
+    per batch. The batches bound memory; the whole migration is one transaction.
+    """
+    Message = apps.get_model('chat', 'Message')
+    CannedResponse = apps.get_model('chat', 'CannedResponse')
+    db = schema_editor.connection.alias
+    min_length = settings.MESSAGE_COMPRESS_MIN_LENGTH
+    canned_ids = {}
+    last_id = 0
+
+    while True:
+        rows = list(
+            Message.objects.using(db)
+            .filter(sender='assistant', id__gt=last_id, canned__isnull=True, body__isnull=True)
+            .order_by('id')
+            .values_list('id', 'text')[:BATCH_SIZE]
+        )
+        if not rows:
+            break
+        last_id = rows[-1][0]
+
+        updates = []
+        for message_id, text in rows:
+            if text in CANNED_REPLIES:
+                if text not in canned_ids:
+                    canned, _ = CannedResponse.objects.using(db).get_or_create(
+                        digest=hashlib.sha256(text.encode('utf-8')).hexdigest(), defaults={'text': text}
+                    )
+                    canned_ids[text] = canned.id
+                updates.append(Message(id=message_id, text='', canned_id=canned_ids[text]))
+            elif min_length and len(text) >= min_length:
+                raw = text.encode('utf-8')
+                packed = zlib.compress(raw, 6)
+                if len(packed) < len(raw):
+                    updates.append(Message(id=message_id, text='', body=packed))
+        Message.objects.using(db).bulk_update(updates, ['text', 'canned', 'body'], batch_size=500)
+
+
+def expand_messages(apps, schema_editor):
+    """Write canned and compressed bodies back into Message.text, in batches."""
+    Message = apps.get_model('chat', 'Message')
+    CannedResponse = apps.get_model('chat', 'CannedResponse')
+    db = schema_editor.connection.alias
+    canned_texts = dict(CannedResponse.objects.using(db).values_list('id', 'text'))
+    last_id = 0
+
+    while True:
+        rows = list(
+            Message.objects.using(db)
+            .filter(models.Q(canned__isnull=False) | models.Q(body__isnull=False), id__gt=last_id)
+            .order_by('id')
+            .values_list('id', 'canned_id', 'body')[:BATCH_SIZE]
+        )
+        if not rows:
+            break
+        last_id = rows[-1][0]
+
+        updates = [
+            Message(
+                id=message_id, canned_id=None, body=None,
+                text=canned_texts[canned_id] if canned_id is not None else zlib.decompress(bytes(body)).decode('utf-8'),
+            )
+            for message_id, canned_id, body in rows
+        ]
+        Message.objects.using(db).bulk_update(updates, ['text', 'canned', 'body'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    # One transaction: a failed data conversion rolls back the schema changes too, so it can be run again
+    atomic = True
+
+    dependencies = [
+        ('chat', '0009_session_updated_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CannedResponse',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(editable=False, max_length=64, unique=True)),
+                ('text', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='body',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='message',
+            name='text',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='canned',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='chat.cannedresponse'),
+        ),
+        migrations.RunPython(compact_messages, expand_messages),
+    ]
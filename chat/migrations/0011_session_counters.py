@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-19 08:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0010_canned_responses'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='session',
+            name='has_lead',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='session',
+            name='last_message_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='session',
+            name='max_interest_score',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='session',
+            name='message_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='session',
+            index=models.Index(fields=['last_message_at', 'id'], name='chat_session_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='session',
+            index=models.Index(condition=models.Q(('has_lead', True)), fields=['last_message_at', 'id'], name='chat_session_lead_active_idx'),
+        ),
+    ]
@@ -1,5 +1,8 @@
+import hashlib
+import threading
 import uuid
-from django.db import models
+import zlib
+from django.db import models, transaction
 from django.utils import timezone
 
 
@@ -8,14 +11,66 @@ class Session(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Summary fields kept current by every chat turn and lead save, so session listings
+    # need no aggregates over messages and leads (backfill_session_counters fills old rows)
+    message_count = models.PositiveIntegerField(default=0)
+    last_message_at = models.DateTimeField(null=True, blank=True)
+    has_lead = models.BooleanField(default=False)
+    # Highest interest score any lead from this session has reached
+    max_interest_score = models.FloatField(default=0.0)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # prune_sessions walks sessions by last activity
+            models.Index(fields=['updated_at', 'id'], name='chat_session_updated_idx'),
+            # Most recently active sessions, newest first (scanned backwards)
+            models.Index(fields=['last_message_at', 'id'], name='chat_session_active_idx'),
+            # ... and the same for sessions that produced a lead
+            models.Index(
+                fields=['last_message_at', 'id'],
+                name='chat_session_lead_active_idx',
+                condition=models.Q(has_lead=True)
+            ),
+        ]
     
     def __str__(self):
         return f"Session {self.id}"
 
 
+class CannedResponse(models.Model):
+    """A fixed assistant reply (quick response, fallback) stored once and referenced by messages."""
+    digest = models.CharField(max_length=64, unique=True, editable=False)
+    text = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    # Process-wide id -> text map; rows are never changed once written, so it never goes stale
+    _texts = {}
+    _texts_lock = threading.Lock()
+    
+    def __str__(self):
+        return self.text[:50]
+    
+    @staticmethod
+    def digest_for(text: str) -> str:
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+    
+    @classmethod
+    def text_for(cls, canned_id: int) -> str:
+        """Text of a canned response, reading the (small) table once per process."""
+        text = cls._texts.get(canned_id)
+        if text is None:
+            rows = dict(cls.objects.values_list('id', 'text'))
+            text = rows[canned_id]
+            
+            # Rows read inside a transaction that rolls back must not be remembered
+            def remember():
+                with cls._texts_lock:
+                    cls._texts.update(rows)
+            transaction.on_commit(remember)
+        return text
+
+
 class Message(models.Model):
     """Individual messages within a chat session."""
     SENDER_CHOICES = [
@@ -24,15 +79,41 @@ class Message(models.Model):
     ]
     
     session = models.ForeignKey(Session, on_delete=models.CASCADE, related_name='messages')
-    text = models.TextField()
+    # Empty when the body lives in canned or body; read messages through ``content``
+    text = models.TextField(blank=True)
     sender = models.CharField(max_length=10, choices=SENDER_CHOICES)
     timestamp = models.DateTimeField(auto_now_add=True)
+    # Assistant replies sent verbatim from a fixed set point at one shared row instead of repeating the text.
+    # Never queried by, so no index to maintain on every insert
+    canned = models.ForeignKey(CannedResponse, on_delete=models.PROTECT, null=True, blank=True,
+                               related_name='+', db_index=False)
+    # zlib-compressed text of long assistant replies (MESSAGE_COMPRESS_MIN_LENGTH)
+    body = models.BinaryField(null=True, blank=True)
     
     class Meta:
-        ordering = ['timestamp']
+        # Both messages of a turn are inserted together; id breaks timestamp ties
+        ordering = ['timestamp', 'id']
+        indexes = [
+            # Serves keyset history pages: WHERE session = ? ORDER BY timestamp, id
+            models.Index(fields=['session', 'timestamp', 'id'], name='chat_message_session_ts_idx'),
+        ]
     
     def __str__(self):
-        return f"{self.sender}: {self.text[:50]}..."
+        return f"{self.sender}: {self.content[:50]}..."
+    
+    @property
+    def content(self) -> str:
+        """The message text, whichever way it is stored."""
+        return self.resolve_text(self.text, self.canned_id, self.body)
+    
+    @staticmethod
+    def resolve_text(text: str, canned_id=None, body=None) -> str:
+        """Message text from raw column values, for code that reads with values_list()."""
+        if canned_id is not None:
+            return CannedResponse.text_for(canned_id)
+        if body is not None:
+            return zlib.decompress(bytes(body)).decode('utf-8')
+        return text
 
 
 class Lead(models.Model):
@@ -42,14 +123,153 @@ class Lead(models.Model):
     interest_score = models.FloatField(default=0.0)
     source_session = models.ForeignKey(Session, on_delete=models.CASCADE, related_name='leads')
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     notes = models.TextField(blank=True, null=True)
+    # Canonical identity: normalized email, or name + session when there is no email
+    identity_key = models.CharField(max_length=320, null=True, blank=True, editable=False)
     
     class Meta:
         ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['identity_key'], name='chat_lead_identity_key_uniq'),
+        ]
+        indexes = [
+            # Cursor pages of /api/leads/ and created_at range filters
+            models.Index(fields=['created_at', 'id'], name='chat_lead_created_idx'),
+            models.Index(fields=['interest_score', 'created_at'], name='chat_lead_score_idx'),
+            # Incremental exports walk leads in (updated_at, id) order
+            models.Index(fields=['updated_at', 'id'], name='chat_lead_updated_idx'),
+            # has_email=true listings only touch leads with an email
+            models.Index(
+                fields=['created_at', 'id'],
+                name='chat_lead_email_created_idx',
+                condition=models.Q(email__isnull=False)
+            ),
+        ]
     
     def __str__(self):
         return f"Lead: {self.name or 'Unknown'} ({self.email or 'No email'})"
+    
+    @staticmethod
+    def normalize_email(email):
+        """Lower-case and trim an email address; None for blanks."""
+        email = (email or '').strip().lower()
+        return email or None
+    
+    @classmethod
+    def identity_keys(cls, email, name, session_id):
+        """
+        Candidate identity keys for a lead, strongest first.
+        
+        Returns:
+            List of keys: 'email:<email>' and/or 'name:<session>:<name>'
+        """
+        keys = []
+        normalized = cls.normalize_email(email)
+        if normalized:
+            keys.append(f"email:{normalized}")
+        name = ' '.join((name or '').lower().split())
+        if name:
+            keys.append(f"name:{session_id}:{name}")
+        return keys
+    
+    @classmethod
+    def build_identity_key(cls, email, name, session_id):
+        """The canonical identity key for a lead, or None without contact info."""
+        keys = cls.identity_keys(email, name, session_id)
+        return keys[0] if keys else None
 
 
+class SessionLeadState(models.Model):
+    """Running lead qualification state for a session, updated one message at a time."""
+    session = models.OneToOneField(Session, on_delete=models.CASCADE, primary_key=True, related_name='lead_state')
+    name = models.CharField(max_length=255, null=True, blank=True)
+    email = models.EmailField(null=True, blank=True)
+    interest_score = models.FloatField(default=0.0)
+    is_lead = models.BooleanField(default=False)
+    # Short phrases explaining the signals seen so far, newest last
+    evidence = models.JSONField(default=list, blank=True)
+    messages_scored = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Lead state for {self.session_id} ({self.interest_score:.2f})"
+    
+    def summary(self):
+        """
+        Compact description of what earlier messages established, for the qualification prompt.
+        
+        Returns:
+            Summary text, or None before any message has been scored
+        """
+        if not self.messages_scored:
+            return None
+        lines = [
+            f"Name: {self.name or 'unknown'}",
+            f"Email: {self.email or 'unknown'}",
+            f"Interest score so far: {self.interest_score:.2f} after {self.messages_scored} message(s)",
+        ]
+        if self.evidence:
+            lines.append(f"Evidence: {'; '.join(self.evidence)}")
+        return '\n'.join(lines)
+
+
+class LeadJob(models.Model):
+    """Queued lead qualification work, processed by the run_lead_worker command."""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    
+    session = models.ForeignKey(Session, on_delete=models.CASCADE, related_name='lead_jobs')
+    message_text = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    result = models.JSONField(null=True, blank=True)
+    lead = models.ForeignKey(Lead, on_delete=models.SET_NULL, null=True, blank=True, related_name='jobs')
+    error = models.TextField(blank=True, default='')
+    locked_by = models.CharField(max_length=64, blank=True, default='')
+    locked_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='chat_leadjob_status_idx'),
+        ]
+    
+    def __str__(self):
+        return f"LeadJob {self.id} ({self.status})"
 
 
+class DailyRollup(models.Model):
+    """One day's total of one analytics metric, kept current by refresh_rollups."""
+    day = models.DateField()
+    metric = models.CharField(max_length=50)
+    # Breakdown within the metric (sender, canned response id); empty for plain totals
+    key = models.CharField(max_length=100, blank=True, default='')
+    value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['day', 'metric', 'key']
+        constraints = [
+            # Also the index /api/stats/ reads a metric's day range through
+            models.UniqueConstraint(fields=['metric', 'day', 'key'], name='chat_rollup_metric_day_key_uniq'),
+        ]
+    
+    def __str__(self):
+        return f"{self.day} {self.metric}{f'[{self.key}]' if self.key else ''} = {self.value}"
+
+
+class RollupWatermark(models.Model):
+    """Highest row id of a source table that has been folded into the rollups."""
+    source = models.CharField(max_length=50, primary_key=True)
+    last_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.source} up to {self.last_id}"
@@ -1,3 +1,4 @@
+from django.conf import settings
 from rest_framework import serializers
 from .models import Session, Message, Lead
 
@@ -12,6 +13,8 @@ class SessionSerializer(serializers.ModelSerializer):
 
 class MessageSerializer(serializers.ModelSerializer):
     """Serializer for Message model."""
+    # Canned and compressed bodies are presented as plain text
+    text = serializers.CharField(source='content', read_only=True)
     
     class Meta:
         model = Message
@@ -34,11 +37,23 @@ class ChatRequestSerializer(serializers.Serializer):
     message = serializers.CharField(max_length=2000)
 
 
+class ChatBatchRequestSerializer(serializers.Serializer):
+    """Serializer for batch chat requests; each item is validated on its own with ChatRequestSerializer."""
+    items = serializers.ListField(child=serializers.DictField(), allow_empty=False)
+    concurrency = serializers.IntegerField(required=False, min_value=1)
+    
+    def validate_items(self, value):
+        if len(value) > settings.CHAT_BATCH_MAX_ITEMS:
+            raise serializers.ValidationError(f"At most {settings.CHAT_BATCH_MAX_ITEMS} items per batch")
+        return value
+
+
 class ChatResponseSerializer(serializers.Serializer):
     """Serializer for chat response."""
     reply = serializers.CharField()
     session_id = serializers.UUIDField()
     lead_qualified = serializers.BooleanField(default=False)
+    lead_status = serializers.CharField(default='none')
     lead_data = serializers.DictField(required=False)
 
 
@@ -0,0 +1,23 @@
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+def warm_up():
+    """
+    Build the lazily created service singletons before the first request needs them.
+    
+    Called from gunicorn's post_worker_init hook (see gunicorn.conf.py), i.e. in each
+    worker after the fork, so clients and the FAISS index are never shared across
+    processes even when the app is preloaded in the master.
+    """
+    from .llm_client import get_llm_client
+    from .retriever import get_retriever
+    
+    for name, factory in (('llm_client', get_llm_client), ('retriever', get_retriever)):
+        try:
+            factory()
+        except Exception as e:
+            # The first request retries; a failed warmup must not stop the worker booting
+            logger.warning("Warmup of %s failed: %s", name, e)
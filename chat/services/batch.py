@@ -0,0 +1,166 @@
+import contextvars
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Any, List
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+
+from .conversation import conversation_store
+from .deadline import Deadline
+from .lead_qualifier import lead_qualifier
+from .lead_queue import lead_queue
+from .llm_client import FALLBACK_REPLY, get_llm_client
+from .metrics import metrics
+from .retriever import get_retriever
+from .timing import span
+
+
+logger = logging.getLogger(__name__)
+
+
+class BatchChat:
+    """
+    Runs many chat turns per request for QA and evaluation jobs.
+    
+    Turns are grouped by session. Groups run concurrently on a bounded thread
+    pool while the turns inside a group run in order, so a scripted conversation
+    sees its own replies in sequence. Each group is written (in one transaction,
+    with a fixed number of statements) as soon as its replies are in, so work
+    already done survives a batch that runs out of time.
+    
+    The whole batch shares one CHAT_BATCH_DEADLINE budget, kept well below the
+    chat request SLO because a batch holds a sync worker that chat traffic also
+    needs; turns that would start after it are skipped, not run.
+    """
+    
+    def _reply(self, message: str, session_id: str, batch_deadline: Deadline) -> str:
+        """One turn's reply, with the same stages and fallbacks as the chat view."""
+        # generate_reply holds CHAT_DB_RESERVE back itself, which leaves time to persist the group
+        deadline = Deadline(min(settings.CHAT_REQUEST_SLO, batch_deadline.remaining()))
+        context = None
+        if settings.CHAT_RETRIEVAL_ENABLED:
+            if deadline.allows(settings.CHAT_MIN_RETRIEVAL_BUDGET):
+                context = get_retriever().get_context(message, top_k=3)
+            else:
+                deadline.skip('retrieval')
+        try:
+            return get_llm_client().generate_reply(message, session_id, context, deadline=deadline)
+        except Exception:
+            return FALLBACK_REPLY
+    
+    def _run_group(self, turns: List[Dict[str, Any]], deadline: Deadline) -> List[Dict[str, Any]]:
+        """Reply to a session's turns in order; once the batch is out of time the rest get no reply."""
+        try:
+            for turn in turns:
+                if deadline.allows(settings.CHAT_DB_RESERVE + settings.CHAT_MIN_LLM_TIMEOUT):
+                    turn['reply'] = self._reply(turn['message'], str(turn['ref'].id), deadline)
+                else:
+                    turn['reply'] = None
+            return turns
+        finally:
+            # Pool threads get their own DB connection if anything opened one
+            if threading.current_thread() is not threading.main_thread():
+                connection.close()
+    
+    def _persist(self, turns: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Write one group's answered turns and queue their lead qualification; returns the queued turns.
+        
+        A database error rolls back just this group, whose turns are flagged
+        'unsaved' so the other groups' results still go out.
+        """
+        answered = [turn for turn in turns if turn['reply'] is not None]
+        if not answered:
+            return []
+        queued = [turn for turn in answered if lead_qualifier.should_qualify(turn['message'])]
+        try:
+            with span('persist'), transaction.atomic():
+                sessions, _ = conversation_store.persist_turns([(turn['ref'], turn['message'], turn['reply']) for turn in answered])
+                lead_queue.enqueue_many([(sessions[turn['ref'].id], turn['message']) for turn in queued])
+        except DatabaseError as e:
+            logger.warning("Batch chat could not save session %s: %s", answered[0]['ref'].id, e)
+            metrics.increment('chat.batch_persist_errors', len(answered))
+            for turn in answered:
+                turn['unsaved'] = True
+            return []
+        return queued
+    
+    def run(self, items: List[Dict[str, Any]], concurrency: int) -> List[Dict[str, Any]]:
+        """
+        Reply to and persist a list of validated chat items.
+        
+        Lead qualification always goes through the background queue here
+        (lead_status 'pending'), whatever LEAD_QUALIFICATION_MODE says. Items not
+        started before CHAT_BATCH_DEADLINE come back with status 'skipped' and
+        nothing written; items whose session could not be saved come back with
+        status 'error'. Send either again in a later batch.
+        
+        Args:
+            items: Dicts with 'index', 'message' and optional 'session_id'
+            concurrency: Sessions replied to at once
+        
+        Returns:
+            One result dict per item, in the order given
+        """
+        deadline = Deadline(settings.CHAT_BATCH_DEADLINE)
+        # All turns of a session share the SessionRef resolved for its first turn
+        groups = OrderedDict()
+        for item in items:
+            ref = conversation_store.resolve_session(item.get('session_id'))
+            group = groups.setdefault(ref.id, [])
+            group.append(dict(item, ref=group[0]['ref'] if group else ref))
+        
+        queued = []
+        with span('batch_replies'):
+            if concurrency <= 1 or len(groups) == 1:
+                for group in groups.values():
+                    queued += self._persist(self._run_group(group, deadline))
+            else:
+                with ThreadPoolExecutor(max_workers=min(concurrency, len(groups))) as executor:
+                    # Each task gets its own copy of the context, so spans reach this request's timer
+                    futures = [
+                        executor.submit(contextvars.copy_context().run, self._run_group, group, deadline)
+                        for group in groups.values()
+                    ]
+                    # Writes stay on this thread (and its connection), one group at a time as they finish
+                    for future in as_completed(futures):
+                        queued += self._persist(future.result())
+        
+        turns = [turn for group in groups.values() for turn in group]
+        answered = [turn for turn in turns if turn['reply'] is not None]
+        metrics.increment('chat.batch_turns', len(answered))
+        if len(answered) < len(turns):
+            metrics.increment('chat.batch_skipped', len(turns) - len(answered))
+        
+        queued_indexes = {turn['index'] for turn in queued}
+        results = {}
+        for turn in turns:
+            if turn['reply'] is None:
+                results[turn['index']] = {
+                    'index': turn['index'],
+                    'status': 'skipped',
+                    'error': 'Batch deadline reached before this item started; send it again',
+                    'session_id': str(turn['ref'].id),
+                }
+            elif turn.get('unsaved'):
+                results[turn['index']] = {
+                    'index': turn['index'],
+                    'status': 'error',
+                    'error': 'The reply could not be saved; send this item again',
+                    'session_id': str(turn['ref'].id),
+                }
+            else:
+                results[turn['index']] = {
+                    'index': turn['index'],
+                    'status': 'ok',
+                    'reply': turn['reply'],
+                    'session_id': str(turn['ref'].id),
+                    'lead_status': 'pending' if turn['index'] in queued_indexes else 'none',
+                }
+        return [results[item['index']] for item in items]
+
+
+# Global instance
+batch_chat = BatchChat()
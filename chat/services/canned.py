@@ -0,0 +1,63 @@
+import threading
+import zlib
+from typing import Optional
+from django.conf import settings
+from django.db import transaction
+
+from ..models import CannedResponse, Message
+from .llm_client import CANNED_REPLIES
+
+
+class CannedReplies:
+    """Builds assistant messages in their most compact stored form."""
+    
+    def __init__(self):
+        self.compress_min_length = settings.MESSAGE_COMPRESS_MIN_LENGTH
+        # text -> CannedResponse id, filled once the row is known to be committed
+        self._ids = {}
+        self._lock = threading.Lock()
+    
+    def canned_id(self, text: str) -> Optional[int]:
+        """
+        CannedResponse id for a fixed reply, creating the row on first use.
+        
+        Returns:
+            The id, or None when the text is not one of the fixed replies
+        """
+        if text not in CANNED_REPLIES:
+            return None
+        canned_id = self._ids.get(text)
+        if canned_id is None:
+            canned, _ = CannedResponse.objects.get_or_create(
+                digest=CannedResponse.digest_for(text), defaults={'text': text}
+            )
+            canned_id = canned.id
+            
+            # A rolled-back insert must not leave a dangling id behind
+            def remember():
+                with self._lock:
+                    self._ids[text] = canned_id
+            transaction.on_commit(remember)
+        return canned_id
+    
+    def pack(self, text: str) -> Optional[bytes]:
+        """zlib body for a long reply, or None when it is short or doesn't compress."""
+        if not self.compress_min_length or len(text) < self.compress_min_length:
+            return None
+        raw = text.encode('utf-8')
+        packed = zlib.compress(raw, 6)
+        return packed if len(packed) < len(raw) else None
+    
+    def assistant_message(self, session, reply: str) -> Message:
+        """Unsaved assistant Message storing ``reply`` as a canned reference, compressed body or plain text."""
+        canned_id = self.canned_id(reply)
+        if canned_id is not None:
+            return Message(session=session, text='', canned_id=canned_id, sender='assistant')
+        packed = self.pack(reply)
+        if packed is not None:
+            return Message(session=session, text='', body=packed, sender='assistant')
+        return Message(session=session, text=reply, sender='assistant')
+
+
+# Global instance
+canned_replies = CannedReplies()
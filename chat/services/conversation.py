@@ -0,0 +1,176 @@
+import uuid
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+from django.db import transaction
+from django.db.models import Case, Count, Exists, F, Max, OuterRef, PositiveIntegerField, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from ..models import Session, Message, Lead
+from .canned import canned_replies
+
+
+class SessionRef:
+    """
+    What the hot path knows about a session without asking the database.
+    
+    Attributes:
+        id: Session id
+        state: 'new' (id minted for this turn, no row yet) or 'unverified'
+            (id from the client; the row may have been pruned or never existed)
+    """
+    
+    def __init__(self, session_id: uuid.UUID, state: str):
+        self.id = session_id
+        self.state = state
+
+
+class ConversationStore:
+    """Persists chat turns with as few database round-trips as possible."""
+    
+    def resolve_session(self, session_id: Optional[uuid.UUID] = None) -> SessionRef:
+        """
+        Work out which session a turn belongs to without touching the database.
+        
+        A client-held id is not looked up: the turn's write bumps the row with an
+        UPDATE and creates it when that matched nothing (e.g. it was pruned).
+        
+        Args:
+            session_id: Session id sent by the client, if any
+        
+        Returns:
+            SessionRef for the turn
+        """
+        if session_id is None:
+            return SessionRef(uuid.uuid4(), 'new')
+        return SessionRef(session_id, 'unverified')
+    
+    def _session_stub(self, session_id: uuid.UUID, now) -> Session:
+        """A saved-looking Session for foreign keys; callers only need the id, so the row isn't re-read."""
+        session = Session(id=session_id, updated_at=now)
+        session._state.adding = False
+        session._state.db = Session.objects.db
+        return session
+    
+    def persist_turn(self, ref: SessionRef, user_text: str, reply: str) -> Tuple[Session, Message, Message]:
+        """
+        Write one chat turn as a single atomic unit.
+        
+        New sessions are inserted with their counters set; existing ones get one
+        UPDATE that bumps message_count, last_message_at and updated_at in place,
+        falling back to an insert when that matched nothing (ON CONFLICT DO NOTHING
+        guards against a concurrent first turn). Both messages go out in one bulk
+        INSERT. Joins the caller's transaction if there is one, so db_deadline()
+        bounds the whole turn.
+        
+        Args:
+            ref: Session from resolve_session
+            user_text: The user's message
+            reply: The assistant's reply
+        
+        Returns:
+            Tuple of (session, user message, assistant message)
+        """
+        now = timezone.now()
+        with transaction.atomic(savepoint=False):
+            created = Session(id=ref.id, message_count=2, last_message_at=now)
+            if ref.state == 'new':
+                Session.objects.bulk_create([created], ignore_conflicts=True)
+            elif not Session.objects.filter(id=ref.id).update(
+                message_count=F('message_count') + 2, last_message_at=now, updated_at=now
+            ):
+                Session.objects.bulk_create([created], ignore_conflicts=True)
+            session = self._session_stub(ref.id, now)
+            
+            # bulk_create keeps list order, so the user message gets the lower id
+            user_message, ai_message = Message.objects.bulk_create([
+                Message(session=session, text=user_text, sender='user'),
+                canned_replies.assistant_message(session, reply),
+            ])
+        return session, user_message, ai_message
+    
+    
+    def persist_turns(self, turns: List[Tuple[SessionRef, str, str]]) -> Tuple[Dict[uuid.UUID, Session], List[Tuple[Message, Message]]]:
+        """
+        Write many chat turns with a fixed number of statements.
+        
+        One UPDATE bumps the counters of every known session (a CASE adds each
+        one's own message count), one INSERT ... ON CONFLICT DO NOTHING creates the
+        new ones and any the UPDATE missed (e.g. pruned since the client's last turn),
+        and one bulk INSERT writes all messages in turn order, so each session's
+        messages keep their order.
+        Turns of the same session must share one SessionRef. Joins the caller's
+        transaction if there is one.
+        
+        Args:
+            turns: (ref, user_text, reply) per turn
+        
+        Returns:
+            Tuple of (sessions by id, (user message, assistant message) per turn)
+        """
+        now = timezone.now()
+        refs = {}
+        for ref, _, _ in turns:
+            refs.setdefault(ref.id, ref)
+        existing = [ref.id for ref in refs.values() if ref.state != 'new']
+        added = Counter()
+        for ref, _, _ in turns:
+            added[ref.id] += 2
+        
+        with transaction.atomic(savepoint=False):
+            if existing:
+                by_count = {}
+                for session_id in existing:
+                    by_count.setdefault(added[session_id], []).append(session_id)
+                increment = Case(
+                    *[When(id__in=ids, then=Value(count)) for count, ids in by_count.items()],
+                    output_field=PositiveIntegerField(),
+                )
+                Session.objects.filter(id__in=existing).update(
+                    message_count=F('message_count') + increment, last_message_at=now, updated_at=now
+                )
+            # Every session is upserted: rows the UPDATE matched are left alone by the conflict
+            Session.objects.bulk_create([
+                Session(id=session_id, message_count=added[session_id], last_message_at=now)
+                for session_id in refs
+            ], ignore_conflicts=True)
+            sessions = {session_id: self._session_stub(session_id, now) for session_id in refs}
+            
+            messages = Message.objects.bulk_create([
+                message
+                for ref, user_text, reply in turns
+                for message in (
+                    Message(session=sessions[ref.id], text=user_text, sender='user'),
+                    canned_replies.assistant_message(sessions[ref.id], reply),
+                )
+            ])
+        return sessions, list(zip(messages[::2], messages[1::2]))
+    
+    def recount_sessions(self, session_ids) -> int:
+        """
+        Recompute the summary fields of the given sessions from their messages and leads.
+        
+        For backfills and for bulk changes that bypass the per-turn updates (pruning
+        messages, bulk lead writes). One UPDATE with correlated subqueries, each riding
+        the per-session message and lead indexes. updated_at is left alone.
+        
+        Args:
+            session_ids: Ids (or a subquery of ids) of the sessions to recount
+        
+        Returns:
+            Number of sessions updated
+        """
+        messages = Message.objects.filter(session=OuterRef('pk')).order_by()
+        leads = Lead.objects.filter(source_session=OuterRef('pk')).order_by()
+        return Session.objects.filter(id__in=session_ids).update(
+            message_count=Coalesce(Subquery(messages.values('session').annotate(n=Count('id')).values('n')), 0),
+            last_message_at=Subquery(messages.order_by('-timestamp', '-id').values('timestamp')[:1]),
+            has_lead=Exists(leads),
+            max_interest_score=Coalesce(
+                Subquery(leads.values('source_session').annotate(score=Max('interest_score')).values('score')), 0.0
+            ),
+        )
+
+
+# Global instance
+conversation_store = ConversationStore()
@@ -0,0 +1,71 @@
+import time
+from contextlib import contextmanager
+from typing import Optional
+from django.db import connections, transaction
+
+from .metrics import metrics
+
+
+class Deadline:
+    """Time budget for one request, shared by every stage that handles it."""
+    
+    def __init__(self, budget: float):
+        self.budget = budget
+        self.started_at = time.monotonic()
+        self.expires_at = self.started_at + budget
+    
+    def remaining(self) -> float:
+        """Seconds left before the deadline (never negative)."""
+        return max(self.expires_at - time.monotonic(), 0.0)
+    
+    def elapsed(self) -> float:
+        """Seconds since the deadline was created."""
+        return time.monotonic() - self.started_at
+    
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+    
+    def allows(self, seconds: float) -> bool:
+        """True if at least ``seconds`` of budget are left."""
+        return self.remaining() >= seconds
+    
+    def timeout(self, cap: Optional[float] = None, reserve: float = 0.0) -> float:
+        """
+        Timeout for the next stage.
+        
+        Args:
+            cap: Upper bound for the stage, e.g. the client's own default timeout
+            reserve: Budget held back for stages that must still run afterwards
+        
+        Returns:
+            Seconds the stage may take (0 when nothing is left)
+        """
+        available = max(self.remaining() - reserve, 0.0)
+        if cap is not None:
+            available = min(available, cap)
+        return available
+    
+    def skip(self, stage: str):
+        """Record that an optional stage was skipped for lack of time."""
+        metrics.increment('deadline.skipped', stage=stage)
+
+
+@contextmanager
+def db_deadline(deadline: Optional[Deadline], using: str = 'default', floor: float = 0.0):
+    """
+    Run a block of DB statements atomically, bounded by the remaining budget.
+    
+    On PostgreSQL the transaction gets a ``statement_timeout`` equal to the time
+    left, but never less than ``floor``; other backends just get the transaction.
+    Optional work can use the bare budget. Writes that must land (the chat turn,
+    a qualified lead) pass floor=CHAT_DB_WRITE_TIMEOUT, so a request that is
+    already late still gets to save what it has.
+    """
+    connection = connections[using]
+    with transaction.atomic(using=using):
+        if deadline is not None and connection.vendor == 'postgresql':
+            timeout_ms = max(int(max(deadline.remaining(), floor) * 1000), 1)
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL statement_timeout = %s", [timeout_ms])
+        yield
@@ -0,0 +1,133 @@
+import csv
+import json
+from datetime import datetime, timedelta
+from typing import Iterator, Optional, Iterable, Sequence
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from ..models import Lead, Message
+from ..pagination import InvalidPage, encode_position, decode_position
+
+
+LEAD_EXPORT_FIELDS = ['cursor', 'id', 'name', 'email', 'interest_score', 'source_session', 'created_at', 'updated_at', 'notes']
+TRANSCRIPT_EXPORT_FIELDS = ['cursor', 'id', 'session', 'sender', 'text', 'timestamp']
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+class _Echo:
+    """File-like object whose write() returns the line, so csv.writer can feed a generator."""
+    
+    def write(self, value):
+        return value
+
+
+class Exporter:
+    """Streams leads and transcripts row by row for CRM syncs."""
+    
+    def __init__(self):
+        self.chunk_size = settings.EXPORT_CHUNK_SIZE
+    
+    def _cutoff(self, lag: Optional[float]) -> datetime:
+        """Rows stamped at or after this may still have an older write committing behind them."""
+        return timezone.now() - timedelta(seconds=settings.EXPORT_LAG if lag is None else lag)
+    
+    def lead_rows(self, since: Optional[str] = None, lag: Optional[float] = None) -> Iterator[dict]:
+        """
+        Leads created or updated after ``since``, oldest change first.
+        
+        Leads are upserted, so the sync cursor is the (updated_at, id) position
+        of the last row a client saw; passing it back returns only what changed.
+        updated_at is stamped before the write commits, so a slow transaction can
+        commit a lower position after a client has moved past it. Leads changed in
+        the last ``lag`` seconds (EXPORT_LAG by default) wait for the next sync,
+        which keeps every cursor behind writes that may still be in flight.
+        
+        Raises:
+            InvalidPage: If ``since`` does not decode
+        """
+        leads = Lead.objects.filter(updated_at__lt=self._cutoff(lag)).order_by('updated_at', 'id')
+        if since:
+            updated_at, lead_id = decode_position(since)
+            leads = leads.filter(updated_at__gte=updated_at).filter(
+                Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, id__gt=lead_id)
+            )
+        # Filters are built here so a bad cursor fails before any bytes are streamed
+        return self._lead_rows(leads)
+    
+    def _lead_rows(self, leads) -> Iterator[dict]:
+        columns = ('id', 'name', 'email', 'interest_score', 'source_session_id', 'created_at', 'updated_at', 'notes')
+        for row in leads.values_list(*columns).iterator(chunk_size=self.chunk_size):
+            lead_id, name, email, score, session_id, created_at, updated_at, notes = row
+            yield {
+                'cursor': encode_position(updated_at, lead_id),
+                'id': lead_id,
+                'name': name,
+                'email': email,
+                'interest_score': score,
+                'source_session': str(session_id),
+                'created_at': created_at.isoformat(),
+                'updated_at': updated_at.isoformat(),
+                'notes': notes,
+            }
+    
+    def transcript_rows(self, since: Optional[str] = None, session_id=None, lag: Optional[float] = None) -> Iterator[dict]:
+        """
+        Messages inserted after ``since``, in insertion order.
+        
+        Messages are append-only, so the sync cursor is simply the last message id.
+        Ids are allocated before commit, so a higher id can become visible first.
+        The stream stops at the first message younger than ``lag`` seconds
+        (EXPORT_LAG by default); lower ids still being written are never skipped.
+        
+        Raises:
+            InvalidPage: If ``since`` is not a message id
+        """
+        messages = Message.objects.order_by('id')
+        if since:
+            try:
+                messages = messages.filter(id__gt=int(since))
+            except ValueError as e:
+                raise InvalidPage(f"Invalid cursor: {since}") from e
+        if session_id:
+            messages = messages.filter(session_id=session_id)
+        return self._transcript_rows(messages, self._cutoff(lag))
+    
+    def _transcript_rows(self, messages, cutoff) -> Iterator[dict]:
+        columns = ('id', 'session_id', 'sender', 'text', 'canned_id', 'body', 'timestamp')
+        for message_id, session, sender, text, canned_id, body, timestamp in messages.values_list(*columns).iterator(chunk_size=self.chunk_size):
+            if timestamp >= cutoff:
+                return
+            yield {
+                'cursor': str(message_id),
+                'id': message_id,
+                'session': str(session),
+                'sender': sender,
+                'text': Message.resolve_text(text, canned_id, body),
+                'timestamp': timestamp.isoformat(),
+            }
+    
+    def render(self, rows: Iterable[dict], fields: Sequence[str], fmt: str) -> Iterator[str]:
+        """
+        Encode rows as CSV (with a header line) or NDJSON, one line at a time.
+        
+        Args:
+            rows: Row dictionaries from lead_rows/transcript_rows
+            fields: Column order for CSV
+            fmt: 'csv' or 'ndjson'
+        """
+        if fmt == 'csv':
+            writer = csv.writer(_Echo())
+            yield writer.writerow(fields)
+            for row in rows:
+                yield writer.writerow([row[field] for field in fields])
+        else:
+            for row in rows:
+                yield json.dumps(row, ensure_ascii=False) + '\n'
+
+
+# Global instance
+exporter = Exporter()
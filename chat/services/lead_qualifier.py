@@ -1,36 +1,69 @@
-from typing import Dict, Any
-from .llm_client import llm_client
+import re
+from typing import Dict, Any, Optional
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from ..models import Lead, Session, SessionLeadState
+from .deadline import Deadline
+from .llm_client import get_llm_client
+from .timing import span
+
+
+LEAD_KEYWORDS = ['email', 'contact', 'hire', 'project', 'budget']
+
+# Self-introductions ("I'm Ann", "my name is Ann") carry a name worth remembering for later turns
+NAME_INTRO = re.compile(r"\b(?:my name is|i'm|i am|this is|call me)\s+[A-Z]", re.IGNORECASE)
 
 
 class LeadQualifier:
     """Service for qualifying leads from chat messages."""
     
-    def __init__(self):
-        self.llm_client = llm_client
+    @property
+    def llm_client(self):
+        return get_llm_client()
+    
+    def should_qualify(self, message: str) -> bool:
+        """
+        Cheap pre-filter deciding whether a message is worth an LLM qualification call.
+        
+        Args:
+            message: User message
+        
+        Returns:
+            True if the message contains contact info or buying intent keywords
+        """
+        text = message.lower()
+        return '@' in text or any(word in text for word in LEAD_KEYWORDS) or bool(NAME_INTRO.search(message))
     
-    def qualify_lead(self, message: str) -> Dict[str, Any]:
+    def qualify_lead(self, message: str, deadline: Optional[Deadline] = None, session=None,
+                     raise_errors: bool = False) -> Dict[str, Any]:
         """
         Qualify a lead from a chat message.
         
+        With a session, the message is scored against that session's running
+        qualification state and the state is updated, so a name given in one
+        turn and an email in a later one combine into one lead.
+        
         Args:
             message: User message to analyze
-            
+            deadline: Optional request deadline bounding the LLM call
+            session: Optional session whose qualification state to use and update
+            raise_errors: Raise LLM and database errors instead of returning a non-lead.
+                The queue worker sets this so failed jobs are retried; the inline
+                chat path keeps the safe default
+        
         Returns:
             Dictionary with qualification results
         """
         try:
-            result = self.llm_client.classify_and_extract(message)
-            
-            # Additional validation
-            if result.get('is_lead'):
-                # Ensure we have at least name or email
-                if not result.get('name') and not result.get('email'):
-                    result['is_lead'] = False
-                    result['interest_score'] = 0.0
-            
-            return result
-            
+            return self.finish(self.classify(message, deadline, session, raise_errors), session)
+        
         except Exception as e:
+            if raise_errors:
+                raise
             # Return safe default on error
             return {
                 'is_lead': False,
@@ -39,13 +72,56 @@ class LeadQualifier:
                 'interest_score': 0.0
             }
     
+    def classify(self, message: str, deadline: Optional[Deadline] = None, session=None,
+                 raise_errors: bool = False) -> Dict[str, Any]:
+        """
+        First half of qualify_lead: the LLM call, reading but not updating the session state.
+        
+        Callers that need the state update to commit together with their own
+        writes call finish() inside their transaction.
+        """
+        if session is None:
+            with span('classify'):
+                return self.llm_client.classify_and_extract(message, deadline=deadline, raise_errors=raise_errors)
+        with span('lead_state'):
+            state = SessionLeadState.objects.filter(session=session).first()
+            summary = state.summary() if state is not None else None
+        with span('classify'):
+            return self.llm_client.classify_and_extract(
+                message, deadline=deadline, state_summary=summary, raise_errors=raise_errors
+            )
+    
+    def finish(self, result: Dict[str, Any], session=None) -> Dict[str, Any]:
+        """
+        Second half of qualify_lead: fold a classification into the session state and validate it.
+        
+        Args:
+            result: Classification from classify()
+            session: Optional session whose qualification state to update
+        
+        Returns:
+            Dictionary with qualification results
+        """
+        if session is not None:
+            with span('lead_state'):
+                result = self.update_state(session, result)
+        
+        # Additional validation
+        if result.get('is_lead'):
+            # Ensure we have at least name or email
+            if not result.get('name') and not result.get('email'):
+                result['is_lead'] = False
+                result['interest_score'] = 0.0
+        
+        return result
+    
     def should_save_lead(self, qualification_result: Dict[str, Any]) -> bool:
         """
         Determine if a lead should be saved based on qualification results.
         
         Args:
             qualification_result: Result from qualify_lead
-            
+        
         Returns:
             True if lead should be saved
         """
@@ -54,6 +130,128 @@ class LeadQualifier:
             qualification_result.get('interest_score', 0.0) > 0.3 and
             (qualification_result.get('name') or qualification_result.get('email'))
         )
+    
+    
+    def update_state(self, session, result: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Fold one message's classification into the session's qualification state.
+        
+        Args:
+            session: Session the message came from
+            result: Classification of the new message
+        
+        Returns:
+            Qualification result for the conversation so far
+        """
+        with transaction.atomic():
+            state, _ = SessionLeadState.objects.select_for_update().get_or_create(session=session)
+            state.name = state.name or result.get('name')
+            state.email = state.email or Lead.normalize_email(result.get('email'))
+            state.interest_score = self.merge_score(state.interest_score, state.updated_at, result.get('interest_score', 0.0))
+            state.is_lead = state.is_lead or bool(result.get('is_lead'))
+            evidence = result.get('evidence')
+            if isinstance(evidence, str) and evidence.strip():
+                state.evidence = (state.evidence + [evidence.strip()[:120]])[-settings.LEAD_STATE_MAX_EVIDENCE:]
+            state.messages_scored += 1
+            state.save()
+        
+        return {
+            'is_lead': state.is_lead,
+            'name': state.name,
+            'email': state.email,
+            'interest_score': state.interest_score,
+        }
+    
+    def merge_score(self, existing_score: float, existing_updated_at, new_score: float) -> float:
+        """
+        Combine a lead's stored interest score with a new one.
+        
+        With LEAD_SCORE_MERGE='max' the higher score wins. With 'decay' the stored
+        score first halves every LEAD_SCORE_HALF_LIFE_DAYS, so stale interest fades.
+        """
+        if settings.LEAD_SCORE_MERGE == 'decay' and existing_updated_at is not None:
+            age_days = max((timezone.now() - existing_updated_at).total_seconds(), 0) / 86400
+            existing_score *= 0.5 ** (age_days / settings.LEAD_SCORE_HALF_LIFE_DAYS)
+        return max(existing_score, new_score)
+    
+    def merge_lead(self, lead: Lead, name: Optional[str], email: Optional[str], score: float, notes: Optional[str]) -> Lead:
+        """Merge new evidence into an existing lead (not saved)."""
+        lead.interest_score = self.merge_score(lead.interest_score, lead.updated_at, score)
+        lead.name = lead.name or name
+        lead.email = lead.email or email
+        if notes:
+            combined = f"{lead.notes}\n{notes}" if lead.notes else notes
+            # Keep the most recent notes when a lead keeps coming back
+            lead.notes = combined[-settings.LEAD_NOTES_MAX_LENGTH:]
+        return lead
+    
+    def _find_lead(self, keys):
+        """Locked lookup of the existing lead for the strongest matching identity key."""
+        matches = {lead.identity_key: lead for lead in Lead.objects.select_for_update().filter(identity_key__in=keys)}
+        return next((matches[key] for key in keys if key in matches), None)
+    
+    def _mark_session(self, lead: Lead):
+        """Flag the lead's source session and raise its max_interest_score, in place."""
+        Session.objects.filter(id=lead.source_session_id).update(
+            has_lead=True, max_interest_score=Greatest('max_interest_score', Value(lead.interest_score))
+        )
+    
+    def save_lead(self, session, qualification_result: Dict[str, Any], message: str) -> Lead:
+        """
+        Upsert a qualified lead keyed by its canonical identity.
+        
+        A lead is identified by its normalized email, or by name + session when
+        there is no email. Repeat sightings merge into the existing row. The lead's
+        source session summary (has_lead, max_interest_score) is updated in the
+        same transaction.
+        
+        Args:
+            session: Session the message came from
+            qualification_result: Result from qualify_lead
+            message: Message the lead was qualified from
+        
+        Returns:
+            The created or updated Lead
+        """
+        name = qualification_result.get('name')
+        email = Lead.normalize_email(qualification_result.get('email'))
+        score = qualification_result.get('interest_score', 0.0)
+        notes = f"Qualified from message: {message[:200]}"
+        keys = Lead.identity_keys(email, name, session.id)
+        
+        with transaction.atomic():
+            lead = self._find_lead(keys)
+            if lead is None:
+                try:
+                    with transaction.atomic():
+                        lead = Lead.objects.create(
+                            name=name,
+                            email=email,
+                            interest_score=score,
+                            source_session=session,
+                            notes=notes,
+                            identity_key=keys[0] if keys else None
+                        )
+                    self._mark_session(lead)
+                    return lead
+                except IntegrityError:
+                    # Another worker created it first; merge into theirs
+                    lead = self._find_lead(keys)
+            
+            self.merge_lead(lead, name, email, score, notes)
+            # A name-only lead that now has an email is promoted to the email identity
+            if keys and lead.identity_key != keys[0] and not Lead.objects.filter(identity_key=keys[0]).exists():
+                lead.identity_key = keys[0]
+            lead.save()
+            self._mark_session(lead)
+            return lead
+
+
+def __getattr__(name):
+    # The shared LLM client is created lazily; see llm_client.get_llm_client
+    if name == 'llm_client':
+        return get_llm_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 # Global instance
@@ -0,0 +1,134 @@
+import uuid
+from datetime import timedelta
+from typing import Any, List, Tuple
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from ..models import LeadJob
+from .lead_qualifier import lead_qualifier
+from .metrics import metrics
+
+
+class LeadQueue:
+    """DB-backed queue that moves lead qualification off the request path."""
+    
+    def __init__(self):
+        self.max_attempts = settings.LEAD_JOB_MAX_ATTEMPTS
+        self.stale_after = settings.LEAD_JOB_STALE_AFTER
+    
+    def enqueue(self, session, message_text: str) -> LeadJob:
+        """
+        Queue a message for lead qualification.
+        
+        Args:
+            session: Session the message belongs to
+            message_text: User message to qualify
+        
+        Returns:
+            The created job
+        """
+        job = LeadJob.objects.create(session=session, message_text=message_text)
+        metrics.increment('lead_queue.enqueued')
+        return job
+    
+    def enqueue_many(self, items: List[Tuple[Any, str]]) -> List[LeadJob]:
+        """
+        Queue several messages in one INSERT.
+        
+        Args:
+            items: (session, message_text) pairs
+        
+        Returns:
+            The created jobs, in order
+        """
+        jobs = LeadJob.objects.bulk_create([
+            LeadJob(session=session, message_text=message_text) for session, message_text in items
+        ])
+        if jobs:
+            metrics.increment('lead_queue.enqueued', len(jobs))
+        return jobs
+    
+    def claim(self, limit: int) -> List[LeadJob]:
+        """
+        Atomically claim up to ``limit`` pending jobs for this worker.
+        
+        Uses SELECT ... FOR UPDATE SKIP LOCKED where the database supports it so
+        concurrent workers never block on or double-process the same rows. On
+        SQLite, where writes are serialized anyway, a conditional UPDATE does the claim.
+        """
+        claim_token = uuid.uuid4().hex
+        pending = LeadJob.objects.filter(status='pending').order_by('created_at')
+        
+        with transaction.atomic():
+            if connection.features.has_select_for_update_skip_locked:
+                ids = list(pending.select_for_update(skip_locked=True).values_list('id', flat=True)[:limit])
+            else:
+                ids = list(pending.values_list('id', flat=True)[:limit])
+            
+            if not ids:
+                return []
+            
+            LeadJob.objects.filter(id__in=ids, status='pending').update(
+                status='running',
+                locked_by=claim_token,
+                locked_at=timezone.now(),
+                attempts=F('attempts') + 1
+            )
+        
+        return list(LeadJob.objects.filter(locked_by=claim_token, status='running').select_related('session'))
+    
+    def process(self, job: LeadJob) -> LeadJob:
+        """
+        Qualify the job's message and save a lead when it qualifies.
+        
+        Failed jobs are retried until LEAD_JOB_MAX_ATTEMPTS, then marked failed.
+        The LLM call runs outside the transaction; the session state update, the
+        lead and the job's outcome commit together, so a retried job never folds
+        its message into the session state twice.
+        """
+        try:
+            classified = lead_qualifier.classify(job.message_text, session=job.session, raise_errors=True)
+            with transaction.atomic():
+                lead_data = lead_qualifier.finish(classified, session=job.session)
+                if lead_qualifier.should_save_lead(lead_data):
+                    job.lead = lead_qualifier.save_lead(job.session, lead_data, job.message_text)
+                job.result = lead_data
+                job.status = 'done'
+                job.error = ''
+                job.save(update_fields=['lead', 'result', 'status', 'error', 'updated_at'])
+            metrics.increment('lead_queue.processed', qualified=job.lead_id is not None)
+        except Exception as e:
+            job.status = 'failed' if job.attempts >= self.max_attempts else 'pending'
+            job.error = str(e)[:1000]
+            job.save(update_fields=['status', 'error', 'updated_at'])
+            metrics.increment('lead_queue.errors')
+        return job
+    
+    def requeue_stale(self) -> int:
+        """
+        Return jobs held by crashed workers to the queue.
+        
+        A job that has already used LEAD_JOB_MAX_ATTEMPTS is marked failed instead,
+        so a message that keeps killing its worker is not retried forever.
+        """
+        cutoff = timezone.now() - timedelta(seconds=self.stale_after)
+        stale = LeadJob.objects.filter(status='running', locked_at__lt=cutoff)
+        exhausted = stale.filter(attempts__gte=self.max_attempts).update(
+            status='failed', locked_by='', error='Worker stopped while processing the job'
+        )
+        if exhausted:
+            metrics.increment('lead_queue.errors', exhausted)
+        return stale.update(status='pending', locked_by='')
+    
+    def run_once(self, limit: int = 10) -> int:
+        """Claim and process one batch of jobs in the current thread."""
+        jobs = self.claim(limit)
+        for job in jobs:
+            self.process(job)
+        return len(jobs)
+
+
+# Global instance
+lead_queue = LeadQueue()
@@ -0,0 +1,165 @@
+import atexit
+import glob
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from collections import defaultdict
+from types import SimpleNamespace
+from typing import Dict, Any, List
+
+from .metrics import metrics
+
+
+class CassetteMiss(Exception):
+    """Replay got a request that isn't on the cassette."""
+
+
+class CassetteError(Exception):
+    """Replay of a request whose recorded call failed (e.g. timed out)."""
+
+
+def request_key(messages: List[Dict[str, str]]) -> str:
+    """
+    Cassette key for a request: a hash of its messages.
+    
+    The model, temperature and max_tokens come from the model router, whose choice
+    depends on live latencies, so they are recorded but not matched on.
+    """
+    canonical = json.dumps([[m['role'], m['content']] for m in messages], ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:32]
+
+
+def _response(content: str, usage: Dict[str, int]) -> SimpleNamespace:
+    """An object shaped like the OpenAI chat completion response."""
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+        usage=SimpleNamespace(**usage),
+    )
+
+
+class _Completions:
+    def __init__(self, create):
+        self.create = create
+
+
+class RecordingClient:
+    """
+    Wraps an OpenAI(-like) client and appends every chat completion to a cassette.
+    
+    The cassette is gzip-compressed JSON lines, one per call: key, request,
+    content, token usage and latency (or the error). Each line is flushed as it
+    is written, so a killed process loses at most the call in flight.
+    """
+    
+    def __init__(self, inner, path: str):
+        self.inner = inner
+        # One file per process; several workers appending to one gzip stream would interleave
+        self.path = path.format(pid=os.getpid())
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._file = gzip.open(self.path, 'at', encoding='utf-8')
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=_Completions(self._create))
+        atexit.register(self.close)
+    
+    def _write(self, record: Dict[str, Any]):
+        line = json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+        with self._lock:
+            if self._file is not None:
+                self._file.write(line)
+                self._file.flush()
+    
+    def _create(self, model, messages, **kwargs):
+        record = {
+            'key': request_key(messages),
+            'request': {'model': model, 'messages': messages, 'temperature': kwargs.get('temperature'),
+                        'max_tokens': kwargs.get('max_tokens')},
+        }
+        started = time.monotonic()
+        try:
+            response = self.inner.chat.completions.create(model=model, messages=messages, **kwargs)
+        except Exception as e:
+            record.update(error=type(e).__name__, latency=round(time.monotonic() - started, 4))
+            self._write(record)
+            raise
+        usage = getattr(response, 'usage', None)
+        record.update(
+            content=response.choices[0].message.content,
+            usage={
+                'prompt_tokens': getattr(usage, 'prompt_tokens', 0),
+                'completion_tokens': getattr(usage, 'completion_tokens', 0),
+            },
+            latency=round(time.monotonic() - started, 4),
+        )
+        self._write(record)
+        return response
+    
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def load_cassette(path: str) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Read cassette records grouped by key, in recorded order.
+    
+    ``path`` may be a glob; a ``{pid}`` placeholder, as used when recording, matches every worker's file.
+    A file cut short by a killed process is read up to the last complete line.
+    """
+    records = defaultdict(list)
+    pattern = path.replace('{pid}', '*')
+    paths = sorted(glob.glob(pattern)) or [path]
+    for cassette in paths:
+        with gzip.open(cassette, 'rt', encoding='utf-8') as f:
+            try:
+                for line in f:
+                    if line.endswith('\n'):
+                        record = json.loads(line)
+                        records[record['key']].append(record)
+            except (EOFError, zlib.error):
+                pass
+    return dict(records)
+
+
+class ReplayClient:
+    """
+    Serves chat completions from a cassette instead of calling OpenAI.
+    
+    A request recorded several times gets its recordings in order, then the
+    last one again. Recorded failures raise CassetteError and unknown requests
+    raise CassetteMiss, so LLMClient answers them with its usual fallback.
+    
+    Args:
+        path: Cassette file or glob
+        latency_scale: Sleep for this multiple of each recorded latency (0 = answer at once)
+    """
+    
+    def __init__(self, path: str, latency_scale: float = 0.0):
+        self.records = load_cassette(path)
+        self.latency_scale = latency_scale
+        self._served = defaultdict(int)
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=_Completions(self._create))
+    
+    def _create(self, model, messages, timeout=None, **kwargs):
+        key = request_key(messages)
+        recorded = self.records.get(key)
+        if not recorded:
+            metrics.increment('llm.cassette', result='miss')
+            raise CassetteMiss(key)
+        with self._lock:
+            record = recorded[min(self._served[key], len(recorded) - 1)]
+            self._served[key] += 1
+        
+        if self.latency_scale:
+            delay = record['latency'] * self.latency_scale
+            time.sleep(delay if timeout is None else min(delay, timeout))
+        metrics.increment('llm.cassette', result='hit')
+        if 'error' in record:
+            raise CassetteError(record['error'])
+        return _response(record['content'], record['usage'])
@@ -2,10 +2,55 @@ import os
 import time
 import hashlib
 import json
-from typing import Optional, Dict, Any
+import threading
+from typing import Optional, Dict, Any, List
 from django.core.cache import cache
 from django.conf import settings
-from openai import OpenAI
+
+from .deadline import Deadline
+from .model_router import model_router
+from .timing import span
+
+
+# Fixed replies; messages that carry one verbatim are stored as a CannedResponse reference
+UNAVAILABLE_REPLY = "I apologize, but I'm currently unavailable. Please try again later."
+FALLBACK_REPLY = "I apologize, but I'm experiencing technical difficulties. Please try again later."
+RETRY_REPLY = "I apologize, but I'm experiencing technical difficulties. Please try again in a moment."
+
+QUICK_RESPONSES = {
+    'hi': "Hello! I'm Swastik's AI assistant. I help businesses with AI solutions like chatbots, automation, and custom AI models. What's your business looking to achieve with AI?",
+    'hello': "Hello! I'm Swastik's AI assistant. I help businesses with AI solutions like chatbots, automation, and custom AI models. What's your business looking to achieve with AI?",
+    'what services': "Swastik offers: Chatbots ($150-300), Automation ($200-400), AI models ($300-600), Full-stack projects ($500-1200). What type of project are you considering?",
+    'pricing': "Pricing: Chatbots $150-300, Automation $200-400, AI models $300-600, Full-stack $500-1200. What's your budget range for this project?",
+    'how much': "Chatbots: $150-300, Automation: $200-400, AI models: $300-600, Full-stack: $500-1200. What's your timeline and budget for this project?",
+    'contact': "Contact Swastik: https://www.upwork.com/freelancers/~01a3695131c30e858f - Free consultations! What's your project timeline?",
+    'hire': "Hire Swastik: https://www.upwork.com/freelancers/~01a3695131c30e858f - Budget-friendly AI solutions! What's your project about?",
+    'upwork': "Swastik's Upwork: https://www.upwork.com/freelancers/~01a3695131c30e858f",
+    'chatbot': "Swastik builds custom chatbots for $150-300. What's your main use case - customer service, lead generation, or sales support?",
+    'automation': "Swastik creates automation workflows using Botpress, Make.com, Zapier, n8n. Starting at $200-400! What processes do you want to automate?",
+    'ai model': "Swastik develops custom AI models for $300-600. Text classification, sentiment analysis, predictive modeling! What data do you have?",
+    'project': "Swastik delivers full-stack AI projects for $500-1200. Complete solutions with frontend, backend, and AI integration! What's your project scope?",
+    'startup': "Perfect for startups! Swastik offers budget-friendly AI solutions with 20% discount and payment plans. What's your startup's main challenge?",
+    'budget': "Budget-friendly pricing: Chatbots $150-300, Automation $200-400, AI models $300-600. 20% startup discount! What's your budget range?",
+    'business': "Great! What industry is your business in? And what's your main challenge that AI could help solve?",
+    'company': "Excellent! What's your company size and what's your biggest operational challenge right now?",
+    'need': "Perfect! What specific AI solution do you need? And what's your timeline for this project?",
+    'want': "Great! What's your budget range for this project? And when do you need it completed?",
+    'looking': "Excellent! What's your business type and what's your main goal with AI?",
+    'interested': "Perfect! What's your project about and what's your budget range?",
+    'considering': "Great! What's your timeline for this project and what's your main challenge?",
+    'thinking': "Excellent! What's your business and what specific AI solution are you thinking about?",
+    'planning': "Perfect! What's your project scope and what's your budget range?",
+    'timeline': "Great! What's your project about and what's your budget range?",
+    'budget': "Perfect! What's your project scope and what's your timeline?",
+    'cost': "Excellent! What's your project about and what's your timeline?",
+    'price': "Great! What's your project scope and what's your timeline?",
+    'when': "Perfect! What's your project about and what's your budget range?",
+    'how long': "Excellent! What's your project scope and what's your budget range?",
+    'help': "I can help with: Service information, pricing details, project consultation. What specific challenge is your business facing?"
+}
+
+CANNED_REPLIES = frozenset([*QUICK_RESPONSES.values(), UNAVAILABLE_REPLY, FALLBACK_REPLY, RETRY_REPLY])
 
 
 class LLMClient:
@@ -13,7 +58,9 @@ class LLMClient:
     
     def __init__(self):
         self.api_key = settings.OPENAI_API_KEY
-        self.model = "gpt-3.5-turbo"
+        self.model = settings.LLM_PRIMARY_MODEL
+        self.router = model_router
+        self.timeout = settings.CHAT_LLM_TIMEOUT
         self.max_retries = 3
         self.retry_delay = 1
         self._initialized = False
@@ -23,21 +70,49 @@ class LLMClient:
     
     def _initialize_client(self):
         """Initialize the OpenAI client with error handling."""
+        if settings.LLM_CASSETTE_MODE == 'replay':
+            # Reproducible perf runs: answer from a recorded cassette, no API key needed
+            from .llm_cassette import ReplayClient
+            self.client = ReplayClient(settings.LLM_CASSETTE, settings.LLM_CASSETTE_LATENCY_SCALE)
+            self._initialized = True
+            print(f"Replaying LLM calls from {settings.LLM_CASSETTE}")
+            return
+        
+        if settings.LLM_STUB_LATENCY is not None:
+            # Benchmarks: answer from an in-process stub instead of calling OpenAI
+            from .llm_stub import StubOpenAI
+            self.client = StubOpenAI(settings.LLM_STUB_LATENCY)
+            self._initialized = True
+            print(f"Using stub LLM with {settings.LLM_STUB_LATENCY}s latency")
+            self._maybe_record()
+            return
+        
         try:
             if not self.api_key:
                 print("Warning: OPENAI_API_KEY environment variable is not set")
                 self._initialized = False
                 return
             
+            # Imported here: the openai package alone takes most of a second to import
+            from openai import OpenAI
+            
             # Initialize the OpenAI client with the new API
             self.client = OpenAI(api_key=self.api_key)
             self._initialized = True
             print("OpenAI client initialized successfully")
-            
+            self._maybe_record()
+        
         except Exception as e:
             print(f"Warning: OpenAI client initialization failed: {e}")
             self._initialized = False
     
+    def _maybe_record(self):
+        """In record mode, wrap the client so every call is appended to the cassette."""
+        if settings.LLM_CASSETTE_MODE == 'record':
+            from .llm_cassette import RecordingClient
+            self.client = RecordingClient(self.client, settings.LLM_CASSETTE)
+            print(f"Recording LLM calls to {self.client.path}")
+    
     def _get_cache_key(self, prompt: str, session_id: str) -> str:
         """Generate cache key for prompt and session."""
         content = f"{prompt}:{session_id}"
@@ -45,62 +120,50 @@ class LLMClient:
     
     def _get_quick_response(self, prompt: str) -> Optional[str]:
         """Get quick response for common questions without API call."""
-        quick_responses = {
-            'hi': "Hello! I'm Swastik's AI assistant. I help businesses with AI solutions like chatbots, automation, and custom AI models. What's your business looking to achieve with AI?",
-            'hello': "Hello! I'm Swastik's AI assistant. I help businesses with AI solutions like chatbots, automation, and custom AI models. What's your business looking to achieve with AI?",
-            'what services': "Swastik offers: Chatbots ($150-300), Automation ($200-400), AI models ($300-600), Full-stack projects ($500-1200). What type of project are you considering?",
-            'pricing': "Pricing: Chatbots $150-300, Automation $200-400, AI models $300-600, Full-stack $500-1200. What's your budget range for this project?",
-            'how much': "Chatbots: $150-300, Automation: $200-400, AI models: $300-600, Full-stack: $500-1200. What's your timeline and budget for this project?",
-            'contact': "Contact Swastik: https://www.upwork.com/freelancers/~01a3695131c30e858f - Free consultations! What's your project timeline?",
-            'hire': "Hire Swastik: https://www.upwork.com/freelancers/~01a3695131c30e858f - Budget-friendly AI solutions! What's your project about?",
-            'upwork': "Swastik's Upwork: https://www.upwork.com/freelancers/~01a3695131c30e858f",
-            'chatbot': "Swastik builds custom chatbots for $150-300. What's your main use case - customer service, lead generation, or sales support?",
-            'automation': "Swastik creates automation workflows using Botpress, Make.com, Zapier, n8n. Starting at $200-400! What processes do you want to automate?",
-            'ai model': "Swastik develops custom AI models for $300-600. Text classification, sentiment analysis, predictive modeling! What data do you have?",
-            'project': "Swastik delivers full-stack AI projects for $500-1200. Complete solutions with frontend, backend, and AI integration! What's your project scope?",
-            'startup': "Perfect for startups! Swastik offers budget-friendly AI solutions with 20% discount and payment plans. What's your startup's main challenge?",
-            'budget': "Budget-friendly pricing: Chatbots $150-300, Automation $200-400, AI models $300-600. 20% startup discount! What's your budget range?",
-            'business': "Great! What industry is your business in? And what's your main challenge that AI could help solve?",
-            'company': "Excellent! What's your company size and what's your biggest operational challenge right now?",
-            'need': "Perfect! What specific AI solution do you need? And what's your timeline for this project?",
-            'want': "Great! What's your budget range for this project? And when do you need it completed?",
-            'looking': "Excellent! What's your business type and what's your main goal with AI?",
-            'interested': "Perfect! What's your project about and what's your budget range?",
-            'considering': "Great! What's your timeline for this project and what's your main challenge?",
-            'thinking': "Excellent! What's your business and what specific AI solution are you thinking about?",
-            'planning': "Perfect! What's your project scope and what's your budget range?",
-            'timeline': "Great! What's your project about and what's your budget range?",
-            'budget': "Perfect! What's your project scope and what's your timeline?",
-            'cost': "Excellent! What's your project about and what's your timeline?",
-            'price': "Great! What's your project scope and what's your timeline?",
-            'when': "Perfect! What's your project about and what's your budget range?",
-            'how long': "Excellent! What's your project scope and what's your budget range?",
-            'help': "I can help with: Service information, pricing details, project consultation. What specific challenge is your business facing?"
-        }
-        
-        for keyword, response in quick_responses.items():
+        for keyword, response in QUICK_RESPONSES.items():
             if keyword in prompt:
                 return response
         
         return None
     
-    def _make_api_call(self, messages: list, temperature: float = 0.7, max_tokens: int = 300) -> str:
+    def _timeout_for(self, deadline: Optional[Deadline], stage: str) -> Optional[float]:
+        """
+        Work out the API timeout for a call under a request deadline.
+        
+        Returns:
+            Timeout in seconds, or None when too little budget is left to make the call
+        """
+        if deadline is None:
+            return self.timeout
+        timeout = deadline.timeout(self.timeout, reserve=settings.CHAT_DB_RESERVE)
+        if timeout < settings.CHAT_MIN_LLM_TIMEOUT:
+            deadline.skip(stage)
+            return None
+        return timeout
+    
+    def _make_api_call(self, messages: list, temperature: float = 0.7, max_tokens: int = 300, model: Optional[str] = None, timeout: Optional[float] = None) -> str:
         """Make API call with optimized settings for faster responses."""
+        model = model or self.model
+        started = time.monotonic()
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=temperature,
-                max_tokens=max_tokens,
-                timeout=5,  # 5 second timeout for faster responses
-                stream=False
-            )
+            with span('openai'):
+                response = self.client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    timeout=timeout or self.timeout,
+                    stream=False
+                )
             return response.choices[0].message.content.strip()
         except Exception as e:
             # Return quick fallback instead of retrying
-            return "I apologize, but I'm experiencing technical difficulties. Please try again in a moment."
+            return RETRY_REPLY
+        finally:
+            # Timeouts and errors count too, so a struggling model gets routed around
+            self.router.record_latency(model, time.monotonic() - started)
     
-    def generate_reply(self, prompt: str, session_id: str, context: Optional[str] = None) -> str:
+    def generate_reply(self, prompt: str, session_id: str, context: Optional[str] = None, deadline: Optional[Deadline] = None) -> str:
         """
         Generate a reply using OpenAI API with caching and quick responses.
         
@@ -108,22 +171,25 @@ class LLMClient:
             prompt: The user's message
             session_id: Session identifier for caching
             context: Optional context from retrieval
-            
+            deadline: Optional request deadline bounding the API timeout
+        
         Returns:
             Generated reply text
         """
         # Check if client is initialized
         if not self._initialized:
-            return "I apologize, but I'm currently unavailable. Please try again later."
+            return UNAVAILABLE_REPLY
         
         # Quick responses for common questions
-        quick_responses = self._get_quick_response(prompt.lower())
+        with span('quick'):
+            quick_responses = self._get_quick_response(prompt.lower())
         if quick_responses:
             return quick_responses
         
         # Check cache first (10 second TTL)
         cache_key = self._get_cache_key(prompt, session_id)
-        cached_response = cache.get(cache_key)
+        with span('cache'):
+            cached_response = cache.get(cache_key)
         if cached_response:
             return cached_response
         
@@ -146,29 +212,64 @@ class LLMClient:
             "content": prompt
         })
         
-        # Generate response
+        timeout = self._timeout_for(deadline, 'reply')
+        if timeout is None:
+            return FALLBACK_REPLY
+        
+        # Generate response with the routed model profile
+        route = self.router.route('reply', prompt)
         try:
-            response = self._make_api_call(messages)
+            response = self._make_api_call(
+                messages,
+                temperature=route['temperature'],
+                max_tokens=route['max_tokens'],
+                model=route['model'],
+                timeout=timeout
+            )
             
             # Cache the response for 10 seconds
-            cache.set(cache_key, response, 10)
+            with span('cache'):
+                cache.set(cache_key, response, 10)
             
             return response
         except Exception as e:
             return f"I apologize, but I'm experiencing technical difficulties. Please try again later. Error: {str(e)}"
     
-    def classify_and_extract(self, message: str) -> Dict[str, Any]:
+    def _normalize_classification(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Fill in missing classification fields and coerce interest_score to float."""
+        # Validate structure
+        required_fields = ['is_lead', 'name', 'email', 'interest_score']
+        for field in required_fields:
+            if field not in result:
+                result[field] = None if field in ['name', 'email'] else False if field == 'is_lead' else 0.0
+        
+        # Ensure interest_score is float
+        try:
+            result['interest_score'] = float(result['interest_score'])
+        except (ValueError, TypeError):
+            result['interest_score'] = 0.0
+        
+        return result
+    
+    def classify_and_extract(self, message: str, deadline: Optional[Deadline] = None,
+                             state_summary: Optional[str] = None, raise_errors: bool = False) -> Dict[str, Any]:
         """
         Use LLM to classify if message contains lead information and extract details.
         
         Args:
             message: User message to analyze
-            
+            deadline: Optional request deadline bounding the API timeout
+            state_summary: What earlier messages in the conversation established, if anything
+            raise_errors: Raise API and parsing errors instead of returning a non-lead
+        
         Returns:
-            Dictionary with is_lead, name, email, interest_score
+            Dictionary with is_lead, name, email, interest_score and, with a
+            state summary, a short evidence phrase
         """
         # Check if client is initialized
         if not self._initialized:
+            if raise_errors:
+                raise RuntimeError("LLM client is not initialized")
             return {
                 'is_lead': False,
                 'name': None,
@@ -176,6 +277,19 @@ class LLMClient:
                 'interest_score': 0.0
             }
         
+        # Earlier turns arrive as a compact summary instead of the full transcript
+        conversation = ""
+        evidence_field = ""
+        if state_summary:
+            conversation = f"""
+        Earlier messages in this conversation established:
+        {state_summary}
+        
+        Judge the conversation as a whole: combine this with the new message when deciding is_lead
+        and interest_score. Only extract name/email stated in the new message.
+        """
+            evidence_field = ',\n            "evidence": "a few words on what the new message adds, or null"'
+        
         prompt = f"""
         Analyze the following message to determine if it contains lead qualification information for Swastik's AI development services.
         
@@ -196,7 +310,7 @@ class LLMClient:
         3. Interest in AI/ML services, chatbots, automation, or development
         4. Business needs or project requirements
         5. Contact intent or request for consultation
-        
+        {conversation}
         Message: "{message}"
         
         Respond with ONLY a JSON object in this exact format:
@@ -204,7 +318,7 @@ class LLMClient:
             "is_lead": true/false,
             "name": "extracted name or null",
             "email": "extracted email or null", 
-            "interest_score": 0.0-1.0
+            "interest_score": 0.0-1.0{evidence_field}
         }}
         
         Rules:
@@ -228,27 +342,33 @@ class LLMClient:
             }
         ]
         
+        timeout = self._timeout_for(deadline, 'classify')
+        if timeout is None:
+            return {
+                'is_lead': False,
+                'name': None,
+                'email': None,
+                'interest_score': 0.0
+            }
+        
+        route = self.router.route('classify', message)
         try:
-            response = self._make_api_call(messages, temperature=0.1, max_tokens=200)
+            response = self._make_api_call(
+                messages,
+                temperature=route['temperature'],
+                max_tokens=route['max_tokens'],
+                model=route['model'],
+                timeout=timeout
+            )
             
             # Parse JSON response
             result = json.loads(response)
             
-            # Validate structure
-            required_fields = ['is_lead', 'name', 'email', 'interest_score']
-            for field in required_fields:
-                if field not in result:
-                    result[field] = None if field in ['name', 'email'] else False if field == 'is_lead' else 0.0
-            
-            # Ensure interest_score is float
-            try:
-                result['interest_score'] = float(result['interest_score'])
-            except (ValueError, TypeError):
-                result['interest_score'] = 0.0
-            
-            return result
-            
+            return self._normalize_classification(result)
+        
         except Exception as e:
+            if raise_errors:
+                raise
             # Return safe default on error
             return {
                 'is_lead': False,
@@ -256,7 +376,103 @@ class LLMClient:
                 'email': None,
                 'interest_score': 0.0
             }
+    
+    
+    def classify_batch(self, messages: List[str], timeout: float = 30.0, raise_errors: bool = False) -> List[Dict[str, Any]]:
+        """
+        Classify many messages in a single LLM request.
+        
+        Args:
+            messages: User messages to analyze
+            timeout: API timeout for the whole batch
+            raise_errors: Raise API and parsing errors instead of returning non-leads
+        
+        Returns:
+            One classification dictionary per message, in input order
+        """
+        empty = {'is_lead': False, 'name': None, 'email': None, 'interest_score': 0.0}
+        if not messages:
+            return []
+        if not self._initialized:
+            if raise_errors:
+                raise RuntimeError("LLM client is not initialized")
+            return [dict(empty) for _ in messages]
+        
+        numbered = "\n".join(
+            f"{i}. {json.dumps(text[:500], ensure_ascii=False)}" for i, text in enumerate(messages)
+        )
+        prompt = f"""
+        Analyze each numbered message below for lead qualification information for Swastik's AI development services
+        (chatbots, automation workflows, custom AI models, full-stack AI projects).
+        
+        Messages:
+        {numbered}
+        
+        Respond with ONLY a JSON array containing one object per message, in this exact format:
+        [{{"index": 0, "is_lead": true/false, "name": "extracted name or null", "email": "extracted email or null", "interest_score": 0.0-1.0}}]
+        
+        Rules:
+        - is_lead should be true if the person shows interest in AI/ML services AND provides contact info (name or email)
+        - High interest (0.7-1.0): specific AI/ML, chatbot or automation needs, or asks for consultation
+        - Medium interest (0.4-0.6): general interest in AI or mentions business needs
+        - Low interest (0.1-0.3): casual inquiry or general questions
+        - Only extract name/email if clearly present; return null for missing fields
+        """
+        
+        api_messages = [
+            {
+                "role": "system",
+                "content": "You are a lead qualification AI. Analyze messages and extract contact information and interest level. Always respond with valid JSON only."
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ]
+        
+        route = self.router.route('classify')
+        try:
+            response = self._make_api_call(
+                api_messages,
+                temperature=route['temperature'],
+                max_tokens=60 * len(messages) + 50,
+                model=route['model'],
+                timeout=timeout
+            )
+            parsed = json.loads(response)
+            if not isinstance(parsed, list):
+                raise ValueError("classification response is not a JSON array")
+        except Exception as e:
+            if raise_errors:
+                raise
+            return [dict(empty) for _ in messages]
+        
+        results = [dict(empty) for _ in messages]
+        for position, item in enumerate(parsed):
+            if not isinstance(item, dict):
+                continue
+            index = item.pop('index', position)
+            if isinstance(index, int) and 0 <= index < len(messages):
+                results[index] = self._normalize_classification(item)
+        return results
+
+
+_llm_client = None
+_llm_client_lock = threading.Lock()
+
+
+def get_llm_client() -> LLMClient:
+    """Return the shared LLMClient, creating it on first use."""
+    global _llm_client
+    if _llm_client is None:
+        with _llm_client_lock:
+            if _llm_client is None:
+                _llm_client = LLMClient()
+    return _llm_client
 
 
-# Global instance
-llm_client = LLMClient()
+def __getattr__(name):
+    # Keeps ``from .llm_client import llm_client`` working without building the client at import time
+    if name == 'llm_client':
+        return get_llm_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
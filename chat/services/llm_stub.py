@@ -0,0 +1,57 @@
+import json
+import re
+import time
+from types import SimpleNamespace
+
+
+EMAIL = re.compile(r"[\w.+-]+@[\w-]+\.[\w.]+")
+MESSAGE_LINE = re.compile(r'^\s*Message: "(.*)"\s*$', re.MULTILINE)
+NUMBERED_LINE = re.compile(r'^\s*(\d+)\. (".*")\s*$', re.MULTILINE)
+
+
+class StubCompletions:
+    """Stands in for ``OpenAI().chat.completions`` with a fixed latency and canned answers."""
+    
+    def __init__(self, latency: float):
+        self.latency = latency
+    
+    def _classify(self, text: str) -> dict:
+        email = EMAIL.search(text)
+        return {
+            'is_lead': bool(email),
+            'name': None,
+            'email': email.group(0) if email else None,
+            'interest_score': 0.8 if email else 0.1,
+        }
+    
+    def create(self, model, messages, timeout=None, **kwargs):
+        if self.latency:
+            time.sleep(self.latency if timeout is None else min(self.latency, timeout))
+        prompt = messages[-1]['content']
+        
+        if 'lead qualification' in messages[0]['content']:
+            numbered = NUMBERED_LINE.findall(prompt)
+            if numbered:
+                content = json.dumps([dict(self._classify(json.loads(text)), index=int(i)) for i, text in numbered])
+            else:
+                message = MESSAGE_LINE.search(prompt)
+                content = json.dumps(self._classify(message.group(1) if message else prompt))
+        else:
+            content = f"Thanks for asking! ({model} stub reply to: {prompt[:60]})"
+        
+        usage = SimpleNamespace(prompt_tokens=sum(len(m['content']) // 4 for m in messages), completion_tokens=len(content) // 4)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=usage,
+        )
+
+
+class StubOpenAI:
+    """
+    Minimal OpenAI client double for benchmarks: no network, configurable latency.
+    
+    Enabled server-wide with LLM_STUB_LATENCY, or swapped in by bench_chat.
+    """
+    
+    def __init__(self, latency: float = 0.0):
+        self.chat = SimpleNamespace(completions=StubCompletions(latency))
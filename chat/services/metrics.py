@@ -0,0 +1,70 @@
+import threading
+from collections import defaultdict
+from typing import Dict, Any
+
+
+class Metrics:
+    """In-process counters and timing summaries for service instrumentation."""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(int)
+        self._timings = {}
+    
+    def _key(self, name: str, tags: Dict[str, Any]) -> str:
+        """Build a flat metric key like ``name{tag=value,...}``."""
+        if not tags:
+            return name
+        labels = ','.join(f"{k}={v}" for k, v in sorted(tags.items()))
+        return f"{name}{{{labels}}}"
+    
+    def increment(self, name: str, value: int = 1, **tags):
+        """
+        Increment a counter.
+        
+        Args:
+            name: Metric name
+            value: Amount to add
+            **tags: Optional labels for the counter
+        """
+        key = self._key(name, tags)
+        with self._lock:
+            self._counters[key] += value
+    
+    def observe(self, name: str, value: float, **tags):
+        """
+        Record a timing or size observation.
+        
+        Args:
+            name: Metric name
+            value: Observed value (seconds for timings)
+            **tags: Optional labels for the observation
+        """
+        key = self._key(name, tags)
+        with self._lock:
+            summary = self._timings.get(key)
+            if summary is None:
+                self._timings[key] = {'count': 1, 'sum': value, 'min': value, 'max': value}
+            else:
+                summary['count'] += 1
+                summary['sum'] += value
+                summary['min'] = min(summary['min'], value)
+                summary['max'] = max(summary['max'], value)
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """Return a copy of all counters and timing summaries."""
+        with self._lock:
+            timings = {}
+            for key, summary in self._timings.items():
+                timings[key] = dict(summary, avg=summary['sum'] / summary['count'])
+            return {'counters': dict(self._counters), 'timings': timings}
+    
+    def reset(self):
+        """Clear all recorded metrics."""
+        with self._lock:
+            self._counters.clear()
+            self._timings.clear()
+
+
+# Global instance
+metrics = Metrics()
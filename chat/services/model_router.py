@@ -0,0 +1,123 @@
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Dict, Any, Optional
+from django.conf import settings
+
+from .metrics import metrics
+
+
+COMPLEX_KEYWORDS = (
+    'integrate', 'integration', 'architecture', 'compare', 'difference', 'explain',
+    'requirements', 'workflow', 'pipeline', 'database', 'api', 'custom', 'scale',
+)
+
+
+def default_profiles() -> Dict[str, Dict[str, Any]]:
+    """Build the default model profile table from settings."""
+    primary = settings.LLM_PRIMARY_MODEL
+    fast = settings.LLM_FAST_MODEL
+    return {
+        'reply_short': {'model': primary, 'fallback_model': fast, 'max_tokens': 150, 'temperature': 0.7},
+        'reply_long': {'model': primary, 'fallback_model': fast, 'max_tokens': 300, 'temperature': 0.7},
+        'classify': {'model': primary, 'fallback_model': fast, 'max_tokens': 200, 'temperature': 0.1},
+        'summarize': {'model': fast, 'fallback_model': fast, 'max_tokens': 200, 'temperature': 0.3},
+    }
+
+
+# Call type -> complexity -> profile name
+DEFAULT_ROUTES = {
+    'reply': {'simple': 'reply_short', 'complex': 'reply_long'},
+    'classify': {'simple': 'classify', 'complex': 'classify'},
+    'summarize': {'simple': 'summarize', 'complex': 'summarize'},
+}
+
+
+class ModelRouter:
+    """Pick a model profile per call type and fall back to a faster model when the primary is slow."""
+    
+    def __init__(self, profiles: Optional[Dict[str, Dict[str, Any]]] = None, routes: Optional[Dict[str, Dict[str, str]]] = None):
+        self.profiles = profiles or getattr(settings, 'LLM_MODEL_PROFILES', None) or default_profiles()
+        self.routes = routes or DEFAULT_ROUTES
+        self.latency_threshold = settings.LLM_LATENCY_THRESHOLD
+        self.complexity_threshold = 1.0
+        self.latency_window = 60  # seconds of history considered "recent"
+        self.min_samples = 3
+        self._latencies = defaultdict(lambda: deque(maxlen=20))
+        self._lock = threading.Lock()
+    
+    def estimate_complexity(self, message: str) -> float:
+        """
+        Cheap heuristic complexity score for a message.
+        
+        Args:
+            message: User message text
+        
+        Returns:
+            Score where values >= 1.0 are treated as complex
+        """
+        text = message.lower()
+        words = len(text.split())
+        questions = text.count('?')
+        keyword_hits = sum(1 for keyword in COMPLEX_KEYWORDS if re.search(rf'\b{keyword}\b', text))
+        return words / 40 + max(questions - 1, 0) * 0.25 + keyword_hits * 0.2
+    
+    def record_latency(self, model: str, seconds: float):
+        """Record the latency of a completed (or timed out) call to a model."""
+        with self._lock:
+            self._latencies[model].append((time.monotonic(), seconds))
+        metrics.observe('llm.latency', seconds, model=model)
+    
+    def recent_latency(self, model: str) -> Optional[float]:
+        """
+        Average latency of the model over the recent window.
+        
+        Returns:
+            Mean latency in seconds, or None when there are too few recent samples
+        """
+        cutoff = time.monotonic() - self.latency_window
+        with self._lock:
+            samples = [seconds for recorded_at, seconds in self._latencies[model] if recorded_at >= cutoff]
+        if len(samples) < self.min_samples:
+            return None
+        return sum(samples) / len(samples)
+    
+    def route(self, call_type: str, message: str = '') -> Dict[str, Any]:
+        """
+        Choose the model and generation settings for a call.
+        
+        Args:
+            call_type: One of 'reply', 'classify' or 'summarize'
+            message: Message used for the complexity estimate
+        
+        Returns:
+            Dictionary with profile, model, max_tokens, temperature, complexity and fallback
+        """
+        complexity = self.estimate_complexity(message) if message else 0.0
+        level = 'complex' if complexity >= self.complexity_threshold else 'simple'
+        profile_name = self.routes.get(call_type, DEFAULT_ROUTES['reply'])[level]
+        profile = self.profiles[profile_name]
+        
+        model = profile['model']
+        fallback = False
+        recent = self.recent_latency(model)
+        fallback_model = profile.get('fallback_model')
+        if recent is not None and recent > self.latency_threshold and fallback_model and fallback_model != model:
+            model = fallback_model
+            fallback = True
+        
+        metrics.increment('llm.route', call_type=call_type, profile=profile_name, model=model, fallback=fallback)
+        
+        return {
+            'profile': profile_name,
+            'model': model,
+            'max_tokens': profile['max_tokens'],
+            'temperature': profile['temperature'],
+            'complexity': complexity,
+            'fallback': fallback,
+        }
+
+
+# Global instance
+model_router = ModelRouter()
@@ -0,0 +1,95 @@
+import gzip
+import hashlib
+import threading
+from typing import Dict
+from django.conf import settings
+from django.template.loader import render_to_string
+
+try:
+    import brotli
+except ImportError:  # optional; gzip covers every browser
+    brotli = None
+
+
+class RenderedPage:
+    """A rendered template kept as ready-to-send bodies, one per content encoding."""
+    
+    def __init__(self, body: bytes, content_type: str = 'text/html; charset=utf-8'):
+        self.content_type = content_type
+        self.bodies = {'identity': body, 'gzip': gzip.compress(body, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            self.bodies['br'] = brotli.compress(body)
+        self.digest = hashlib.sha256(body).hexdigest()[:32]
+    
+    def etag(self, encoding: str) -> str:
+        """Strong ETag for one encoding; each encoding is a different byte sequence."""
+        if encoding == 'identity':
+            return f'"{self.digest}"'
+        return f'"{self.digest}-{encoding}"'
+    
+    def negotiate(self, accept_encoding: str) -> str:
+        """
+        Pick the best available encoding for an Accept-Encoding header.
+        
+        Args:
+            accept_encoding: Raw header value, e.g. "gzip, deflate, br;q=0.9"
+        
+        Returns:
+            'br', 'gzip' or 'identity'
+        """
+        weights = {}
+        for item in accept_encoding.split(','):
+            coding, _, params = item.strip().partition(';')
+            quality = 1.0
+            params = params.strip()
+            if params.startswith('q='):
+                try:
+                    quality = float(params[2:])
+                except ValueError:
+                    quality = 0.0
+            if coding:
+                weights[coding.strip().lower()] = quality
+        
+        # Prefer the smaller body when the client is equally happy with both
+        best, best_weight = 'identity', 0.0
+        for encoding in ('br', 'gzip'):
+            weight = weights.get(encoding, weights.get('*', 0.0))
+            if encoding in self.bodies and weight > best_weight:
+                best, best_weight = encoding, weight
+        return best
+
+
+class PageCache:
+    """Renders request-independent templates once per process."""
+    
+    def __init__(self):
+        self._pages: Dict[str, RenderedPage] = {}
+        self._lock = threading.Lock()
+    
+    def get(self, template_name: str) -> RenderedPage:
+        """
+        Return the rendered page, rendering it on first use.
+        
+        With FRONTEND_CACHE off (the default under DEBUG) every call re-renders,
+        so template edits show up without a restart.
+        """
+        if not settings.FRONTEND_CACHE:
+            return RenderedPage(render_to_string(template_name).encode('utf-8'))
+        
+        page = self._pages.get(template_name)
+        if page is None:
+            with self._lock:
+                page = self._pages.get(template_name)
+                if page is None:
+                    page = RenderedPage(render_to_string(template_name).encode('utf-8'))
+                    self._pages[template_name] = page
+        return page
+    
+    def clear(self):
+        """Drop rendered pages, e.g. after a deploy that changed static file names."""
+        with self._lock:
+            self._pages.clear()
+
+
+# Global instance
+page_cache = PageCache()
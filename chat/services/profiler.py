@@ -0,0 +1,220 @@
+import json
+import logging
+import os
+import resource
+import signal
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Dict, Any, Optional
+from django.conf import settings
+from django.core.cache import caches
+
+
+logger = logging.getLogger(__name__)
+
+
+def _frame_label(code) -> str:
+    """``func (dir/file.py:firstline)``: one label per function, so samples aggregate across lines."""
+    path = code.co_filename.replace('\\', '/').rsplit('/', 2)
+    return f"{code.co_name} ({'/'.join(path[-2:])}:{code.co_firstlineno})"
+
+
+def _collapse(frame, thread_name: str) -> str:
+    """Root-to-leaf stack in collapsed (flamegraph.pl / speedscope) form."""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    labels.append(thread_name)
+    return ';'.join(reversed(labels))
+
+
+class StackSampler:
+    """
+    Wall-clock sampling profiler for every thread of this process.
+    
+    A background thread reads ``sys._current_frames()`` every ``interval``
+    seconds and counts identical stacks. Nothing is traced between samples, so
+    the overhead is bounded by the interval rather than by how busy the worker is.
+    """
+    
+    def __init__(self, interval: float = 0.005, ignore_threads=()):
+        self.interval = interval
+        self.ignore_threads = set(ignore_threads)
+        self.counts = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def _run(self):
+        self.ignore_threads.add(threading.get_ident())
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id not in self.ignore_threads:
+                    self.counts[_collapse(frame, names.get(thread_id, f"thread-{thread_id}"))] += 1
+            self.samples += 1
+    
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+    
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.counts
+    
+    def collapsed(self) -> str:
+        """One ``stack count`` line per distinct stack, hottest first."""
+        return ''.join(f"{stack} {count}\n" for stack, count in self.counts.most_common())
+
+
+def sample_cpu(seconds: float, interval: float = 0.005) -> StackSampler:
+    """
+    Sample every other thread for ``seconds``, blocking the caller meanwhile.
+    
+    The calling thread is left out; it is only sleeping.
+    """
+    sampler = StackSampler(interval, ignore_threads=[threading.get_ident()])
+    sampler.start()
+    time.sleep(seconds)
+    sampler.stop()
+    return sampler
+
+
+def _deep_size(obj, seen=None) -> int:
+    """Bytes held by obj and the containers, strings and numbers it references."""
+    seen = set() if seen is None else seen
+    stack, total = [obj], 0
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+    return total
+
+
+def _holders() -> Dict[str, Any]:
+    """Memory held by the service singletons this process has created so far."""
+    from . import retriever as retriever_module
+    from .metrics import metrics
+    from .page_cache import page_cache
+    
+    holders = {}
+    retriever = retriever_module._retriever
+    if retriever is not None and retriever.index is not None:
+        # A flat index stores every vector as float32
+        holders['faiss_index'] = {'bytes': retriever.index.ntotal * retriever.index.d * 4, 'vectors': retriever.index.ntotal}
+        holders['documents'] = {'bytes': _deep_size(retriever.documents), 'count': len(retriever.documents)}
+    holders['page_cache'] = {
+        'bytes': sum(len(body) for page in list(page_cache._pages.values()) for body in page.bodies.values()),
+        'pages': len(page_cache._pages),
+    }
+    holders['metrics'] = {'bytes': _deep_size(metrics.snapshot())}
+    for alias in settings.CACHES:
+        backend = caches[alias]
+        # TieredCache keeps its L1 in _l1, LocMemCache its entries in _cache; other backends hold nothing here.
+        # Cache handles are per thread, so an L1 is the calling thread's (the worker's only one under sync workers)
+        store = getattr(backend, '_l1', None)
+        if store is None:
+            store = getattr(backend, '_cache', None)
+        if isinstance(store, dict):
+            holders[f"cache:{alias}"] = {'bytes': _deep_size(dict(store)), 'entries': len(store)}
+    return holders
+
+
+def _rss_bytes() -> Optional[int]:
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def memory_report(limit: int = 25, group_by: str = 'lineno', start: bool = False) -> Dict[str, Any]:
+    """
+    Where this worker's memory is.
+    
+    ``holders`` sizes the FAISS index, retriever documents, caches and other
+    singletons directly. ``allocations`` is a tracemalloc breakdown by allocation
+    site, available when tracing is on (start the worker with PYTHONTRACEMALLOC=1,
+    or pass ``start`` to begin tracing now; only later allocations are attributed).
+    
+    Args:
+        limit: Allocation sites to return
+        group_by: 'lineno', 'filename' or 'traceback'
+        start: Start tracemalloc if it is not already running
+    
+    Returns:
+        Dictionary with rss_bytes, max_rss_bytes, holders and tracemalloc results
+    """
+    report = {
+        'pid': os.getpid(),
+        'rss_bytes': _rss_bytes(),
+        'max_rss_bytes': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        'holders': _holders(),
+    }
+    
+    if not tracemalloc.is_tracing():
+        if start:
+            tracemalloc.start(25)
+        report['tracemalloc'] = {'tracing': tracemalloc.is_tracing(), 'started': start}
+        return report
+    
+    snapshot = tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap*>'),
+    ])
+    current, peak = tracemalloc.get_traced_memory()
+    report['tracemalloc'] = {
+        'tracing': True,
+        'traced_bytes': current,
+        'peak_traced_bytes': peak,
+        'allocations': [
+            {
+                'site': [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback],
+                'bytes': stat.size,
+                'count': stat.count,
+            }
+            for stat in snapshot.statistics(group_by)[:limit]
+        ],
+    }
+    return report
+
+
+def _dump_profiles(seconds: float):
+    directory = settings.PROFILE_DIR
+    os.makedirs(directory, exist_ok=True)
+    stem = os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}")
+    sampler = sample_cpu(seconds)
+    with open(f"{stem}-cpu.folded", 'w', encoding='utf-8') as f:
+        f.write(sampler.collapsed())
+    with open(f"{stem}-memory.json", 'w', encoding='utf-8') as f:
+        json.dump(memory_report(), f, indent=2)
+    logger.info("Profile written to %s-cpu.folded and %s-memory.json", stem, stem)
+
+
+def install_signal_handler(signum: int = signal.SIGUSR2):
+    """
+    Profile this process on ``kill -USR2 <pid>``.
+    
+    The handler only starts a thread, which samples for PROFILE_SIGNAL_SECONDS
+    and writes ``<PROFILE_DIR>/<time>-<pid>-cpu.folded`` and ``-memory.json``.
+    Unlike the HTTP endpoint this also works for sync workers, whose only
+    thread is busy serving requests.
+    """
+    def handler(signum, frame):
+        threading.Thread(
+            target=_dump_profiles, args=(settings.PROFILE_SIGNAL_SECONDS,), name='profile-dump', daemon=True
+        ).start()
+    
+    signal.signal(signum, handler)
@@ -0,0 +1,88 @@
+import math
+import time
+from typing import Dict, Any, Optional
+from django.conf import settings
+from django.core.cache import caches
+
+from .metrics import metrics
+
+
+class TokenBucketLimiter:
+    """Token-bucket rate limiter whose state lives in the Django cache so all workers share it."""
+    
+    def __init__(self, cache_alias: Optional[str] = None):
+        self.cache_alias = cache_alias or settings.RATE_LIMIT_CACHE
+        self.lock_timeout = 1  # seconds; bounds how long a crashed worker can hold a bucket
+        # Linear backoff: about 20ms of waiting in all before giving up on a contended bucket
+        self.lock_attempts = 8
+        self.lock_retry_delay = 0.0005
+    
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+    
+    def _acquire(self, lock_key: str) -> bool:
+        """
+        Take the per-bucket lock.
+        
+        cache.add must be atomic (Redis, Memcached, the database backend, or a
+        per-process LocMemCache); see RATE_LIMIT_CACHE in settings.
+        """
+        for attempt in range(self.lock_attempts):
+            if self.cache.add(lock_key, 1, self.lock_timeout):
+                return True
+            time.sleep(self.lock_retry_delay * (attempt + 1))
+        return False
+    
+    def consume(self, key: str, capacity: float, refill_rate: float, cost: float = 1.0) -> Dict[str, Any]:
+        """
+        Try to take tokens from a bucket.
+        
+        Args:
+            key: Bucket identifier
+            capacity: Maximum number of tokens (burst size)
+            refill_rate: Tokens added per second
+            cost: Tokens needed for this request
+        
+        Returns:
+            Dictionary with allowed, limit, remaining and retry_after (seconds)
+        """
+        lock_key = f"{key}:lock"
+        if not self._acquire(lock_key):
+            # Fail closed: letting contended requests through would let a flood skip the limit.
+            # The lock expires after lock_timeout, so a crashed holder blocks the bucket no longer than that
+            metrics.increment('rate_limit.lock_contention')
+            return {'allowed': False, 'limit': capacity, 'remaining': 0, 'retry_after': float(self.lock_timeout)}
+        
+        try:
+            now = time.time()
+            state = self.cache.get(key)
+            if state:
+                tokens, updated = state
+                tokens = min(capacity, tokens + max(now - updated, 0) * refill_rate)
+            else:
+                tokens = capacity
+            
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+                retry_after = 0.0
+            else:
+                retry_after = (cost - tokens) / refill_rate
+            
+            # Expire the bucket once it would be full again; a missing bucket is a full one
+            ttl = int(math.ceil((capacity - tokens) / refill_rate)) + 1
+            self.cache.set(key, (tokens, now), ttl)
+        finally:
+            self.cache.delete(lock_key)
+        
+        return {
+            'allowed': allowed,
+            'limit': capacity,
+            'remaining': int(tokens),
+            'retry_after': retry_after,
+        }
+
+
+# Global instance
+rate_limiter = TokenBucketLimiter()
@@ -1,16 +1,21 @@
 import os
 import json
-from typing import List, Dict, Any
+import threading
+import zlib
+from typing import List, Dict, Any, Optional, TYPE_CHECKING
 from django.conf import settings
-import faiss
-import numpy as np
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# faiss and numpy are imported where they are used so that importing this module stays cheap
 
 
 class FAISSRetriever:
     """FAISS-based retriever for RAG (Retrieval Augmented Generation)."""
     
-    def __init__(self):
-        self.index_path = settings.FAISS_PATH
+    def __init__(self, index_path: Optional[str] = None):
+        self.index_path = index_path or settings.FAISS_PATH
         self.dimension = 384  # Dimension for simple embeddings
         self.index = None
         self.documents = []
@@ -18,6 +23,8 @@ class FAISSRetriever:
     
     def _load_or_create_index(self):
         """Load existing FAISS index or create new one."""
+        import faiss
+        
         os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
         
         index_file = f"{self.index_path}.index"
@@ -29,13 +36,20 @@ class FAISSRetriever:
             with open(docs_file, 'r', encoding='utf-8') as f:
                 self.documents = json.load(f)
         else:
-            # Create new index
-            self.index = faiss.IndexFlatIP(self.dimension)  # Inner product for cosine similarity
-            self.documents = []
-            self._save_index()
+            self.clear()
+    
+    def clear(self):
+        """Replace the index with an empty one and save it."""
+        import faiss
+        
+        self.index = faiss.IndexFlatIP(self.dimension)  # Inner product for cosine similarity
+        self.documents = []
+        self._save_index()
     
     def _save_index(self):
         """Save FAISS index and documents to disk."""
+        import faiss
+        
         index_file = f"{self.index_path}.index"
         docs_file = f"{self.index_path}.docs"
         
@@ -43,15 +57,18 @@ class FAISSRetriever:
         with open(docs_file, 'w', encoding='utf-8') as f:
             json.dump(self.documents, f, ensure_ascii=False, indent=2)
     
-    def _simple_embedding(self, text: str) -> np.ndarray:
+    def _simple_embedding(self, text: str) -> 'np.ndarray':
         """Create a simple embedding using basic text features."""
+        import numpy as np
+        
         # Simple bag-of-words style embedding
         words = text.lower().split()
         embedding = np.zeros(self.dimension)
         
-        # Simple hash-based embedding
+        # Simple hash-based embedding. crc32, not hash(): str hashes are salted per process,
+        # so an index saved by one process would not match queries embedded by another
         for word in words:
-            hash_val = hash(word) % self.dimension
+            hash_val = zlib.crc32(word.encode('utf-8')) % self.dimension
             embedding[hash_val] += 1
         
         # Normalize
@@ -78,6 +95,7 @@ class FAISSRetriever:
             texts.append(text)
         
         # Generate embeddings
+        import numpy as np
         embeddings = np.array([self._simple_embedding(text) for text in texts])
         
         # Add to index
@@ -96,7 +114,7 @@ class FAISSRetriever:
         Args:
             query: Search query
             top_k: Number of top results to return
-            
+        
         Returns:
             List of relevant documents with scores
         """
@@ -112,7 +130,8 @@ class FAISSRetriever:
         # Format results
         results = []
         for score, idx in zip(scores[0], indices[0]):
-            if idx < len(self.documents):
+            # FAISS pads with -1 when top_k exceeds the number of vectors
+            if 0 <= idx < len(self.documents):
                 doc = self.documents[idx].copy()
                 doc['score'] = float(score)
                 results.append(doc)
@@ -126,7 +145,7 @@ class FAISSRetriever:
         Args:
             query: Search query
             top_k: Number of documents to include
-            
+        
         Returns:
             Formatted context string
         """
@@ -144,5 +163,22 @@ class FAISSRetriever:
         return "\n\n".join(context_parts)
 
 
-# Global instance
-retriever = FAISSRetriever()
+_retriever = None
+_retriever_lock = threading.Lock()
+
+
+def get_retriever() -> FAISSRetriever:
+    """Return the shared FAISSRetriever, loading the index on first use."""
+    global _retriever
+    if _retriever is None:
+        with _retriever_lock:
+            if _retriever is None:
+                _retriever = FAISSRetriever()
+    return _retriever
+
+
+def __getattr__(name):
+    # Keeps ``from .retriever import retriever`` working without reading the index at import time
+    if name == 'retriever':
+        return get_retriever()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,181 @@
+from collections import Counter
+from datetime import timedelta
+from typing import Dict, Any, Optional
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from ..models import CannedResponse, DailyRollup, Lead, Message, RollupWatermark
+
+
+METRICS = ('sessions', 'messages', 'canned_replies', 'leads', 'lead_sessions')
+
+
+def _message_deltas(low: int, high: int) -> Counter:
+    """(day, metric, key) -> count for messages with low < id <= high."""
+    rows = Message.objects.filter(id__gt=low, id__lte=high).order_by().annotate(day=TruncDate('timestamp'))
+    deltas = Counter()
+    for day, sender, count in rows.values('day', 'sender').annotate(n=Count('id')).values_list('day', 'sender', 'n'):
+        deltas[(day, 'messages', sender)] += count
+    canned = rows.filter(canned__isnull=False).values('day', 'canned_id').annotate(n=Count('id'))
+    for day, canned_id, count in canned.values_list('day', 'canned_id', 'n'):
+        deltas[(day, 'canned_replies', str(canned_id))] += count
+    # A session starts on the day of its first message
+    earlier = Message.objects.filter(session=OuterRef('session'), id__lt=OuterRef('id'))
+    first = rows.filter(sender='user').filter(~Exists(earlier)).values('day').annotate(n=Count('id'))
+    for day, count in first.values_list('day', 'n'):
+        deltas[(day, 'sessions', '')] += count
+    return deltas
+
+
+def _lead_deltas(low: int, high: int) -> Counter:
+    """(day, metric, key) -> count for leads with low < id <= high."""
+    rows = Lead.objects.filter(id__gt=low, id__lte=high).order_by().annotate(day=TruncDate('created_at'))
+    deltas = Counter()
+    for day, count in rows.values('day').annotate(n=Count('id')).values_list('day', 'n'):
+        deltas[(day, 'leads', '')] += count
+    # A session counts as converted on the day its first lead was created
+    earlier = Lead.objects.filter(source_session=OuterRef('source_session'), id__lt=OuterRef('id'))
+    first = rows.filter(~Exists(earlier)).values('day').annotate(n=Count('id'))
+    for day, count in first.values_list('day', 'n'):
+        deltas[(day, 'lead_sessions', '')] += count
+    return deltas
+
+
+# source -> (model, creation time field, delta function)
+SOURCES = {
+    'message': (Message, 'timestamp', _message_deltas),
+    'lead': (Lead, 'created_at', _lead_deltas),
+}
+
+
+class Rollups:
+    """Daily analytics aggregates, folded in incrementally from new messages and leads."""
+    
+    def _apply(self, deltas: Counter):
+        """Add deltas to their DailyRollup rows, creating missing ones."""
+        if not deltas:
+            return
+        now = timezone.now()
+        days = {day for day, _, _ in deltas}
+        metrics = {metric for _, metric, _ in deltas}
+        rows = {
+            (row.day, row.metric, row.key): row
+            for row in DailyRollup.objects.select_for_update().filter(metric__in=metrics, day__in=days)
+        }
+        to_update, to_create = [], []
+        for key, count in deltas.items():
+            row = rows.get(key)
+            if row is None:
+                day, metric, breakdown = key
+                to_create.append(DailyRollup(day=day, metric=metric, key=breakdown, value=count))
+            else:
+                row.value += count
+                row.updated_at = now
+                to_update.append(row)
+        DailyRollup.objects.bulk_update(to_update, ['value', 'updated_at'])
+        DailyRollup.objects.bulk_create(to_create)
+    
+    def refresh(self, batch_size: int = 10000, lag: float = 60.0) -> Dict[str, int]:
+        """
+        Fold rows created since each source's watermark into the rollups.
+        
+        Each batch of at most ``batch_size`` rows is aggregated in the database and
+        applied in one transaction together with the watermark advance, so an
+        interrupted run never counts a row twice or skips one. Rows younger than
+        ``lag`` seconds wait for the next run: an id can be allocated by a
+        transaction that commits after a higher one, and the lag gives it time to.
+        The watermark row is locked, so concurrent runs queue up.
+        
+        Args:
+            batch_size: Rows per source folded per transaction
+            lag: Seconds a row must be old before it is counted
+        
+        Returns:
+            Rows processed per source
+        """
+        cutoff = timezone.now() - timedelta(seconds=lag)
+        processed = {}
+        for source, (model, time_field, deltas_for) in SOURCES.items():
+            processed[source] = 0
+            RollupWatermark.objects.get_or_create(source=source)
+            while True:
+                with transaction.atomic():
+                    watermark = RollupWatermark.objects.select_for_update().get(source=source)
+                    ids = list(
+                        model.objects
+                        .filter(id__gt=watermark.last_id, **{f'{time_field}__lt': cutoff})
+                        .order_by('id')
+                        .values_list('id', flat=True)[:batch_size]
+                    )
+                    if not ids:
+                        # Nothing new, but the rollups are now current as of this run
+                        watermark.save(update_fields=['updated_at'])
+                        break
+                    self._apply(deltas_for(watermark.last_id, ids[-1]))
+                    watermark.last_id = ids[-1]
+                    watermark.save()
+                processed[source] += len(ids)
+        return processed
+    
+    def rebuild(self, batch_size: int = 10000, lag: float = 60.0) -> Dict[str, int]:
+        """Drop every rollup and watermark and fold all rows in again."""
+        with transaction.atomic():
+            DailyRollup.objects.all().delete()
+            RollupWatermark.objects.all().delete()
+        return self.refresh(batch_size, lag)
+    
+    def stats(self, days: int, top: int = 10) -> Dict[str, Any]:
+        """
+        Per-day and total figures for the last ``days`` days, from the rollups alone.
+        
+        Reads at most ``days`` rows per metric (plus one per canned reply and day),
+        however large the message and lead tables are.
+        
+        Returns:
+            Dictionary with from, to, days (one entry per day, oldest first), totals,
+            top_canned_replies and as_of (when each source was last refreshed)
+        """
+        today = timezone.localdate()
+        start = today - timedelta(days=days - 1)
+        rows = DailyRollup.objects.filter(metric__in=METRICS, day__gte=start, day__lte=today)
+        
+        per_day = {start + timedelta(days=i): Counter() for i in range(days)}
+        canned = Counter()
+        for day, metric, key, value in rows.values_list('day', 'metric', 'key', 'value'):
+            if metric == 'canned_replies':
+                canned[int(key)] += value
+            else:
+                per_day[day][f"{key}_{metric}" if key else metric] += value
+        
+        totals = Counter()
+        for counts in per_day.values():
+            totals.update(counts)
+        watermarks = dict(RollupWatermark.objects.values_list('source', 'updated_at'))
+        return {
+            'from': start.isoformat(),
+            'to': today.isoformat(),
+            'days': [dict(day=day.isoformat(), **self._figures(counts)) for day, counts in per_day.items()],
+            'totals': self._figures(totals),
+            'top_canned_replies': [
+                {'text': CannedResponse.text_for(canned_id), 'count': count}
+                for canned_id, count in canned.most_common(top)
+            ],
+            'as_of': {source: at.isoformat() if at else None for source, at in watermarks.items()},
+        }
+    
+    def _figures(self, counts: Counter) -> Dict[str, Optional[float]]:
+        sessions, lead_sessions = counts['sessions'], counts['lead_sessions']
+        return {
+            'sessions': sessions,
+            'messages': {'user': counts['user_messages'], 'assistant': counts['assistant_messages']},
+            'leads': counts['leads'],
+            'lead_sessions': lead_sessions,
+            # Sessions are counted on the day they start and conversions on the day the lead appears
+            'lead_rate': round(lead_sessions / sessions, 4) if sessions else None,
+        }
+
+
+# Global instance
+rollups = Rollups()
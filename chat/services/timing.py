@@ -0,0 +1,116 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Optional
+
+from .metrics import metrics
+
+
+_current = contextvars.ContextVar('request_timer', default=None)
+
+
+class RequestTimer:
+    """
+    Named spans for one request, rendered as a Server-Timing header.
+    
+    Spans with the same name add up (three OpenAI calls are one ``openai`` entry
+    with a count of 3). Spans may nest, so they show where time went rather than
+    summing to the total: DB time spent inside ``persist`` shows up under both.
+    """
+    
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.duration = None
+        # name -> [seconds, count], in first-seen order
+        self._spans = {}
+        self._lock = threading.Lock()
+    
+    def add(self, name: str, seconds: float):
+        """Add one occurrence of a span."""
+        with self._lock:
+            entry = self._spans.setdefault(name, [0.0, 0])
+            entry[0] += seconds
+            entry[1] += 1
+    
+    def finish(self) -> float:
+        """Stop the clock and feed every span into the process metrics."""
+        if self.duration is None:
+            self.duration = time.perf_counter() - self.started_at
+            for name, (seconds, _) in self.spans_snapshot().items():
+                metrics.observe('request.span', seconds, span=name)
+        return self.duration
+    
+    def spans_snapshot(self) -> Dict[str, tuple]:
+        with self._lock:
+            return {name: tuple(entry) for name, entry in self._spans.items()}
+    
+    def as_dict(self) -> Dict[str, Any]:
+        """Spans in milliseconds, for structured logs."""
+        spans = {
+            name: {'ms': round(seconds * 1000, 2), 'count': count}
+            for name, (seconds, count) in self.spans_snapshot().items()
+        }
+        total = self.duration if self.duration is not None else time.perf_counter() - self.started_at
+        return {'total_ms': round(total * 1000, 2), 'spans': spans}
+    
+    def header(self) -> str:
+        """
+        Server-Timing header value, e.g. ``db;dur=3.1;desc="4x", openai;dur=812.0, total;dur=830.5``.
+        """
+        entries = []
+        for name, (seconds, count) in self.spans_snapshot().items():
+            entry = f"{name};dur={seconds * 1000:.1f}"
+            if count > 1:
+                entry += f';desc="{count}x"'
+            entries.append(entry)
+        total = self.duration if self.duration is not None else time.perf_counter() - self.started_at
+        entries.append(f"total;dur={total * 1000:.1f}")
+        return ', '.join(entries)
+    
+    def db_wrapper(self, execute, sql, params, many, context):
+        """``connection.execute_wrapper`` hook timing every query as a ``db`` span."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.add('db', time.perf_counter() - started)
+
+
+def current_timer() -> Optional[RequestTimer]:
+    """The timer of the request being handled, if timing is on."""
+    return _current.get()
+
+
+@contextmanager
+def request_timer():
+    """Make a new RequestTimer current for the duration of the block."""
+    timer = RequestTimer()
+    token = _current.set(timer)
+    try:
+        yield timer
+    finally:
+        _current.reset(token)
+        timer.finish()
+
+
+@contextmanager
+def span(name: str):
+    """
+    Time a block as a named span of the current request.
+    
+    Outside a request (management commands, the lead worker) there is no timer
+    and this costs one context variable lookup.
+    
+    Args:
+        name: Server-Timing metric name (letters, digits, '_' and '-')
+    """
+    timer = _current.get()
+    if timer is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer.add(name, time.perf_counter() - started)
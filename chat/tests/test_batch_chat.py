@@ -0,0 +1,174 @@
+import threading
+import uuid
+from unittest.mock import patch
+from django.db import DatabaseError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from chat.models import LeadJob, Message, Session
+from chat.services.conversation import conversation_store
+from chat.services.llm_client import LLMClient
+from chat.services.llm_stub import StubOpenAI
+
+
+class CountingStub(StubOpenAI):
+    """Stub that records how many calls are in flight at once, and in which order prompts arrive."""
+    
+    def __init__(self, latency):
+        super().__init__(latency)
+        self.in_flight = self.max_in_flight = 0
+        self.prompts = []
+        self._lock = threading.Lock()
+        create = self.chat.completions.create
+        
+        def counted(*args, **kwargs):
+            with self._lock:
+                self.in_flight += 1
+                self.max_in_flight = max(self.max_in_flight, self.in_flight)
+                self.prompts.append(kwargs['messages'][-1]['content'])
+            try:
+                return create(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.in_flight -= 1
+        self.chat.completions.create = counted
+
+
+@override_settings(CHAT_BATCH_TOKEN='batch-secret')
+class ChatBatchTestCase(TestCase):
+    """Test cases for the batch chat endpoint."""
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer batch-secret')
+        self.stub = CountingStub(latency=0.02)
+        self.llm = LLMClient()
+        self.llm.client, self.llm._initialized = self.stub, True
+        patcher = patch('chat.services.batch.get_llm_client', return_value=self.llm)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def _post(self, items, **extra):
+        return self.client.post('/api/chat/batch/', dict({'items': items}, **extra), format='json')
+    
+    def test_requires_token(self):
+        self.client.credentials()
+        response = self._post([{'message': 'Do you build OCR pipelines?'}])
+        
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(Session.objects.count(), 0)
+    
+    def test_per_session_order_and_results(self):
+        first, second = uuid.uuid4(), uuid.uuid4()
+        items = [
+            {'session_id': str(session_id), 'message': f"Do you build OCR pipelines? step {step} of {session_id}"}
+            for step in range(3) for session_id in (first, second)
+        ]
+        
+        response = self._post(items, concurrency=2)
+        
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['succeeded'], 6)
+        self.assertEqual([r['index'] for r in data['results']], list(range(6)))
+        self.assertEqual(data['results'][0]['session_id'], str(first))
+        self.assertIn('stub reply', data['results'][0]['reply'])
+        for session_id in (first, second):
+            texts = list(Message.objects.filter(session_id=session_id, sender='user').values_list('text', flat=True))
+            self.assertEqual(texts, [f"Do you build OCR pipelines? step {step} of {session_id}" for step in range(3)])
+            # The LLM saw each session's turns in order too
+            prompts = [p for p in self.stub.prompts if p.endswith(str(session_id))]
+            self.assertEqual(prompts, texts)
+    
+    def test_sessions_run_concurrently(self):
+        items = [{'message': f"Do you build OCR pipelines? ref {n}"} for n in range(8)]
+        
+        response = self._post(items, concurrency=4)
+        
+        self.assertEqual(response.json()['succeeded'], 8)
+        self.assertGreater(self.stub.max_in_flight, 1)
+        self.assertLessEqual(self.stub.max_in_flight, 4)
+        self.assertEqual(Session.objects.count(), 8)
+    
+    def test_writes_do_not_grow_with_turns(self):
+        """Each session is written with a fixed number of statements, however many turns it has."""
+        def writes(turns):
+            items = [
+                {'session_id': str(session_id), 'message': f"Do you build OCR pipelines? ref {n}"}
+                for session_id in (uuid.uuid4(), uuid.uuid4()) for n in range(turns)
+            ]
+            with CaptureQueriesContext(connection) as captured:
+                self._post(items)
+            return [q['sql'].split(None, 1)[0] for q in captured.captured_queries if not q['sql'].startswith(('BEGIN', 'SAVEPOINT', 'RELEASE'))]
+        
+        self.assertEqual(len(writes(1)), len(writes(5)))
+    
+    def test_deadline_skips_unstarted_items(self):
+        """Items that would start after CHAT_BATCH_DEADLINE are skipped; finished turns are kept."""
+        self.stub.chat.completions.latency = 0.3
+        session_id = uuid.uuid4()
+        items = [{'session_id': str(session_id), 'message': f"Do you build OCR pipelines? step {n}"} for n in range(4)]
+        
+        with self.settings(CHAT_BATCH_DEADLINE=1.5):
+            data = self._post(items, concurrency=1).json()
+        
+        statuses = [r['status'] for r in data['results']]
+        self.assertEqual(statuses[0], 'ok')
+        self.assertIn('skipped', statuses)
+        # Order is kept: nothing runs after the first skipped item
+        self.assertEqual(statuses, sorted(statuses))
+        self.assertEqual(data['results'][-1]['session_id'], str(session_id))
+        self.assertEqual(Message.objects.filter(session_id=session_id).count(), 2 * statuses.count('ok'))
+    
+    def test_invalid_items_and_leads(self):
+        items = [
+            {'message': ''},
+            {'message': "I'm Dana, dana@example.com - please send me a quote"},
+            {'session_id': 'not-a-uuid', 'message': 'hello'},
+        ]
+        
+        data = self._post(items).json()
+        
+        self.assertEqual(data['succeeded'], 1)
+        self.assertEqual(data['failed'], 2)
+        self.assertEqual([r['status'] for r in data['results']], ['invalid', 'ok', 'invalid'])
+        self.assertIn('message', data['results'][0]['errors'])
+        self.assertEqual(data['results'][1]['lead_status'], 'pending')
+        self.assertEqual(LeadJob.objects.get().session_id, uuid.UUID(data['results'][1]['session_id']))
+    
+    def test_session_id_continues_conversation(self):
+        first = self._post([{'message': 'Do you build OCR pipelines?'}]).json()['results'][0]
+        
+        second = self._post([{'session_id': first['session_id'], 'message': 'And for receipts too?'}]).json()['results'][0]
+        
+        self.assertEqual(second['session_id'], first['session_id'])
+        self.assertEqual(Message.objects.filter(session_id=first['session_id']).count(), 4)
+    
+    def test_persist_error_fails_only_that_session(self):
+        """A database error saving one session's turns marks just those items as errors."""
+        broken, healthy = uuid.uuid4(), uuid.uuid4()
+        persist_turns = conversation_store.persist_turns
+        
+        def fail_broken(turns):
+            if turns[0][0].id == broken:
+                raise DatabaseError("canceling statement due to statement timeout")
+            return persist_turns(turns)
+        
+        items = [{'session_id': str(session_id), 'message': 'Do you build OCR pipelines?'} for session_id in (broken, healthy)]
+        with patch.object(conversation_store, 'persist_turns', side_effect=fail_broken), \
+             self.assertLogs('chat.services.batch', 'WARNING'):
+            response = self._post(items, concurrency=1)
+        
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([r['status'] for r in data['results']], ['error', 'ok'])
+        self.assertEqual((data['succeeded'], data['failed']), (1, 1))
+        self.assertFalse(Session.objects.filter(id=broken).exists())
+        self.assertEqual(Message.objects.filter(session_id=healthy).count(), 2)
+    
+    @override_settings(CHAT_BATCH_MAX_ITEMS=2)
+    def test_too_many_items(self):
+        response = self._post([{'message': 'x'}] * 3)
+        
+        self.assertEqual(response.status_code, 400)
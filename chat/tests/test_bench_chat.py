@@ -0,0 +1,59 @@
+import json
+from io import StringIO
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from chat.management.commands.bench_chat import QUICK_PROMPTS, LLM_PROMPTS
+from chat.models import Session
+from chat.services.llm_client import LLMClient
+from chat.services.llm_stub import StubOpenAI
+
+
+class BenchChatCommandTestCase(TestCase):
+    """Test cases for the bench_chat management command."""
+    
+    def test_in_process_report(self):
+        """An in-process run reports latency per turn kind and DB queries, then cleans up."""
+        out = StringIO()
+        call_command(
+            'bench_chat', '--conversations', '3', '--turns', '4', '--llm-latency', '0',
+            '--mix', 'quick=1,cached=1,llm=1,lead=1', stdout=out
+        )
+        
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['turns'], 12)
+        self.assertEqual(report['error_rate'], 0.0)
+        self.assertEqual(report['status_codes'], {'200': 12})
+        self.assertGreater(report['db_queries_per_turn'], 0)
+        self.assertIn('p99', report['latency_ms'])
+        self.assertTrue(set(report['by_kind']) <= {'quick', 'cached', 'llm', 'lead'})
+        self.assertEqual(Session.objects.count(), 0)
+    
+    def test_invalid_mix(self):
+        with self.assertRaises(CommandError):
+            call_command('bench_chat', '--mix', 'slow=1', stdout=StringIO())
+    
+    def test_prompts_hit_the_intended_path(self):
+        """Quick prompts are answered from the table; LLM prompts must not be."""
+        client = LLMClient.__new__(LLMClient)
+        
+        for prompt in QUICK_PROMPTS:
+            self.assertIsNotNone(client._get_quick_response(prompt.lower()), prompt)
+        for prompt in LLM_PROMPTS:
+            self.assertIsNone(client._get_quick_response(prompt.format(n=1).lower()), prompt)
+
+
+class StubOpenAITestCase(TestCase):
+    """The stub answers classification prompts with parseable JSON."""
+    
+    def test_classification(self):
+        stub = StubOpenAI()
+        messages = [
+            {'role': 'system', 'content': 'You are a lead qualification AI.'},
+            {'role': 'user', 'content': 'Analyze...\n        Message: "mail me at jo@example.com"\n'},
+        ]
+        
+        content = stub.chat.completions.create(model='m', messages=messages).choices[0].message.content
+        
+        self.assertEqual(json.loads(content)['email'], 'jo@example.com')
@@ -0,0 +1,76 @@
+import tempfile
+from unittest.mock import patch
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+
+from chat.cache import TieredCache
+from chat.services.metrics import metrics
+
+
+class TieredCacheTestCase(TestCase):
+    """Test cases for the two-tier cache backend."""
+    
+    def setUp(self):
+        self.shared = caches['shared']
+        self.shared.clear()
+        self.cache = TieredCache('shared', {'OPTIONS': {'MAX_ENTRIES': 2, 'L1_TIMEOUT': 5}})
+        metrics.reset()
+    
+    def test_write_through(self):
+        """Writes reach the shared tier, so other workers can read them."""
+        self.cache.set('greeting', 'hello', 60)
+        
+        self.assertEqual(self.shared.get('greeting'), 'hello')
+        other_worker = TieredCache('shared', {})
+        self.assertEqual(other_worker.get('greeting'), 'hello')
+    
+    def test_per_tier_hit_metrics(self):
+        """Hits are counted per tier, and L2 hits are copied into L1."""
+        self.shared.set('reply', 'cached', 60)
+        
+        self.assertEqual(self.cache.get('reply'), 'cached')
+        self.assertEqual(self.cache.get('reply'), 'cached')
+        self.assertIsNone(self.cache.get('absent'))
+        
+        counters = metrics.snapshot()['counters']
+        self.assertEqual(counters['cache.hit{tier=l2}'], 1)
+        self.assertEqual(counters['cache.hit{tier=l1}'], 1)
+        self.assertEqual(counters['cache.miss'], 1)
+    
+    def test_l1_copy_expires(self):
+        """An L1 copy is only trusted for L1_TIMEOUT seconds."""
+        with patch('chat.cache.time.monotonic', return_value=100.0):
+            self.cache.set('key', 'old', 60)
+        self.shared.set('key', 'new', 60)
+        
+        with patch('chat.cache.time.monotonic', return_value=104.0):
+            self.assertEqual(self.cache.get('key'), 'old')
+        with patch('chat.cache.time.monotonic', return_value=105.5):
+            self.assertEqual(self.cache.get('key'), 'new')
+    
+    def test_l1_is_bounded_lru(self):
+        """The least recently used L1 entry is evicted first."""
+        for key in ('a', 'b', 'c'):
+            self.cache.set(key, key, 60)
+        
+        self.assertEqual(list(self.cache._l1), [self.cache.make_key('b'), self.cache.make_key('c')])
+        self.assertEqual(self.cache.get('a'), 'a')
+    
+    def test_add_and_delete_go_to_l2(self):
+        """add() is decided by the shared tier and delete() clears both tiers."""
+        self.shared.set('lock', 1, 60)
+        
+        self.assertFalse(self.cache.add('lock', 2, 60))
+        self.assertTrue(self.cache.add('fresh', 3, 60))
+        
+        self.cache.delete('fresh')
+        self.assertIsNone(self.cache.get('fresh'))
+        self.assertIsNone(self.shared.get('fresh'))
+    
+    def test_file_backed_shared_tier(self):
+        """Two workers share entries through a file-backed L2."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            shared = {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': tmpdir}
+            with override_settings(CACHES={'shared': shared, 'default': {'BACKEND': 'chat.cache.TieredCache', 'LOCATION': 'shared'}}):
+                TieredCache('shared', {}).set('reply', {'text': 'hi'}, 60)
+                self.assertEqual(TieredCache('shared', {}).get('reply'), {'text': 'hi'})
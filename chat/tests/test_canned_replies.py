@@ -0,0 +1,115 @@
+import csv
+import importlib
+import io
+from types import SimpleNamespace
+from django.apps import apps
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from chat.models import Session, Message, CannedResponse
+from chat.services.canned import CannedReplies
+from chat.services.conversation import SessionRef, conversation_store
+from chat.services.llm_client import FALLBACK_REPLY, QUICK_RESPONSES
+
+
+LONG_REPLY = "We build retrieval pipelines over your documents and keep them up to date. " * 20
+
+
+class CannedReplyStorageTestCase(TestCase):
+    """Test cases for storing fixed and long assistant replies compactly."""
+    
+    def setUp(self):
+        self.session = Session.objects.create()
+        self.ref = SessionRef(self.session.id, 'unverified')
+    
+    def test_fixed_reply_is_stored_once(self):
+        """Every fixed reply points at one CannedResponse row and leaves text empty."""
+        _, _, first = conversation_store.persist_turn(self.ref, "hello", FALLBACK_REPLY)
+        _, _, second = conversation_store.persist_turn(self.ref, "again", FALLBACK_REPLY)
+        
+        self.assertEqual(CannedResponse.objects.count(), 1)
+        stored = Message.objects.get(id=second.id)
+        self.assertEqual(stored.text, '')
+        self.assertEqual(stored.canned_id, first.canned_id)
+        self.assertEqual(stored.content, FALLBACK_REPLY)
+    
+    def test_long_reply_is_compressed(self):
+        """Replies over MESSAGE_COMPRESS_MIN_LENGTH are stored as a smaller zlib body."""
+        _, _, ai_message = conversation_store.persist_turn(self.ref, "tell me more", LONG_REPLY)
+        
+        stored = Message.objects.get(id=ai_message.id)
+        self.assertEqual(stored.text, '')
+        self.assertLess(len(stored.body), len(LONG_REPLY) // 4)
+        self.assertEqual(stored.content, LONG_REPLY)
+    
+    def test_other_replies_stay_plain(self):
+        """Short one-off replies and user messages keep using the text column."""
+        _, user_message, ai_message = conversation_store.persist_turn(self.ref, FALLBACK_REPLY, "Sure, happy to help")
+        
+        self.assertEqual(Message.objects.get(id=user_message.id).text, FALLBACK_REPLY)
+        stored = Message.objects.get(id=ai_message.id)
+        self.assertEqual((stored.text, stored.canned_id, stored.body), ("Sure, happy to help", None, None))
+    
+    @override_settings(MESSAGE_COMPRESS_MIN_LENGTH=0)
+    def test_compression_can_be_disabled(self):
+        self.assertIsNone(CannedReplies().pack(LONG_REPLY))
+    
+    @override_settings(EXPORT_TOKEN='secret', EXPORT_LAG=0)
+    def test_history_and_export_return_full_text(self):
+        """Readers see the same text whichever way a reply is stored."""
+        greeting = QUICK_RESPONSES['hello']
+        conversation_store.persist_turn(self.ref, "hello", greeting)
+        conversation_store.persist_turn(self.ref, "tell me more", LONG_REPLY)
+        expected = ["hello", greeting, "tell me more", LONG_REPLY]
+        
+        history = self.client.get(f'/api/session/{self.session.id}/history/').json()
+        self.assertEqual([message['text'] for message in history['messages']], expected)
+        
+        response = self.client.get('/api/export/transcripts/', {'format': 'csv'}, HTTP_AUTHORIZATION='Bearer secret')
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual([row['text'] for row in rows], expected)
+
+
+class CompactMessagesMigrationTestCase(TestCase):
+    """Test cases for converting existing messages in migration 0010."""
+    
+    def setUp(self):
+        self.migration = importlib.import_module('chat.migrations.0010_canned_responses')
+        self.schema_editor = SimpleNamespace(connection=connection)
+        session = Session.objects.create()
+        self.messages = Message.objects.bulk_create([
+            Message(session=session, text=FALLBACK_REPLY, sender='assistant'),
+            Message(session=session, text=LONG_REPLY, sender='assistant'),
+            Message(session=session, text="plain reply", sender='assistant'),
+            Message(session=session, text=FALLBACK_REPLY, sender='user'),
+            Message(session=session, text=FALLBACK_REPLY, sender='assistant'),
+        ])
+    
+    def stored(self):
+        return list(Message.objects.order_by('id').values_list('text', 'canned_id', 'body'))
+    
+    def test_compact_and_expand_round_trip(self):
+        self.migration.compact_messages(apps, self.schema_editor)
+        
+        rows = self.stored()
+        canned_id = CannedResponse.objects.get().id
+        self.assertEqual(rows[0], ('', canned_id, None))
+        self.assertEqual((rows[1][0], rows[1][1]), ('', None))
+        self.assertIsNotNone(rows[1][2])
+        self.assertEqual(rows[2], ("plain reply", None, None))
+        self.assertEqual(rows[3], (FALLBACK_REPLY, None, None))
+        self.assertEqual(rows[4], ('', canned_id, None))
+        self.assertEqual(
+            [message.content for message in Message.objects.order_by('id')],
+            [FALLBACK_REPLY, LONG_REPLY, "plain reply", FALLBACK_REPLY, FALLBACK_REPLY],
+        )
+        
+        # A second run finds nothing left to convert
+        self.migration.compact_messages(apps, self.schema_editor)
+        self.assertEqual(self.stored(), rows)
+        
+        self.migration.expand_messages(apps, self.schema_editor)
+        self.assertEqual(
+            self.stored(),
+            [(text, None, None) for text in [FALLBACK_REPLY, LONG_REPLY, "plain reply", FALLBACK_REPLY, FALLBACK_REPLY]],
+        )
@@ -1,12 +1,12 @@
 import json
 import uuid
 from unittest.mock import patch, MagicMock
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 from rest_framework.test import APITestCase
 from rest_framework import status
 
-from chat.models import Session, Message, Lead
+from chat.models import Session, Message, Lead, LeadJob
 from chat.services.llm_client import LLMClient
 from chat.services.lead_qualifier import LeadQualifier
 
@@ -64,11 +64,12 @@ class ChatFlowTestCase(APITestCase):
         self.assertEqual(Message.objects.count(), 2)  # User + AI message
         self.assertEqual(Lead.objects.count(), 0)
     
+    @override_settings(LEAD_QUALIFICATION_MODE='inline')
     @patch('chat.services.llm_client.llm_client.generate_reply')
     @patch('chat.services.retriever.retriever.get_context')
     @patch('chat.services.lead_qualifier.lead_qualifier.qualify_lead')
     def test_chat_with_lead_qualification(self, mock_qualify, mock_context, mock_reply):
-        """Test chat flow that qualifies a lead."""
+        """Test chat flow that qualifies a lead inline."""
         # Mock the services
         mock_context.return_value = "Mock context"
         mock_reply.return_value = "Thank you for your interest!"
@@ -105,6 +106,46 @@ class ChatFlowTestCase(APITestCase):
         self.assertEqual(lead.email, 'john@example.com')
         self.assertEqual(lead.interest_score, 0.8)
     
+    @patch('chat.services.llm_client.llm_client.generate_reply')
+    @patch('chat.services.lead_qualifier.lead_qualifier.classify')
+    def test_chat_queues_lead_qualification(self, mock_qualify, mock_reply):
+        """Test chat flow that hands lead qualification to the job queue."""
+        from chat.services.lead_queue import lead_queue
+        
+        mock_reply.return_value = "Thank you for your interest!"
+        mock_qualify.return_value = {
+            'is_lead': True,
+            'name': 'John Doe',
+            'email': 'john@example.com',
+            'interest_score': 0.8
+        }
+        
+        response = self.client.post(
+            self.chat_url,
+            data={'message': "I'm John Doe (john@example.com) and I want to hire you"},
+            content_type='application/json'
+        )
+        
+        # The reply comes back before qualification has run
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertFalse(data['lead_qualified'])
+        self.assertEqual(data['lead_status'], 'pending')
+        mock_qualify.assert_not_called()
+        self.assertEqual(LeadJob.objects.filter(status='pending').count(), 1)
+        
+        lead_url = f"/api/session/{data['session_id']}/lead/"
+        self.assertEqual(self.client.get(lead_url).json()['lead_status'], 'pending')
+        
+        # A worker pass qualifies it and the poll endpoint reports the lead
+        self.assertEqual(lead_queue.run_once(), 1)
+        
+        poll = self.client.get(lead_url).json()
+        self.assertEqual(poll['lead_status'], 'qualified')
+        self.assertTrue(poll['lead_qualified'])
+        self.assertEqual(poll['lead_data']['email'], 'john@example.com')
+        self.assertEqual(Lead.objects.count(), 1)
+    
     def test_chat_with_existing_session(self):
         """Test chat with existing session ID."""
         # Create a session
@@ -128,6 +169,21 @@ class ChatFlowTestCase(APITestCase):
             data = response.json()
             self.assertEqual(data['session_id'], str(session.id))
     
+    def test_chat_continues_returned_session(self):
+        """The returned session id identifies the session on the next turn."""
+        with patch('chat.services.llm_client.llm_client.generate_reply') as mock_reply:
+            mock_reply.return_value = "Response"
+            
+            first = self.client.post(self.chat_url, data={'message': 'Hello'}, content_type='application/json').json()
+            second = self.client.post(
+                self.chat_url,
+                data={'session_id': first['session_id'], 'message': 'Tell me more'},
+                content_type='application/json'
+            ).json()
+        
+        self.assertEqual(second['session_id'], first['session_id'])
+        self.assertEqual(Message.objects.filter(session_id=first['session_id']).count(), 4)
+    
     def test_chat_invalid_data(self):
         """Test chat endpoint with invalid data."""
         response = self.client.post(
@@ -268,7 +324,7 @@ class LeadsListTestCase(APITestCase):
         
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         data = response.json()
-        self.assertEqual(len(data), 0)
+        self.assertEqual(len(data['results']), 0)
     
     def test_leads_list_with_data(self):
         """Test leads list with existing leads."""
@@ -284,7 +340,7 @@ class LeadsListTestCase(APITestCase):
         response = self.client.get('/api/leads/')
         
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        data = response.json()
+        data = response.json()['results']
         self.assertEqual(len(data), 1)
         self.assertEqual(data[0]['name'], "John Doe")
         self.assertEqual(data[0]['email'], "john@example.com")
@@ -0,0 +1,185 @@
+import json
+import uuid
+from datetime import timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from chat.models import Session, Message, Lead
+from chat.services.conversation import ConversationStore, SessionRef, conversation_store
+from chat.services.lead_qualifier import lead_qualifier
+
+
+class PersistTurnTestCase(TestCase):
+    """Test cases for single-transaction turn writes."""
+    
+    def test_new_session_turn_is_two_statements(self):
+        """A first turn inserts the session and both messages without any reads."""
+        ref = conversation_store.resolve_session(None)
+        self.assertEqual(ref.state, 'new')
+        
+        with self.assertNumQueries(2):
+            session, user_message, ai_message = conversation_store.persist_turn(ref, "hello", "hi there")
+        
+        self.assertEqual(Session.objects.get().id, ref.id)
+        self.assertLess(user_message.id, ai_message.id)
+        self.assertEqual(
+            list(Message.objects.filter(session=session).values_list('sender', flat=True)),
+            ['user', 'assistant']
+        )
+    
+    def test_existing_session_is_touched(self):
+        """Later turns bump Session.updated_at with an UPDATE instead of a SELECT."""
+        session = Session.objects.create()
+        stale = timezone.now() - timedelta(hours=1)
+        Session.objects.filter(id=session.id).update(updated_at=stale)
+        
+        with self.assertNumQueries(2):
+            conversation_store.persist_turn(SessionRef(session.id, 'unverified'), "again", "sure")
+        
+        session.refresh_from_db()
+        self.assertGreater(session.updated_at, stale)
+        self.assertEqual(session.messages.count(), 2)
+    
+    def test_unknown_session_id_is_upserted(self):
+        """A client-held id the server has never seen is created rather than replaced."""
+        session_id = uuid.uuid4()
+        
+        conversation_store.persist_turn(SessionRef(session_id, 'unverified'), "hello", "hi")
+        conversation_store.persist_turn(SessionRef(session_id, 'unverified'), "more", "ok")
+        
+        self.assertEqual(Session.objects.count(), 1)
+        self.assertEqual(Message.objects.filter(session_id=session_id).count(), 4)
+    
+    def test_many_turns_are_three_statements(self):
+        """persist_turns touches, creates and writes messages for every session at once, in turn order."""
+        existing = Session.objects.create()
+        stale = timezone.now() - timedelta(hours=1)
+        Session.objects.filter(id=existing.id).update(updated_at=stale)
+        known, new = SessionRef(existing.id, 'unverified'), conversation_store.resolve_session(None)
+        turns = [(known, "one", "a"), (new, "two", "b"), (known, "three", "c")]
+        
+        with self.assertNumQueries(3):
+            sessions, messages = conversation_store.persist_turns(turns)
+        
+        self.assertEqual(set(sessions), {existing.id, new.id})
+        self.assertEqual([user.text for user, _ in messages], ["one", "two", "three"])
+        self.assertEqual(
+            list(Message.objects.filter(session=existing, sender='user').values_list('text', flat=True)),
+            ["one", "three"]
+        )
+        existing.refresh_from_db()
+        self.assertGreater(existing.updated_at, stale)
+
+
+class ResolveSessionTestCase(TestCase):
+    """Test cases for resolving the session of a returning turn."""
+    
+    def setUp(self):
+        self.store = ConversationStore()
+    
+    def test_resolve_does_not_query(self):
+        """Resolving a client-held session id is left to the turn's write."""
+        session = Session.objects.create()
+        
+        with self.assertNumQueries(0):
+            ref = self.store.resolve_session(session.id)
+        
+        self.assertEqual((ref.id, ref.state), (session.id, 'unverified'))
+    
+    def test_returning_turn_is_two_statements(self):
+        """A returning session's turn bumps the session's counters and writes the messages."""
+        ref = self.store.resolve_session(None)
+        self.store.persist_turn(ref, "hello", "hi")
+        
+        ref = self.store.resolve_session(ref.id)
+        with self.assertNumQueries(2):
+            self.store.persist_turn(ref, "again", "sure")
+        self.assertEqual(Message.objects.filter(session_id=ref.id).count(), 4)
+    
+    def test_pruned_session(self):
+        """A session id whose row was deleted starts that session again, one turn or many."""
+        ref = self.store.resolve_session(None)
+        self.store.persist_turn(ref, "hello", "hi")
+        Session.objects.all().delete()
+        
+        self.store.persist_turns([(self.store.resolve_session(ref.id), "back", "welcome back")])
+        
+        self.assertEqual(Session.objects.get().message_count, 2)
+        Session.objects.all().delete()
+        self.store.persist_turn(self.store.resolve_session(ref.id), "back", "welcome back")
+        self.assertEqual(Session.objects.get(id=ref.id).message_count, 2)
+
+
+class SessionCountersTestCase(TestCase):
+    """Test cases for the summary fields maintained on Session."""
+    
+    def summary(self, session_id):
+        return Session.objects.values('message_count', 'has_lead', 'max_interest_score').get(id=session_id)
+    
+    def test_turns_bump_counters(self):
+        """Each turn adds both messages to message_count and moves last_message_at."""
+        ref = conversation_store.resolve_session(None)
+        conversation_store.persist_turn(ref, "hello", "hi")
+        first = Session.objects.get(id=ref.id).last_message_at
+        conversation_store.persist_turn(SessionRef(ref.id, 'unverified'), "again", "sure")
+        
+        session = Session.objects.get(id=ref.id)
+        self.assertEqual(session.message_count, 4)
+        self.assertGreaterEqual(session.last_message_at, first)
+        self.assertEqual(session.updated_at, session.last_message_at)
+    
+    def test_batched_turns_count_per_session(self):
+        """persist_turns adds each session's own number of messages."""
+        existing = Session.objects.create(message_count=6)
+        known, new = SessionRef(existing.id, 'unverified'), conversation_store.resolve_session(None)
+        other = SessionRef(Session.objects.create().id, 'unverified')
+        
+        conversation_store.persist_turns([(known, "one", "a"), (new, "two", "b"), (known, "three", "c"), (other, "four", "d")])
+        
+        counts = dict(Session.objects.values_list('id', 'message_count'))
+        self.assertEqual(counts, {existing.id: 10, new.id: 2, other.id: 2})
+    
+    def test_saved_lead_marks_session(self):
+        """Lead saves flag the source session and keep the highest score seen."""
+        session = Session.objects.create()
+        result = {'is_lead': True, 'name': 'Dana', 'email': 'dana@example.com', 'interest_score': 0.6}
+        lead_qualifier.save_lead(session, result, "quote please")
+        self.assertEqual(self.summary(session.id), {'message_count': 0, 'has_lead': True, 'max_interest_score': 0.6})
+        
+        # A repeat sighting from another session merges into the lead and raises its source session
+        later = Session.objects.create()
+        lead_qualifier.save_lead(later, dict(result, interest_score=0.9), "ready to hire")
+        self.assertEqual(self.summary(session.id)['max_interest_score'], 0.9)
+        self.assertFalse(self.summary(later.id)['has_lead'])
+    
+    def test_backfill_command(self):
+        """backfill_session_counters recomputes the fields from messages and leads."""
+        session, empty = Session.objects.create(), Session.objects.create()
+        Message.objects.bulk_create([Message(session=session, text=f"m{i}", sender='user') for i in range(3)])
+        Lead.objects.create(email='a@example.com', interest_score=0.4, source_session=session)
+        Lead.objects.create(email='b@example.com', interest_score=0.7, source_session=session)
+        
+        call_command('backfill_session_counters', '--batch-size', '1', stdout=StringIO())
+        
+        self.assertEqual(self.summary(session.id), {'message_count': 3, 'has_lead': True, 'max_interest_score': 0.7})
+        self.assertEqual(self.summary(empty.id), {'message_count': 0, 'has_lead': False, 'max_interest_score': 0.0})
+        self.assertEqual(
+            Session.objects.get(id=session.id).last_message_at,
+            Message.objects.filter(session=session).latest('timestamp', 'id').timestamp
+        )
+
+
+class BenchTurnWritesCommandTestCase(TestCase):
+    """Test cases for the bench_turn_writes management command."""
+    
+    def test_reports_both_paths_and_cleans_up(self):
+        """The report compares both write paths and leaves no benchmark rows behind."""
+        out = StringIO()
+        call_command('bench_turn_writes', '--sessions', '2', '--turns', '3', stdout=out)
+        
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['legacy']['turns'], 6)
+        self.assertLess(report['single_transaction']['statements_per_turn'], report['legacy']['statements_per_turn'])
+        self.assertEqual(Session.objects.count(), 0)
@@ -0,0 +1,106 @@
+from unittest.mock import patch, MagicMock
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APITestCase
+
+from chat.models import Lead
+from chat.services.deadline import Deadline, db_deadline
+from chat.services.llm_client import LLMClient
+
+
+class DeadlineTestCase(TestCase):
+    """Test cases for the request deadline."""
+    
+    def test_timeout_is_capped_by_remaining_budget(self):
+        """A stage never gets more time than is left."""
+        deadline = Deadline(2.0)
+        
+        self.assertLessEqual(deadline.timeout(cap=5.0), 2.0)
+        self.assertEqual(deadline.timeout(cap=0.5), 0.5)
+        self.assertLessEqual(deadline.timeout(cap=5.0, reserve=1.5), 0.5)
+    
+    def test_expired_deadline(self):
+        """An exhausted budget leaves no time for anything."""
+        deadline = Deadline(0.0)
+        
+        self.assertTrue(deadline.expired)
+        self.assertEqual(deadline.timeout(cap=5.0), 0.0)
+        self.assertFalse(deadline.allows(0.1))
+    
+    def test_db_statement_timeout_floor(self):
+        """Late requests still give required writes the floor; optional work gets what is left."""
+        connection = MagicMock(vendor='postgresql')
+        cursor = connection.cursor.return_value.__enter__.return_value
+        
+        with patch('chat.services.deadline.connections', {'default': connection}):
+            with db_deadline(Deadline(0.0), floor=5.0):
+                pass
+            with db_deadline(Deadline(0.0)):
+                pass
+        
+        self.assertEqual([c.args[1] for c in cursor.execute.call_args_list], [[5000], [1]])
+    
+    def test_llm_call_uses_remaining_budget(self):
+        """The OpenAI timeout comes from the deadline, not the fixed default."""
+        client = LLMClient()
+        client._initialized = True
+        client.client = MagicMock()
+        client.client.chat.completions.create.return_value.choices = [
+            MagicMock(message=MagicMock(content='Reply'))
+        ]
+        
+        with patch('chat.services.llm_client.cache') as mock_cache:
+            mock_cache.get.return_value = None
+            client.generate_reply('Tell me about refund terms', 'session-1', deadline=Deadline(2.0))
+        
+        timeout = client.client.chat.completions.create.call_args.kwargs['timeout']
+        self.assertLessEqual(timeout, 1.5)
+    
+    def test_llm_call_skipped_when_budget_exhausted(self):
+        """No API call is started once the budget is gone."""
+        client = LLMClient()
+        client._initialized = True
+        client.client = MagicMock()
+        
+        with patch('chat.services.llm_client.cache') as mock_cache:
+            mock_cache.get.return_value = None
+            reply = client.generate_reply('Tell me about refund terms', 'session-1', deadline=Deadline(0.1))
+        
+        client.client.chat.completions.create.assert_not_called()
+        self.assertIn('apologize', reply)
+
+
+class ChatDeadlineTestCase(APITestCase):
+    """Test cases for deadline handling in the chat view."""
+    
+    def setUp(self):
+        cache.clear()
+    
+    @override_settings(CHAT_MIN_QUALIFY_BUDGET=60.0)
+    @patch('chat.services.lead_qualifier.lead_qualifier.qualify_lead')
+    @patch('chat.services.llm_client.llm_client.generate_reply')
+    def test_qualification_skipped_when_time_is_short(self, mock_reply, mock_qualify):
+        """Lead qualification is optional work and is dropped under budget pressure."""
+        mock_reply.return_value = "Thanks!"
+        
+        response = self.client.post(
+            '/api/chat/',
+            data={'message': "I'm Jane, jane@example.com, I want to hire you"},
+            format='json'
+        )
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.json()['lead_qualified'])
+        mock_qualify.assert_not_called()
+        self.assertEqual(Lead.objects.count(), 0)
+    
+    @patch('chat.services.llm_client.llm_client.generate_reply')
+    def test_reply_receives_deadline(self, mock_reply):
+        """The chat view passes its deadline down to the LLM client."""
+        mock_reply.return_value = "Hello"
+        
+        self.client.post('/api/chat/', data={'message': 'Tell me more'}, format='json')
+        
+        deadline = mock_reply.call_args.kwargs['deadline']
+        self.assertIsInstance(deadline, Deadline)
+        self.assertLessEqual(deadline.budget, 8.0)
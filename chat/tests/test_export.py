@@ -0,0 +1,140 @@
+import csv
+import io
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from chat.models import Session, Message, Lead
+from chat.pagination import decode_position
+from chat.services.exporter import exporter
+
+
+@override_settings(EXPORT_TOKEN='secret', EXPORT_LAG=0)
+class ExportEndpointTestCase(TestCase):
+    """Test cases for the streaming export endpoints."""
+    
+    def setUp(self):
+        self.session = Session.objects.create()
+        self.leads = [
+            Lead.objects.create(name=f"Lead {i}", email=f"lead{i}@example.com", interest_score=0.5, source_session=self.session)
+            for i in range(3)
+        ]
+        for i in range(4):
+            Message.objects.create(session=self.session, text=f"line {i}, with comma", sender='user')
+    
+    def get(self, url, **params):
+        return self.client.get(url, params, HTTP_AUTHORIZATION='Bearer secret')
+    
+    def ndjson(self, response):
+        body = b''.join(response.streaming_content).decode()
+        return [json.loads(line) for line in body.splitlines()]
+    
+    def test_requires_token(self):
+        """Exports carry PII, so they are refused without the bearer token."""
+        self.assertEqual(self.client.get('/api/export/leads/').status_code, 403)
+        self.assertEqual(self.client.get('/api/export/leads/', HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        with override_settings(EXPORT_TOKEN=None):
+            self.assertEqual(self.get('/api/export/leads/').status_code, 403)
+    
+    def test_leads_ndjson_incremental(self):
+        """Passing back the last cursor returns only leads changed since."""
+        response = self.get('/api/export/leads/')
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = self.ndjson(response)
+        self.assertEqual([row['name'] for row in rows], ['Lead 0', 'Lead 1', 'Lead 2'])
+        
+        self.assertEqual(self.ndjson(self.get('/api/export/leads/', since=rows[-1]['cursor'])), [])
+        
+        self.leads[0].interest_score = 0.9
+        self.leads[0].save()
+        changed = self.ndjson(self.get('/api/export/leads/', since=rows[-1]['cursor']))
+        self.assertEqual([(row['name'], row['interest_score']) for row in changed], [('Lead 0', 0.9)])
+    
+    def test_transcripts_csv(self):
+        """CSV exports have a header row and quote embedded commas."""
+        response = self.get('/api/export/transcripts/', format='csv', since=str(Message.objects.order_by('id').first().id))
+        
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        reader = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual([row['text'] for row in reader], ['line 1, with comma', 'line 2, with comma', 'line 3, with comma'])
+        self.assertEqual(reader[0]['session'], str(self.session.id))
+    
+    def test_bad_parameters(self):
+        """Unknown formats and garbage cursors are rejected before streaming starts."""
+        self.assertEqual(self.get('/api/export/leads/', format='xml').status_code, 400)
+        self.assertEqual(self.get('/api/export/leads/', since='nope').status_code, 400)
+        self.assertEqual(self.get('/api/export/transcripts/', since='nope').status_code, 400)
+
+
+@override_settings(EXPORT_LAG=0)
+class ExportDataCommandTestCase(TestCase):
+    """Test cases for the export_data management command."""
+    
+    def test_state_file_resumes(self):
+        """With --state, a second run exports only rows added after the first."""
+        session = Session.objects.create()
+        Message.objects.create(session=session, text="first", sender='user')
+        
+        with tempfile.TemporaryDirectory() as tmpdir:
+            state = os.path.join(tmpdir, 'state.json')
+            output = os.path.join(tmpdir, 'out.ndjson')
+            
+            call_command('export_data', 'transcripts', '--output', output, '--state', state, stderr=StringIO())
+            Message.objects.create(session=session, text="second", sender='assistant')
+            err = StringIO()
+            call_command('export_data', 'transcripts', '--output', output, '--state', state, stderr=err)
+            
+            with open(output) as f:
+                rows = [json.loads(line) for line in f]
+        
+        self.assertEqual([row['text'] for row in rows], ['second'])
+        self.assertIn('Exported 1 transcripts rows', err.getvalue())
+
+
+@override_settings(EXPORT_LAG=60)
+class ExportLagTestCase(TestCase):
+    """Test cases for keeping export cursors behind writes that may still be committing."""
+    
+    def setUp(self):
+        self.session = Session.objects.create()
+        self.old = timezone.now() - timedelta(minutes=10)
+    
+    def later(self):
+        """Move the exporter's clock past the lag."""
+        return patch('chat.services.exporter.timezone.now', return_value=timezone.now() + timedelta(minutes=2))
+    
+    def test_transcripts_stop_before_message_still_committing(self):
+        """A higher id committed first is held back until the lower, younger one is exportable too."""
+        first, in_flight, committed_first = [
+            Message.objects.create(session=self.session, text=text, sender='user')
+            for text in ('first', 'in flight', 'committed first')
+        ]
+        Message.objects.filter(id__in=[first.id, committed_first.id]).update(timestamp=self.old)
+        
+        rows = list(exporter.transcript_rows())
+        self.assertEqual([row['text'] for row in rows], ['first'])
+        
+        with self.later():
+            rows = list(exporter.transcript_rows(rows[-1]['cursor']))
+        self.assertEqual([row['text'] for row in rows], ['in flight', 'committed first'])
+    
+    def test_lead_cursor_stays_behind_lag(self):
+        """Recently changed leads wait, and the cursor handed out is older than the lag bound."""
+        settled = Lead.objects.create(name="Settled", interest_score=0.5, source_session=self.session)
+        Lead.objects.filter(id=settled.id).update(updated_at=self.old)
+        Lead.objects.create(name="Recent", interest_score=0.5, source_session=self.session)
+        
+        rows = list(exporter.lead_rows())
+        self.assertEqual([row['name'] for row in rows], ['Settled'])
+        self.assertLess(decode_position(rows[-1]['cursor'])[0], timezone.now() - timedelta(seconds=60))
+        
+        with self.later():
+            rows = list(exporter.lead_rows(rows[-1]['cursor']))
+        self.assertEqual([row['name'] for row in rows], ['Recent'])
@@ -0,0 +1,100 @@
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from chat.models import Session, Message
+from chat.pagination import encode_cursor, decode_cursor, message_page
+
+
+class SessionHistoryPaginationTestCase(APITestCase):
+    """Test cases for keyset-paginated session history."""
+    
+    def setUp(self):
+        self.session = Session.objects.create()
+        Message.objects.bulk_create([
+            Message(session=self.session, text=f"message {i}", sender='user' if i % 2 == 0 else 'assistant')
+            for i in range(7)
+        ])
+        self.url = f'/api/session/{self.session.id}/history/'
+    
+    def texts(self, data):
+        return [message['text'] for message in data['messages']]
+    
+    def test_pages_backwards_from_newest(self):
+        """Without a cursor the newest page comes back; before walks to older pages."""
+        first = self.client.get(self.url, {'limit': 3}).json()
+        self.assertEqual(self.texts(first), ['message 4', 'message 5', 'message 6'])
+        
+        second = self.client.get(self.url, {'limit': 3, 'before': first['before']}).json()
+        self.assertEqual(self.texts(second), ['message 1', 'message 2', 'message 3'])
+        
+        third = self.client.get(self.url, {'limit': 3, 'before': second['before']}).json()
+        self.assertEqual(self.texts(third), ['message 0'])
+        self.assertIsNone(third['before'])
+    
+    def test_after_polls_for_new_messages(self):
+        """The after cursor returns only messages added since, and stays put when there are none."""
+        page = self.client.get(self.url).json()
+        self.assertEqual(len(page['messages']), 7)
+        
+        empty = self.client.get(self.url, {'after': page['after']}).json()
+        self.assertEqual(empty['messages'], [])
+        self.assertEqual(empty['after'], page['after'])
+        
+        Message.objects.create(session=self.session, text="message 7", sender='user')
+        newer = self.client.get(self.url, {'after': page['after']}).json()
+        self.assertEqual(self.texts(newer), ['message 7'])
+    
+    @override_settings(HISTORY_MAX_PAGE_SIZE=4)
+    def test_page_size_is_capped(self):
+        """Clients cannot ask for more than HISTORY_MAX_PAGE_SIZE messages at once."""
+        data = self.client.get(self.url, {'limit': 1000}).json()
+        
+        self.assertEqual(len(data['messages']), 4)
+    
+    def test_invalid_cursor(self):
+        """Garbage cursors and limits are rejected with 400."""
+        self.assertEqual(self.client.get(self.url, {'before': 'not-a-cursor'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(self.url, {'limit': 'ten'}).status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_two_queries_per_page(self):
+        """One lookup for the session and one bounded query for the page."""
+        with self.assertNumQueries(2):
+            self.client.get(self.url, {'limit': 3})
+    
+    def test_cursor_round_trip(self):
+        """Cursors encode the (timestamp, id) position of a message."""
+        message = Message.objects.first()
+        
+        self.assertEqual(decode_cursor(encode_cursor(message)), (message.timestamp, message.id))
+
+
+class MessageIndexQueryPlanTestCase(TestCase):
+    """The history page queries are served by the composite (session, timestamp, id) index."""
+    
+    def explain(self, sql):
+        prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql)
+            return '\n'.join(' '.join(str(col) for col in row) for row in cursor.fetchall())
+    
+    def test_page_queries_use_composite_index(self):
+        session = Session.objects.create()
+        Message.objects.bulk_create([Message(session=session, text=str(i), sender='user') for i in range(20)])
+        queryset = Message.objects.filter(session=session)
+        _, before, after = message_page(queryset, limit=5)
+        
+        with CaptureQueriesContext(connection) as captured:
+            message_page(queryset, limit=5)
+            message_page(queryset, before=before, limit=5)
+            message_page(queryset, after=before, limit=5)
+        
+        self.assertEqual(len(captured.captured_queries), 3)
+        for query in captured.captured_queries:
+            plan = self.explain(query['sql'])
+            self.assertIn('chat_message_session_ts_idx', plan)
+            if connection.vendor == 'sqlite':
+                # The index already yields rows in order, so there is no separate sort step
+                self.assertNotIn('TEMP B-TREE', plan)
@@ -0,0 +1,104 @@
+import gzip
+from unittest.mock import patch
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from chat.models import Session, Message
+from chat.services.page_cache import RenderedPage, page_cache
+
+
+@override_settings(
+    FRONTEND_CACHE=True,
+    STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage',
+)
+class FrontendCachingTestCase(TestCase):
+    """Test cases for the cached, compressed frontend page."""
+    
+    def setUp(self):
+        page_cache.clear()
+    
+    def tearDown(self):
+        page_cache.clear()
+    
+    def test_rendered_once(self):
+        """The template engine runs once per process, not once per request."""
+        with patch('chat.services.page_cache.render_to_string', return_value='<html></html>') as mock_render:
+            for _ in range(3):
+                self.assertEqual(self.client.get('/').status_code, status.HTTP_200_OK)
+        
+        mock_render.assert_called_once_with('index.html')
+    
+    def test_gzip_negotiated(self):
+        """Clients that accept gzip get the precompressed body with its own ETag."""
+        plain = self.client.get('/')
+        compressed = self.client.get('/', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(compressed.content), plain.content)
+        self.assertNotEqual(compressed['ETag'], plain['ETag'])
+        self.assertIn('Accept-Encoding', compressed['Vary'])
+        self.assertNotIn('Content-Encoding', plain)
+    
+    def test_etag_revalidation(self):
+        """A matching If-None-Match gets 304 with no body."""
+        etag = self.client.get('/')['ETag']
+        
+        response = self.client.get('/', HTTP_IF_NONE_MATCH=etag)
+        
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+    
+    def test_head_matches_get(self):
+        """HEAD sends GET's headers without rendering or sending the body."""
+        get = self.client.get('/')
+        head = self.client.head('/')
+        
+        self.assertEqual(head.content, b'')
+        self.assertEqual(head['Content-Length'], str(len(get.content)))
+        self.assertEqual(head['ETag'], get['ETag'])
+    
+    def test_negotiate(self):
+        """q=0 refuses an encoding; higher weights win."""
+        page = RenderedPage(b'<html></html>')
+        
+        self.assertEqual(page.negotiate(''), 'identity')
+        self.assertEqual(page.negotiate('gzip;q=0'), 'identity')
+        self.assertEqual(page.negotiate('*'), 'br' if 'br' in page.bodies else 'gzip')
+
+
+class HistoryConditionalGetTestCase(APITestCase):
+    """Test cases for ETag/Last-Modified on session history."""
+    
+    def setUp(self):
+        self.session = Session.objects.create()
+        Message.objects.create(session=self.session, text="hello", sender='user')
+        self.url = f'/api/session/{self.session.id}/history/'
+    
+    def test_unchanged_poll_is_304(self):
+        """Polling with the last ETag costs one query and no body until a message arrives."""
+        first = self.client.get(self.url)
+        self.assertIn('Last-Modified', first)
+        
+        with self.assertNumQueries(1):
+            again = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(again.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(again['ETag'], first['ETag'])
+        
+        Message.objects.create(session=self.session, text="anyone there?", sender='user')
+        changed = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(changed.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(changed['ETag'], first['ETag'])
+    
+    def test_etag_varies_with_page(self):
+        """Different pages of the same history are different representations."""
+        self.assertNotEqual(self.client.get(self.url)['ETag'], self.client.get(self.url, {'limit': 1})['ETag'])
+    
+    def test_if_modified_since(self):
+        """Last-Modified works as a validator on its own."""
+        last_modified = self.client.get(self.url)['Last-Modified']
+        
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
@@ -0,0 +1,124 @@
+from datetime import timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from chat.models import Session, Lead, LeadJob
+from chat.services.lead_qualifier import LeadQualifier
+
+
+class LeadUpsertTestCase(TestCase):
+    """Test cases for lead upserts keyed by identity."""
+
+    def setUp(self):
+        self.qualifier = LeadQualifier()
+        self.session = Session.objects.create()
+
+    def result(self, name=None, email=None, score=0.5):
+        return {'is_lead': True, 'name': name, 'email': email, 'interest_score': score}
+
+    def test_same_email_merges_into_one_lead(self):
+        """Repeat sightings of an email update one lead instead of creating duplicates."""
+        first = self.qualifier.save_lead(self.session, self.result('Ann', 'Ann@Example.com ', 0.6), "first message")
+        second = self.qualifier.save_lead(Session.objects.create(), self.result(None, 'ann@example.com', 0.4), "second message")
+
+        self.assertEqual(first.id, second.id)
+        self.assertEqual(Lead.objects.count(), 1)
+        lead = Lead.objects.get()
+        self.assertEqual(lead.email, 'ann@example.com')
+        self.assertEqual(lead.identity_key, 'email:ann@example.com')
+        self.assertEqual(lead.interest_score, 0.6)
+        self.assertIn('first message', lead.notes)
+        self.assertIn('second message', lead.notes)
+
+    def test_name_only_lead_is_keyed_per_session(self):
+        """Without an email the same name in different sessions stays separate."""
+        self.qualifier.save_lead(self.session, self.result('Bob'), "hi")
+        self.qualifier.save_lead(self.session, self.result('bob'), "again")
+        self.qualifier.save_lead(Session.objects.create(), self.result('Bob'), "other visitor")
+
+        self.assertEqual(Lead.objects.count(), 2)
+
+    def test_name_lead_promoted_when_email_arrives(self):
+        """A name-only lead gains the email identity once the visitor shares it."""
+        self.qualifier.save_lead(self.session, self.result('Cy', None, 0.4), "I'm Cy")
+        lead = self.qualifier.save_lead(self.session, self.result('Cy', 'cy@example.com', 0.8), "cy@example.com")
+
+        self.assertEqual(Lead.objects.count(), 1)
+        self.assertEqual(lead.identity_key, 'email:cy@example.com')
+        self.assertEqual(lead.interest_score, 0.8)
+
+    @override_settings(LEAD_SCORE_MERGE='decay', LEAD_SCORE_HALF_LIFE_DAYS=10)
+    def test_decayed_merge(self):
+        """In decay mode an old high score fades before being compared."""
+        lead = self.qualifier.save_lead(self.session, self.result(None, 'd@example.com', 0.8), "old")
+        Lead.objects.filter(id=lead.id).update(updated_at=timezone.now() - timedelta(days=10))
+
+        lead = self.qualifier.save_lead(self.session, self.result(None, 'd@example.com', 0.5), "new")
+
+        self.assertAlmostEqual(lead.interest_score, 0.5)
+
+    def test_identity_key_is_unique(self):
+        """The database rejects a second row with the same identity."""
+        Lead.objects.create(source_session=self.session, identity_key='email:x@example.com')
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Lead.objects.create(source_session=self.session, identity_key='email:x@example.com')
+
+
+class DedupeLeadsCommandTestCase(TestCase):
+    """Test cases for the dedupe_leads management command."""
+
+    def test_collapses_existing_duplicates(self):
+        """Legacy duplicate rows are merged into the oldest lead and jobs are repointed."""
+        session = Session.objects.create()
+        first = Lead.objects.create(email='eve@example.com', interest_score=0.5, source_session=session, notes='a')
+        second = Lead.objects.create(name='Eve', email='EVE@example.com', interest_score=0.9, source_session=session, notes='b')
+        other = Lead.objects.create(email='frank@example.com', interest_score=0.4, source_session=session)
+        Lead.objects.create(interest_score=0.1, source_session=session)
+        job = LeadJob.objects.create(session=session, message_text='x', lead=second, status='done')
+
+        out = StringIO()
+        call_command('dedupe_leads', '--batch-size', '2', stdout=out)
+
+        self.assertEqual(Lead.objects.count(), 3)
+        first.refresh_from_db()
+        self.assertEqual(first.identity_key, 'email:eve@example.com')
+        self.assertEqual(first.name, 'Eve')
+        self.assertEqual(first.interest_score, 0.9)
+        self.assertEqual(first.notes, 'a\nb')
+        job.refresh_from_db()
+        self.assertEqual(job.lead_id, first.id)
+        other.refresh_from_db()
+        self.assertEqual(other.identity_key, 'email:frank@example.com')
+        self.assertIn('Merged 1 duplicate leads', out.getvalue())
+
+    def test_dry_run(self):
+        """Dry runs leave the rows untouched."""
+        session = Session.objects.create()
+        Lead.objects.create(email='g@example.com', source_session=session)
+        Lead.objects.create(email='g@example.com', source_session=session)
+
+        out = StringIO()
+        call_command('dedupe_leads', '--dry-run', stdout=out)
+
+        self.assertEqual(Lead.objects.count(), 2)
+        self.assertFalse(Lead.objects.filter(identity_key__isnull=False).exists())
+        self.assertIn('Would merge 1 duplicate leads', out.getvalue())
+
+    def test_recounts_affected_sessions(self):
+        """Sessions whose leads were merged away or rescored get their lead summary recomputed."""
+        kept_session, merged_session = Session.objects.create(), Session.objects.create()
+        Lead.objects.create(email='h@example.com', interest_score=0.3, source_session=kept_session)
+        Lead.objects.create(email='h@example.com', interest_score=0.8, source_session=merged_session)
+        Session.objects.update(has_lead=True)
+        Session.objects.filter(id=merged_session.id).update(max_interest_score=0.8)
+
+        call_command('dedupe_leads', stdout=StringIO())
+
+        kept_session.refresh_from_db()
+        merged_session.refresh_from_db()
+        self.assertEqual((kept_session.has_lead, kept_session.max_interest_score), (True, 0.8))
+        self.assertEqual((merged_session.has_lead, merged_session.max_interest_score), (False, 0.0))
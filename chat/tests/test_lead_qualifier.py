@@ -2,6 +2,7 @@ import json
 from unittest.mock import patch, MagicMock
 from django.test import TestCase
 
+from chat.models import Session, Lead, SessionLeadState
 from chat.services.lead_qualifier import LeadQualifier
 
 
@@ -129,5 +130,58 @@ class LeadQualifierTestCase(TestCase):
             self.assertEqual(result['interest_score'], 0.0)  # Default value
 
 
-
-
+class SessionLeadStateTestCase(TestCase):
+    """Test cases for incremental per-session lead qualification."""
+    
+    def setUp(self):
+        self.qualifier = LeadQualifier()
+        self.session = Session.objects.create()
+    
+    @patch('chat.services.lead_qualifier.llm_client.classify_and_extract')
+    def test_name_and_email_from_separate_turns_combine(self, mock_classify):
+        """A name in one turn and an email in a later one produce one lead with both."""
+        mock_classify.side_effect = [
+            {'is_lead': False, 'name': 'Ann Lee', 'email': None, 'interest_score': 0.5,
+             'evidence': 'wants a support chatbot'},
+            {'is_lead': True, 'name': None, 'email': 'Ann@Example.com', 'interest_score': 0.8,
+             'evidence': 'shared email for a quote'},
+        ]
+        
+        first = self.qualifier.qualify_lead("I'm Ann Lee, we need a support chatbot", session=self.session)
+        self.assertFalse(first['is_lead'])
+        self.assertIsNone(mock_classify.call_args.kwargs['state_summary'])
+        
+        second = self.qualifier.qualify_lead("ann@example.com", session=self.session)
+        
+        # The second call only carries the compact summary, not the earlier message
+        summary = mock_classify.call_args.kwargs['state_summary']
+        self.assertIn('Name: Ann Lee', summary)
+        self.assertIn('wants a support chatbot', summary)
+        self.assertEqual(second, {'is_lead': True, 'name': 'Ann Lee', 'email': 'ann@example.com', 'interest_score': 0.8})
+        
+        self.qualifier.save_lead(self.session, second, "ann@example.com")
+        self.assertEqual(Lead.objects.get().name, 'Ann Lee')
+        
+        state = SessionLeadState.objects.get(session=self.session)
+        self.assertEqual(state.messages_scored, 2)
+        self.assertEqual(len(state.evidence), 2)
+    
+    @patch('chat.services.lead_qualifier.llm_client.classify_and_extract')
+    def test_evidence_is_capped(self, mock_classify):
+        """Only the most recent evidence is kept so the summary stays small."""
+        mock_classify.side_effect = [
+            {'is_lead': False, 'name': None, 'email': None, 'interest_score': 0.2, 'evidence': f"signal {i}"}
+            for i in range(8)
+        ]
+        
+        for i in range(8):
+            self.qualifier.qualify_lead(f"message {i}", session=self.session)
+        
+        state = SessionLeadState.objects.get(session=self.session)
+        self.assertEqual(state.evidence, [f"signal {i}" for i in range(3, 8)])
+    
+    def test_should_qualify_self_introductions(self):
+        """Introductions pass the pre-filter so the name reaches the session state."""
+        self.assertTrue(self.qualifier.should_qualify("Hi, I'm Ann"))
+        self.assertTrue(self.qualifier.should_qualify("my name is Bob"))
+        self.assertFalse(self.qualifier.should_qualify("what do you charge?"))
@@ -0,0 +1,160 @@
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from chat.models import Session, Lead, LeadJob, SessionLeadState
+from chat.services.lead_queue import lead_queue
+
+
+LEAD_RESULT = {
+    'is_lead': True,
+    'name': 'Jane Smith',
+    'email': 'jane@example.com',
+    'interest_score': 0.9
+}
+
+
+class LeadQueueTestCase(TestCase):
+    """Test cases for the lead qualification job queue."""
+    
+    def setUp(self):
+        self.session = Session.objects.create()
+    
+    def test_claim_marks_jobs_running(self):
+        """Claimed jobs are locked and not handed out twice."""
+        for i in range(3):
+            lead_queue.enqueue(self.session, f"message {i}")
+        
+        first = lead_queue.claim(2)
+        second = lead_queue.claim(2)
+        
+        self.assertEqual(len(first), 2)
+        self.assertEqual(len(second), 1)
+        self.assertTrue(all(job.status == 'running' and job.attempts == 1 for job in first))
+        self.assertFalse({job.id for job in first} & {job.id for job in second})
+        self.assertEqual(lead_queue.claim(2), [])
+    
+    @patch('chat.services.lead_qualifier.lead_qualifier.classify')
+    def test_process_saves_lead(self, mock_qualify):
+        """A qualifying message produces a lead linked to the job."""
+        mock_qualify.return_value = dict(LEAD_RESULT)
+        lead_queue.enqueue(self.session, "I'm Jane, jane@example.com")
+        
+        lead_queue.run_once()
+        
+        job = LeadJob.objects.get()
+        self.assertEqual(job.status, 'done')
+        self.assertEqual(job.lead.email, 'jane@example.com')
+        self.assertEqual(job.result['interest_score'], 0.9)
+    
+    @patch('chat.services.lead_qualifier.lead_qualifier.should_save_lead')
+    @patch('chat.services.lead_qualifier.lead_qualifier.classify')
+    def test_failed_job_is_retried_then_failed(self, mock_qualify, mock_should_save):
+        """Errors put the job back in the queue until the attempt limit."""
+        mock_qualify.return_value = dict(LEAD_RESULT)
+        mock_should_save.side_effect = Exception("boom")
+        lead_queue.enqueue(self.session, "hire me")
+        
+        for _ in range(lead_queue.max_attempts):
+            lead_queue.run_once()
+        
+        job = LeadJob.objects.get()
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(job.attempts, lead_queue.max_attempts)
+        self.assertIn('boom', job.error)
+    
+    @patch('chat.services.lead_qualifier.llm_client.classify_and_extract')
+    def test_llm_error_is_retried(self, mock_classify):
+        """A failed classification puts the job back instead of finishing it with no lead."""
+        mock_classify.side_effect = Exception("API timeout")
+        lead_queue.enqueue(self.session, "I'm Jane, jane@example.com")
+        
+        lead_queue.run_once()
+        
+        job = LeadJob.objects.get()
+        self.assertEqual(job.status, 'pending')
+        self.assertIn('API timeout', job.error)
+        self.assertEqual(mock_classify.call_args.kwargs['raise_errors'], True)
+    
+    @patch('chat.services.lead_qualifier.lead_qualifier.should_save_lead')
+    @patch('chat.services.lead_qualifier.llm_client.classify_and_extract')
+    def test_retry_scores_message_once(self, mock_classify, mock_should_save):
+        """A job that fails after the state update rolls it back, so the retry doesn't count the message twice."""
+        mock_classify.return_value = dict(LEAD_RESULT, evidence='wants a chatbot')
+        mock_should_save.side_effect = [Exception("boom"), True]
+        lead_queue.enqueue(self.session, "I'm Jane, jane@example.com")
+        
+        lead_queue.run_once()
+        lead_queue.run_once()
+        
+        self.assertEqual(LeadJob.objects.get().status, 'done')
+        state = SessionLeadState.objects.get(session=self.session)
+        self.assertEqual(state.messages_scored, 1)
+        self.assertEqual(state.evidence, ['wants a chatbot'])
+    
+    def test_requeue_stale(self):
+        """Jobs abandoned by a dead worker go back to pending."""
+        job = lead_queue.enqueue(self.session, "hire me")
+        LeadJob.objects.filter(id=job.id).update(
+            status='running',
+            locked_at=timezone.now() - timedelta(seconds=lead_queue.stale_after + 1)
+        )
+        
+        self.assertEqual(lead_queue.requeue_stale(), 1)
+        self.assertEqual(LeadJob.objects.get().status, 'pending')
+    
+    def test_requeue_stale_respects_attempts(self):
+        """A job that keeps killing its worker fails once it has used every attempt."""
+        job = lead_queue.enqueue(self.session, "hire me")
+        LeadJob.objects.filter(id=job.id).update(
+            status='running',
+            attempts=lead_queue.max_attempts,
+            locked_at=timezone.now() - timedelta(seconds=lead_queue.stale_after + 1)
+        )
+        
+        self.assertEqual(lead_queue.requeue_stale(), 0)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertIn('Worker stopped', job.error)
+
+
+class RunLeadWorkerCommandTestCase(TransactionTestCase):
+    """Test cases for the run_lead_worker management command."""
+    
+    @patch('chat.services.lead_qualifier.lead_qualifier.classify')
+    def test_once_drains_queue(self, mock_qualify):
+        """--once processes every pending job, then exits."""
+        mock_qualify.return_value = dict(LEAD_RESULT)
+        session = Session.objects.create()
+        for i in range(5):
+            lead_queue.enqueue(session, f"message {i}")
+        
+        # The in-memory SQLite test database uses shared-cache table locks, so a single worker thread here
+        out = StringIO()
+        call_command('run_lead_worker', '--once', '--concurrency', '1', stdout=out)
+        
+        self.assertEqual(LeadJob.objects.filter(status='done').count(), 5)
+        # Every job found the same email, so they all land on one lead
+        self.assertEqual(Lead.objects.count(), 1)
+        self.assertEqual(LeadJob.objects.filter(lead=Lead.objects.get()).count(), 5)
+        self.assertIn('after 5 jobs', out.getvalue())
+    
+    def test_database_error_does_not_stop_worker(self):
+        """A failed iteration is logged and the worker carries on with fresh connections."""
+        # KeyboardInterrupt is not an Exception, so it ends the loop once the worker has come back
+        claim = [DatabaseError("connection lost"), KeyboardInterrupt()]
+        
+        with patch('chat.services.lead_queue.lead_queue.claim', side_effect=claim) as mock_claim, \
+             patch('chat.management.commands.run_lead_worker.close_old_connections') as mock_close, \
+             patch('chat.management.commands.run_lead_worker.time.sleep'), \
+             self.assertLogs('chat.management.commands.run_lead_worker', 'ERROR') as logs, \
+             self.assertRaises(KeyboardInterrupt):
+            call_command('run_lead_worker', '--concurrency', '1', stdout=StringIO())
+        
+        self.assertEqual(mock_claim.call_count, 2)
+        self.assertEqual(mock_close.call_count, 2)
+        self.assertIn('connection lost', logs.output[0])
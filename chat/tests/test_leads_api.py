@@ -0,0 +1,66 @@
+from datetime import timedelta
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from chat.models import Session, Lead
+
+
+class LeadsApiTestCase(APITestCase):
+    """Test cases for the filtered, cursor-paginated leads list."""
+    
+    def setUp(self):
+        self.session = Session.objects.create()
+        now = timezone.now()
+        for i in range(6):
+            lead = Lead.objects.create(
+                name=f"Lead {i}",
+                email=f"lead{i}@example.com" if i % 2 == 0 else None,
+                interest_score=i / 10,
+                source_session=self.session
+            )
+            Lead.objects.filter(id=lead.id).update(created_at=now - timedelta(days=6 - i))
+    
+    def names(self, response):
+        return [lead['name'] for lead in response.json()['results']]
+    
+    def test_cursor_pages_newest_first(self):
+        """Pages follow the next link until the list is exhausted."""
+        response = self.client.get('/api/leads/', {'limit': 4})
+        self.assertEqual(self.names(response), ['Lead 5', 'Lead 4', 'Lead 3', 'Lead 2'])
+        
+        next_page = self.client.get(response.json()['next'])
+        self.assertEqual(self.names(next_page), ['Lead 1', 'Lead 0'])
+        self.assertIsNone(next_page.json()['next'])
+    
+    def test_filters(self):
+        """Score range, created_at range and has_email narrow the list."""
+        self.assertEqual(
+            self.names(self.client.get('/api/leads/', {'min_score': '0.2', 'max_score': '0.4'})),
+            ['Lead 4', 'Lead 3', 'Lead 2']
+        )
+        self.assertEqual(self.names(self.client.get('/api/leads/', {'has_email': 'true'})), ['Lead 4', 'Lead 2', 'Lead 0'])
+        self.assertEqual(self.names(self.client.get('/api/leads/', {'has_email': 'false'})), ['Lead 5', 'Lead 3', 'Lead 1'])
+        
+        since = (timezone.now() - timedelta(days=2, hours=12)).isoformat()
+        self.assertEqual(self.names(self.client.get('/api/leads/', {'created_after': since})), ['Lead 5', 'Lead 4'])
+        until = timezone.localdate(timezone.now() - timedelta(days=5)).isoformat()
+        self.assertEqual(self.names(self.client.get('/api/leads/', {'created_before': until})), ['Lead 1', 'Lead 0'])
+    
+    def test_invalid_filter(self):
+        """Unparseable filters are a 400, not an empty list."""
+        response = self.client.get('/api/leads/', {'min_score': 'high'})
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('min_score', response.json())
+    
+    def test_constant_queries(self):
+        """A page is one query however many leads or sessions it spans."""
+        for _ in range(10):
+            Lead.objects.create(email=None, interest_score=0.5, source_session=Session.objects.create())
+        
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/leads/', {'limit': 50})
+        
+        self.assertEqual(len(response.json()['results']), 16)
+        self.assertIn('source_session', response.json()['results'][0])
@@ -0,0 +1,141 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import time
+from io import StringIO
+from unittest.mock import patch
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+
+from chat.services.llm_cassette import RecordingClient, ReplayClient, load_cassette
+from chat.services.llm_client import LLMClient
+from chat.services.llm_stub import StubOpenAI
+from chat.services.metrics import metrics
+
+
+PROMPT = "Do you build OCR pipelines for invoices?"
+
+
+class LLMCassetteTestCase(TestCase):
+    """Test cases for recording and replaying LLM calls."""
+    
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.workdir)
+        self.path = os.path.join(self.workdir, 'llm.jsonl.gz')
+        metrics.reset()
+        # Replies are cached per prompt and session; a cached one never reaches the client
+        cache.clear()
+    
+    def _client(self, inner):
+        llm = LLMClient()
+        llm.client, llm._initialized = inner, True
+        return llm
+    
+    def _record(self, latency=0.0, prompts=(PROMPT,)):
+        recorder = RecordingClient(StubOpenAI(latency), self.path)
+        llm = self._client(recorder)
+        replies = [llm.generate_reply(prompt, f'session-{i}') for i, prompt in enumerate(prompts)]
+        recorder.close()
+        return replies
+    
+    def test_record_writes_content_usage_and_latency(self):
+        reply, = self._record()
+        
+        with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+            record = json.loads(f.readline())
+        self.assertEqual(record['content'], reply)
+        self.assertEqual(record['request']['messages'][-1]['content'], PROMPT)
+        self.assertGreater(record['usage']['prompt_tokens'], 0)
+        self.assertIn('latency', record)
+    
+    def test_replay_returns_recorded_reply(self):
+        reply, = self._record()
+        
+        llm = self._client(ReplayClient(self.path))
+        
+        self.assertEqual(llm.generate_reply(PROMPT, 'another-session'), reply)
+        self.assertEqual(metrics.snapshot()['counters']['llm.cassette{result=hit}'], 1)
+    
+    def test_unrecorded_request_gets_fallback(self):
+        self._record()
+        
+        reply = self._client(ReplayClient(self.path)).generate_reply("Could you explain vector search over our docs?", 's')
+        
+        self.assertIn('technical difficulties', reply)
+        self.assertEqual(metrics.snapshot()['counters']['llm.cassette{result=miss}'], 1)
+    
+    def test_repeated_recordings_replay_in_order(self):
+        self._record()
+        with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+            first = json.loads(f.readline())
+        with gzip.open(self.path, 'at', encoding='utf-8') as f:
+            f.write(json.dumps(dict(first, content='second answer')) + '\n')
+        
+        replay = ReplayClient(self.path)
+        messages = first['request']['messages']
+        contents = [replay.chat.completions.create(model='m', messages=messages).choices[0].message.content for _ in range(3)]
+        
+        self.assertEqual(contents, [first['content'], 'second answer', 'second answer'])
+    
+    def test_replay_latency_scale(self):
+        self._record(latency=0.05)
+        messages = next(iter(load_cassette(self.path).values()))[0]['request']['messages']
+        
+        started = time.monotonic()
+        ReplayClient(self.path, latency_scale=1.0).chat.completions.create(model='m', messages=messages)
+        
+        self.assertGreaterEqual(time.monotonic() - started, 0.045)
+    
+    def test_truncated_cassette_keeps_complete_lines(self):
+        self._record(prompts=[f"{PROMPT} ref {n}" for n in range(20)])
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        with open(self.path, 'wb') as f:
+            f.write(data[:-12])
+        
+        records = load_cassette(self.path)
+        
+        self.assertGreater(len(records), 0)
+        self.assertLessEqual(len(records), 20)
+    
+    def test_per_process_files_replay_together(self):
+        pattern = os.path.join(self.workdir, 'llm-{pid}.jsonl.gz')
+        recorder = RecordingClient(StubOpenAI(), pattern)
+        reply = self._client(recorder).generate_reply(PROMPT, 's')
+        recorder.close()
+        
+        self.assertEqual(recorder.path, os.path.join(self.workdir, f'llm-{os.getpid()}.jsonl.gz'))
+        self.assertEqual(self._client(ReplayClient(pattern)).generate_reply(PROMPT, 't'), reply)
+    
+    def test_replay_mode_setting(self):
+        self._record()
+        
+        with override_settings(LLM_CASSETTE_MODE='replay', LLM_CASSETTE=self.path):
+            llm = LLMClient()
+        
+        self.assertTrue(llm._initialized)
+        self.assertIsInstance(llm.client, ReplayClient)
+    
+    def test_bench_chat_record_then_replay(self):
+        stubbed = self._client(StubOpenAI())
+        args = ['bench_chat', '--conversations', '3', '--turns', '3', '--mix', 'llm=1,lead=1', '--seed', '7']
+        with patch('chat.management.commands.bench_chat.get_llm_client', return_value=stubbed):
+            call_command(*args, '--record', self.path, stdout=StringIO())
+            self.assertIs(stubbed.client.__class__, StubOpenAI)
+            
+            out = StringIO()
+            call_command(*args, '--replay', self.path, '--replay-latency-scale', '0', stdout=out)
+        
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['llm'], 'replay')
+        self.assertEqual(report['error_rate'], 0.0)
+        self.assertNotIn('llm.cassette{result=miss}', metrics.snapshot()['counters'])
+    
+    def test_bench_chat_record_needs_openai(self):
+        with self.assertRaises(CommandError):
+            call_command('bench_chat', '--record', self.path, stdout=StringIO())
@@ -0,0 +1,101 @@
+from unittest.mock import patch, MagicMock
+from django.test import TestCase, override_settings
+
+from chat.services.llm_client import LLMClient
+from chat.services.metrics import metrics
+from chat.services.model_router import ModelRouter
+
+
+@override_settings(LLM_PRIMARY_MODEL='primary-model', LLM_FAST_MODEL='fast-model', LLM_LATENCY_THRESHOLD=2.0)
+class ModelRouterTestCase(TestCase):
+    """Test cases for model routing."""
+    
+    def setUp(self):
+        self.router = ModelRouter()
+        metrics.reset()
+    
+    def test_short_reply_uses_small_token_budget(self):
+        """Simple messages get the short reply profile."""
+        route = self.router.route('reply', 'What do you charge?')
+        
+        self.assertEqual(route['profile'], 'reply_short')
+        self.assertEqual(route['model'], 'primary-model')
+        self.assertEqual(route['max_tokens'], 150)
+        self.assertFalse(route['fallback'])
+    
+    def test_complex_reply_uses_long_profile(self):
+        """Long, technical messages get a larger token budget."""
+        message = (
+            "Can you explain how you would integrate a custom chatbot with our CRM database "
+            "and our internal API? We also need a workflow for escalating tickets and I want "
+            "to understand the architecture and how it would scale with our team."
+        )
+        route = self.router.route('reply', message)
+        
+        self.assertEqual(route['profile'], 'reply_long')
+        self.assertEqual(route['max_tokens'], 300)
+    
+    def test_classify_profile(self):
+        """Classification uses a low temperature profile."""
+        route = self.router.route('classify', 'I am John, john@example.com')
+        
+        self.assertEqual(route['profile'], 'classify')
+        self.assertEqual(route['temperature'], 0.1)
+    
+    def test_falls_back_when_primary_is_slow(self):
+        """Recent latency above the threshold routes to the fast model."""
+        for _ in range(3):
+            self.router.record_latency('primary-model', 4.5)
+        
+        route = self.router.route('reply', 'hello there')
+        
+        self.assertEqual(route['model'], 'fast-model')
+        self.assertTrue(route['fallback'])
+    
+    def test_no_fallback_with_too_few_samples(self):
+        """A single slow call does not trigger fallback."""
+        self.router.record_latency('primary-model', 10.0)
+        
+        route = self.router.route('reply', 'hello there')
+        
+        self.assertEqual(route['model'], 'primary-model')
+    
+    def test_routing_decisions_recorded_in_metrics(self):
+        """Each routing decision increments a labelled counter."""
+        self.router.route('classify', 'test')
+        
+        counters = metrics.snapshot()['counters']
+        self.assertIn(
+            'llm.route{call_type=classify,fallback=False,model=primary-model,profile=classify}',
+            counters
+        )
+    
+    @override_settings(METRICS_TOKEN='metrics-secret')
+    def test_metrics_endpoint_needs_token(self):
+        """/api/metrics/ only answers with the METRICS_TOKEN bearer token."""
+        self.router.route('classify', 'test')
+        
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 403)
+        self.assertEqual(self.client.get('/api/metrics/', HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        response = self.client.get('/api/metrics/', HTTP_AUTHORIZATION='Bearer metrics-secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('counters', response.json())
+    
+    def test_llm_client_passes_routed_model(self):
+        """LLMClient sends the routed model and max_tokens to the API."""
+        client = LLMClient()
+        client._initialized = True
+        client.client = MagicMock()
+        client.client.chat.completions.create.return_value.choices = [
+            MagicMock(message=MagicMock(content='Sure, happy to help.'))
+        ]
+        client.router = self.router
+        
+        with patch('chat.services.llm_client.cache') as mock_cache:
+            mock_cache.get.return_value = None
+            reply = client.generate_reply('Tell me about refund terms', 'session-1')
+        
+        self.assertEqual(reply, 'Sure, happy to help.')
+        kwargs = client.client.chat.completions.create.call_args.kwargs
+        self.assertEqual(kwargs['model'], 'primary-model')
+        self.assertEqual(kwargs['max_tokens'], 150)
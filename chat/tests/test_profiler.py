@@ -0,0 +1,103 @@
+import os
+import tempfile
+import threading
+import tracemalloc
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+
+from chat.services import profiler
+from chat.services import retriever as retriever_module
+from chat.services.retriever import FAISSRetriever
+
+
+def busy_profiler_target(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+class ProfilerEndpointTestCase(TestCase):
+    """Test cases for the staff-only profiling endpoints."""
+    
+    def setUp(self):
+        self.staff = User.objects.create_user('ops', password='x', is_staff=True)
+    
+    def test_staff_only(self):
+        User.objects.create_user('visitor', password='x')
+        self.client.login(username='visitor', password='x')
+        
+        for url in ('/api/debug/profile/?seconds=0.01', '/api/debug/memory/'):
+            self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.logout()
+        self.assertEqual(self.client.get('/api/debug/memory/').status_code, 403)
+    
+    def test_cpu_profile_is_collapsed_stacks(self):
+        self.client.force_login(self.staff)
+        stop = threading.Event()
+        worker = threading.Thread(target=busy_profiler_target, args=(stop,), name='busy')
+        worker.start()
+        try:
+            response = self.client.get('/api/debug/profile/?seconds=0.2&interval=0.005')
+        finally:
+            stop.set()
+            worker.join()
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(int(response['X-Profile-Samples']), 0)
+        lines = response.content.decode().splitlines()
+        busy = [line for line in lines if line.startswith('busy;')]
+        self.assertTrue(busy)
+        stack, count = busy[0].rsplit(' ', 1)
+        self.assertIn('busy_profiler_target (tests/test_profiler.py:', stack)
+        self.assertGreater(int(count), 0)
+    
+    def test_cpu_profile_bounds(self):
+        self.client.force_login(self.staff)
+        
+        self.assertEqual(self.client.get('/api/debug/profile/?seconds=30').status_code, 400)
+        self.assertEqual(self.client.get('/api/debug/profile/?seconds=abc').status_code, 400)
+    
+    def test_memory_holders(self):
+        self.client.force_login(self.staff)
+        with tempfile.TemporaryDirectory() as workdir:
+            retriever = FAISSRetriever(index_path=os.path.join(workdir, 'index'))
+            retriever.add_documents([{'title': f'FAQ {i}', 'content': 'answer ' * 20} for i in range(10)])
+            saved, retriever_module._retriever = retriever_module._retriever, retriever
+            try:
+                response = self.client.get('/api/debug/memory/')
+            finally:
+                retriever_module._retriever = saved
+        
+        self.assertEqual(response.status_code, 200)
+        holders = response.json()['holders']
+        self.assertEqual(holders['faiss_index'], {'bytes': 10 * 384 * 4, 'vectors': 10})
+        self.assertEqual(holders['documents']['count'], 10)
+        self.assertIn('page_cache', holders)
+    
+    def test_memory_allocation_sites(self):
+        self.client.force_login(self.staff)
+        was_tracing = tracemalloc.is_tracing()
+        if not was_tracing:
+            self.addCleanup(tracemalloc.stop)
+        
+        self.client.get('/api/debug/memory/?start=1')
+        response = self.client.get('/api/debug/memory/?limit=5')
+        
+        report = response.json()['tracemalloc']
+        self.assertTrue(report['tracing'])
+        self.assertLessEqual(len(report['allocations']), 5)
+        self.assertTrue(all(set(site) == {'site', 'bytes', 'count'} for site in report['allocations']))
+
+
+class ProfileDumpTestCase(TestCase):
+    """Test cases for the profile files written on SIGUSR2."""
+    
+    def test_dump_writes_cpu_and_memory_files(self):
+        with tempfile.TemporaryDirectory() as workdir, override_settings(PROFILE_DIR=workdir):
+            with self.assertLogs('chat.services.profiler', 'INFO') as logs:
+                profiler._dump_profiles(0.05)
+            
+            names = sorted(os.listdir(workdir))
+            self.assertEqual(len(names), 2)
+            self.assertTrue(names[0].endswith('-cpu.folded'))
+            self.assertTrue(names[1].endswith('-memory.json'))
+            self.assertIn(names[0], logs.output[0])
@@ -0,0 +1,106 @@
+import glob
+import gzip
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from chat.models import Session, Message, Lead, LeadJob
+
+
+class PruneSessionsCommandTestCase(TestCase):
+    """Test cases for the prune_sessions management command."""
+    
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.now = timezone.now()
+    
+    def tearDown(self):
+        self.tmpdir.cleanup()
+    
+    def make_session(self, days_ago, messages=3):
+        session = Session.objects.create()
+        when = self.now - timedelta(days=days_ago)
+        Message.objects.bulk_create([
+            Message(session=session, text=f"message {i}", sender='user') for i in range(messages)
+        ])
+        Message.objects.filter(session=session).update(timestamp=when)
+        Session.objects.filter(id=session.id).update(updated_at=when, created_at=when)
+        return session
+    
+    def prune(self, *args):
+        out = StringIO()
+        call_command(
+            'prune_sessions', '--archive-dir', self.tmpdir.name, '--pause', '0',
+            '--inactive-days', '90', '--short-inactive-days', '7', '--short-max-messages', '2',
+            *args, stdout=out
+        )
+        return out.getvalue()
+    
+    def archived(self):
+        records = []
+        for path in glob.glob(os.path.join(self.tmpdir.name, '*.jsonl.gz')):
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                records.extend(json.loads(line) for line in f)
+        return records
+    
+    def test_archives_then_deletes_old_sessions(self):
+        """Inactive sessions go to the archive with their messages and leave the database."""
+        old = self.make_session(days_ago=120)
+        recent = self.make_session(days_ago=10)
+        
+        output = self.prune('--batch-size', '1')
+        
+        self.assertFalse(Session.objects.filter(id=old.id).exists())
+        self.assertFalse(Message.objects.filter(session_id=old.id).exists())
+        self.assertTrue(Session.objects.filter(id=recent.id).exists())
+        records = self.archived()
+        self.assertEqual([record['id'] for record in records], [str(old.id)])
+        self.assertEqual([m['text'] for m in records[0]['messages']], ['message 0', 'message 1', 'message 2'])
+        self.assertIn('Pruned 1 sessions and 3 messages', output)
+    
+    def test_drive_by_sessions_pruned_sooner(self):
+        """Sessions with only a message or two expire after the short retention."""
+        drive_by = self.make_session(days_ago=10, messages=1)
+        empty = self.make_session(days_ago=10, messages=0)
+        conversation = self.make_session(days_ago=10, messages=3)
+        
+        self.prune()
+        
+        self.assertFalse(Session.objects.filter(id__in=[drive_by.id, empty.id]).exists())
+        self.assertTrue(Session.objects.filter(id=conversation.id).exists())
+    
+    def test_keeps_sessions_with_leads_or_open_jobs(self):
+        """Sessions a lead or an unfinished qualification job points at are never pruned."""
+        with_lead = self.make_session(days_ago=200)
+        Lead.objects.create(email='kept@example.com', source_session=with_lead)
+        with_job = self.make_session(days_ago=200)
+        LeadJob.objects.create(session=with_job, message_text='hire me')
+        
+        self.prune()
+        
+        self.assertEqual(Session.objects.filter(id__in=[with_lead.id, with_job.id]).count(), 2)
+        self.assertEqual(Message.objects.filter(session_id=with_lead.id).count(), 3)
+    
+    def test_dry_run(self):
+        """Dry runs count candidates without archiving or deleting."""
+        self.make_session(days_ago=120)
+        
+        output = self.prune('--dry-run')
+        
+        self.assertIn('Would prune 1 sessions', output)
+        self.assertEqual(Session.objects.count(), 1)
+        self.assertEqual(self.archived(), [])
+    
+    def test_messages_deleted_in_chunks(self):
+        """Large sessions are emptied with several bounded DELETE statements."""
+        self.make_session(days_ago=120, messages=7)
+        
+        self.prune('--delete-chunk', '3', '--no-archive')
+        
+        self.assertEqual(Message.objects.count(), 0)
+        self.assertEqual(Session.objects.count(), 0)
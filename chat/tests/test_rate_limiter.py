@@ -0,0 +1,148 @@
+import json
+from io import StringIO
+from unittest.mock import patch
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from chat.services.rate_limiter import TokenBucketLimiter
+
+
+LIMITS = {
+    'llm': {
+        'ip': {'capacity': 2, 'refill_rate': 0.01},
+        'session': {'capacity': 100, 'refill_rate': 1.0},
+    },
+    'default': {
+        'ip': {'capacity': 3, 'refill_rate': 0.01},
+        'session': {'capacity': 100, 'refill_rate': 1.0},
+    },
+}
+
+
+class TokenBucketLimiterTestCase(TestCase):
+    """Test cases for the token-bucket limiter."""
+    
+    def setUp(self):
+        caches[settings.RATE_LIMIT_CACHE].clear()
+        self.limiter = TokenBucketLimiter()
+    
+    def test_allows_burst_then_rejects(self):
+        """Requests beyond the bucket capacity are rejected with a retry hint."""
+        results = [self.limiter.consume('bucket', capacity=3, refill_rate=1.0) for _ in range(4)]
+        
+        self.assertEqual([r['allowed'] for r in results], [True, True, True, False])
+        self.assertEqual(results[2]['remaining'], 0)
+        self.assertGreater(results[3]['retry_after'], 0)
+        self.assertLessEqual(results[3]['retry_after'], 1.0)
+    
+    def test_refills_over_time(self):
+        """Tokens come back at the refill rate."""
+        with patch('chat.services.rate_limiter.time.time', return_value=1000.0):
+            self.limiter.consume('bucket', capacity=1, refill_rate=0.5)
+            self.assertFalse(self.limiter.consume('bucket', capacity=1, refill_rate=0.5)['allowed'])
+        
+        with patch('chat.services.rate_limiter.time.time', return_value=1002.5):
+            self.assertTrue(self.limiter.consume('bucket', capacity=1, refill_rate=0.5)['allowed'])
+    
+    def test_buckets_are_independent(self):
+        """Different keys do not share tokens."""
+        self.limiter.consume('a', capacity=1, refill_rate=0.1)
+        
+        self.assertTrue(self.limiter.consume('b', capacity=1, refill_rate=0.1)['allowed'])
+    
+    def test_bucket_cache_has_atomic_add(self):
+        """Buckets never live in the file backend, whose add() is not atomic across workers."""
+        self.assertNotIsInstance(self.limiter.cache, FileBasedCache)
+    
+    def test_fails_closed_when_lock_is_held(self):
+        """A held lock rejects the request instead of skipping the limit; it is free again once released."""
+        caches[settings.RATE_LIMIT_CACHE].add('bucket:lock', 1, 5)
+        
+        result = self.limiter.consume('bucket', capacity=1, refill_rate=0.1)
+        
+        self.assertFalse(result['allowed'])
+        self.assertGreater(result['retry_after'], 0)
+        caches[settings.RATE_LIMIT_CACHE].delete('bucket:lock')
+        self.assertTrue(self.limiter.consume('bucket', capacity=1, refill_rate=0.1)['allowed'])
+
+
+@override_settings(RATE_LIMITS=LIMITS)
+class RateLimitEndpointTestCase(APITestCase):
+    """Test cases for throttled endpoints."""
+    
+    def setUp(self):
+        caches[settings.RATE_LIMIT_CACHE].clear()
+    
+    def tearDown(self):
+        caches[settings.RATE_LIMIT_CACHE].clear()
+    
+    def test_cheap_endpoint_headers_and_429(self):
+        """Cheap endpoints carry rate-limit headers and return 429 with Retry-After."""
+        responses = [self.client.get('/api/health/') for _ in range(4)]
+        
+        self.assertEqual(responses[0].status_code, status.HTTP_200_OK)
+        self.assertEqual(responses[0]['X-RateLimit-Limit'], '3')
+        self.assertEqual(responses[0]['X-RateLimit-Remaining'], '2')
+        self.assertEqual(responses[3].status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', responses[3])
+    
+    @patch('chat.services.llm_client.llm_client.generate_reply')
+    def test_llm_endpoint_has_tighter_limit(self, mock_reply):
+        """The chat endpoint uses the LLM scope, separate from cheap endpoints."""
+        mock_reply.return_value = "Reply"
+        
+        codes = [
+            self.client.post('/api/chat/', data={'message': 'Tell me more'}, format='json').status_code
+            for _ in range(3)
+        ]
+        
+        self.assertEqual(codes, [200, 200, 429])
+        self.assertEqual(self.client.get('/api/health/').status_code, status.HTTP_200_OK)
+    
+    def test_forwarded_for_does_not_change_ip(self):
+        """Without trusted proxies the client IP is REMOTE_ADDR, so a spoofed X-Forwarded-For gets no fresh bucket."""
+        codes = [
+            self.client.get('/api/health/', HTTP_X_FORWARDED_FOR=f"10.0.0.{n}").status_code
+            for n in range(4)
+        ]
+        
+        self.assertEqual(codes[-1], status.HTTP_429_TOO_MANY_REQUESTS)
+    
+    def test_forwarded_clients_get_own_buckets_behind_proxy(self):
+        """With NUM_PROXIES=1 the client IP comes from X-Forwarded-For, so visitors don't share the proxy's bucket."""
+        rest_framework = dict(settings.REST_FRAMEWORK, NUM_PROXIES=1)
+        with self.settings(REST_FRAMEWORK=rest_framework):
+            first = [self.client.get('/api/health/', HTTP_X_FORWARDED_FOR='203.0.113.1').status_code for _ in range(4)]
+            second = self.client.get('/api/health/', HTTP_X_FORWARDED_FOR='203.0.113.2').status_code
+        
+        self.assertEqual(first, [200, 200, 200, 429])
+        self.assertEqual(second, status.HTTP_200_OK)
+    
+    @override_settings(RATE_LIMIT_ENABLED=False)
+    def test_disabled(self):
+        """Limits can be switched off."""
+        codes = {self.client.get('/api/health/').status_code for _ in range(5)}
+        
+        self.assertEqual(codes, {200})
+
+
+class BenchRateLimiterCommandTestCase(TestCase):
+    """Test cases for the bench_rate_limiter management command."""
+    
+    def test_reports_overhead_and_cleans_up(self):
+        """The report covers every call and leaves no benchmark buckets behind."""
+        cache = caches[settings.RATE_LIMIT_CACHE]
+        cache.clear()
+        out = StringIO()
+        call_command('bench_rate_limiter', '--iterations', '100', '--keys', '5', stdout=out)
+        
+        report = json.loads(out.getvalue())
+        self.assertEqual((report['calls'], report['buckets'], report['cache']), (100, 5, settings.RATE_LIMIT_CACHE))
+        self.assertLessEqual(report['p50_ms'], report['p99_ms'])
+        self.assertIn('within_budget', report)
+        self.assertEqual(len(getattr(cache, '_cache', {})), 0)
@@ -0,0 +1,206 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from chat.management.commands.requalify_leads import Command
+from chat.models import Session, Message, Lead
+from chat.services.llm_client import LLMClient
+
+
+def fake_classify_batch(messages, **kwargs):
+    """Score messages mentioning an email as leads; "urgent" ones get a high interest score."""
+    results = []
+    for text in messages:
+        email = next((word for word in text.split() if '@' in word), None)
+        results.append({
+            'is_lead': email is not None,
+            'name': None,
+            'email': email,
+            'interest_score': 0.9 if 'urgent' in text else 0.5,
+        })
+    return results
+
+
+class RequalifyLeadsCommandTestCase(TestCase):
+    """Test cases for the requalify_leads management command."""
+    
+    def setUp(self):
+        self.session = Session.objects.create()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.checkpoint = os.path.join(self.tmpdir.name, 'checkpoint.json')
+        
+        Message.objects.create(session=self.session, text="hello there", sender='user')
+        Message.objects.create(session=self.session, text="reach me at ann@example.com urgent", sender='user')
+        Message.objects.create(session=self.session, text="sure thing", sender='assistant')
+        Message.objects.create(session=self.session, text="or bob@example.com", sender='user')
+        self.existing = Lead.objects.create(
+            email='ann@example.com', interest_score=0.4, source_session=self.session,
+            identity_key='email:ann@example.com'
+        )
+    
+    def tearDown(self):
+        self.tmpdir.cleanup()
+    
+    def run_command(self, *args, classify=fake_classify_batch):
+        out = StringIO()
+        with patch('chat.services.llm_client.llm_client.classify_batch', side_effect=classify) as mock_batch:
+            call_command('requalify_leads', '--checkpoint', self.checkpoint, '--batch-size', '2', *args, stdout=out)
+        return out.getvalue(), mock_batch
+    
+    def report(self, output):
+        return json.loads(output[output.index('{'):output.rindex('}') + 1])
+    
+    def test_rescores_and_creates_leads(self):
+        """Existing leads are re-scored and newly qualifying messages become leads."""
+        output, mock_batch = self.run_command()
+        
+        # Three user messages packed two per request
+        self.assertEqual(mock_batch.call_count, 2)
+        updated_at = self.existing.updated_at
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.interest_score, 0.9)
+        self.assertGreater(self.existing.updated_at, updated_at)
+        self.assertTrue(Lead.objects.filter(email='bob@example.com', interest_score=0.5).exists())
+        self.assertIn('"leads_created": 1', output)
+        self.assertIn('"leads_rescored": 1', output)
+    
+    def test_scores_are_replaced_with_fresh_max(self):
+        """A touched lead takes the best score its messages got in this run, even if lower."""
+        Lead.objects.filter(id=self.existing.id).update(interest_score=0.95)
+        Message.objects.create(session=self.session, text="ann@example.com again", sender='user')
+        
+        output, _ = self.run_command()
+        
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.interest_score, 0.9)
+        self.assertEqual(Session.objects.get(id=self.session.id).max_interest_score, 0.9)
+        self.assertIn('"leads_rescored": 1', output)
+    
+    def test_unkeyed_duplicates_are_rescored(self):
+        """Leads dedupe_leads has not keyed yet are matched, duplicates included, instead of recreated."""
+        duplicates = [
+            Lead.objects.create(email=email, interest_score=0.2, source_session=self.session)
+            for email in ('Bob@Example.com', ' bob@example.com')
+        ]
+        
+        self.run_command()
+        
+        self.assertEqual(Lead.objects.filter(email__icontains='bob@').count(), 2)
+        for lead in duplicates:
+            lead.refresh_from_db()
+            self.assertEqual((lead.interest_score, lead.identity_key), (0.5, None))
+    
+    def test_concurrent_live_upsert_is_not_an_error(self):
+        """A lead created by a live turn between the read and the write does not fail the batch."""
+        original = Command._existing
+        
+        def existing_then_live_upsert(command, candidates):
+            found = original(command, candidates)
+            if 'email:bob@example.com' in candidates:
+                Lead.objects.create(
+                    email='bob@example.com', interest_score=0.7, source_session=self.session,
+                    identity_key='email:bob@example.com'
+                )
+            return found
+        
+        with patch.object(Command, '_existing', existing_then_live_upsert):
+            output = self.report(self.run_command()[0])
+        
+        self.assertEqual(Lead.objects.get(identity_key='email:bob@example.com').interest_score, 0.7)
+        self.assertEqual(output['score_distribution']['after']['0.7-0.8'], 1)
+    
+    def test_classification_failure_keeps_checkpoint(self):
+        """A failed batch stops the run without advancing the checkpoint past it."""
+        first_batch_ids = list(Message.objects.filter(sender='user').order_by('id').values_list('id', flat=True))[:2]
+        
+        def fail_second(messages, **kwargs):
+            if messages == ["or bob@example.com"]:
+                raise RuntimeError("API timeout")
+            return fake_classify_batch(messages)
+        
+        with self.assertRaisesMessage(CommandError, 'API timeout'):
+            self.run_command('--concurrency', '1', classify=fail_second)
+        
+        with open(self.checkpoint) as f:
+            self.assertEqual(json.load(f)['last_message_id'], first_batch_ids[-1])
+        self.assertFalse(Lead.objects.filter(email='bob@example.com').exists())
+        _, mock_batch = self.run_command()
+        self.assertEqual(mock_batch.call_args.args[0], ["or bob@example.com"])
+        self.assertTrue(Lead.objects.filter(email='bob@example.com').exists())
+    
+    def test_dry_run_counts_match_real_run(self):
+        """A lead seen in several batches is created once and rescored after, dry run or not."""
+        Message.objects.create(session=self.session, text="thanks", sender='user')
+        Message.objects.create(session=self.session, text="bob@example.com urgent", sender='user')
+        
+        dry = self.report(self.run_command('--dry-run')[0])
+        real = self.report(self.run_command()[0])
+        
+        for field in ('leads_created', 'leads_rescored', 'score_distribution'):
+            self.assertEqual(dry[field], real[field], field)
+        self.assertEqual((real['leads_created'], real['leads_rescored']), (1, 2))
+    
+    def test_dry_run_writes_nothing(self):
+        """Dry runs report the distribution shift but leave the data and checkpoint alone."""
+        output, _ = self.run_command('--dry-run')
+        
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.interest_score, 0.4)
+        self.assertEqual(Lead.objects.count(), 1)
+        self.assertFalse(os.path.exists(self.checkpoint))
+        
+        report = self.report(output)
+        self.assertEqual(report['score_distribution']['before']['0.4-0.5'], 1)
+        self.assertEqual(report['score_distribution']['after']['0.9-1.0'], 1)
+        self.assertEqual(report['score_distribution']['after']['0.5-0.6'], 1)
+    
+    def test_resumes_from_checkpoint(self):
+        """A second run only processes messages added since the checkpoint."""
+        self.run_command()
+        with open(self.checkpoint) as f:
+            last_id = json.load(f)['last_message_id']
+        self.assertEqual(last_id, Message.objects.filter(sender='user').latest('id').id)
+        
+        Message.objects.create(session=self.session, text="carol@example.com here", sender='user')
+        _, mock_batch = self.run_command()
+        
+        self.assertEqual(mock_batch.call_count, 1)
+        self.assertEqual(mock_batch.call_args.args[0], ["carol@example.com here"])
+
+
+class ClassifyBatchTestCase(TestCase):
+    """Test cases for packed batch classification."""
+    
+    def test_results_follow_indexes(self):
+        """Results are matched to messages by index and missing entries get safe defaults."""
+        client = LLMClient()
+        client._initialized = True
+        response = json.dumps([
+            {'index': 2, 'is_lead': True, 'name': 'Cy', 'email': None, 'interest_score': '0.7'},
+            {'index': 0, 'is_lead': False, 'name': None, 'email': None, 'interest_score': 0.1},
+        ])
+        
+        with patch.object(client, '_make_api_call', return_value=response) as mock_call:
+            results = client.classify_batch(['a', 'b', 'c'])
+        
+        self.assertEqual(mock_call.call_count, 1)
+        self.assertEqual(results[0]['interest_score'], 0.1)
+        self.assertFalse(results[1]['is_lead'])
+        self.assertEqual(results[2]['name'], 'Cy')
+        self.assertEqual(results[2]['interest_score'], 0.7)
+    
+    def test_invalid_json_returns_defaults(self):
+        """A garbled response never raises."""
+        client = LLMClient()
+        client._initialized = True
+        
+        with patch.object(client, '_make_api_call', return_value='not json'):
+            results = client.classify_batch(['a', 'b'])
+        
+        self.assertEqual(len(results), 2)
+        self.assertFalse(any(r['is_lead'] for r in results))
@@ -0,0 +1,146 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from chat.management.commands.bench_retriever import find_regressions
+from chat.services.retriever import FAISSRetriever
+
+
+EMBED_SCRIPT = (
+    "from chat.services.retriever import FAISSRetriever; "
+    "r = FAISSRetriever.__new__(FAISSRetriever); r.dimension = 384; "
+    "print(r._simple_embedding('pricing plans for startups').nonzero()[0].tolist())"
+)
+
+
+class FAISSRetrieverTestCase(TestCase):
+    """Test cases for FAISSRetriever."""
+    
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.index_path = os.path.join(self.workdir.name, 'index')
+        self.documents = [
+            {'title': 'Pricing', 'content': 'plans start at 99 dollars per month'},
+            {'title': 'Support', 'content': 'email support answers within one business day'},
+            {'title': 'Security', 'content': 'data is encrypted at rest and in transit'},
+        ]
+    
+    def tearDown(self):
+        self.workdir.cleanup()
+    
+    def test_search_ranks_best_match_first(self):
+        retriever = FAISSRetriever(index_path=self.index_path)
+        retriever.add_documents(self.documents)
+        
+        results = retriever.search('how fast does email support answer', top_k=2)
+        
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[0]['title'], 'Support')
+        self.assertGreaterEqual(results[0]['score'], results[1]['score'])
+    
+    def test_top_k_larger_than_index(self):
+        """FAISS pads missing hits with -1, which must not wrap around to the last document."""
+        retriever = FAISSRetriever(index_path=self.index_path)
+        retriever.add_documents(self.documents)
+        
+        results = retriever.search('pricing plans', top_k=10)
+        
+        self.assertEqual(len(results), 3)
+    
+    def test_index_survives_reload(self):
+        FAISSRetriever(index_path=self.index_path).add_documents(self.documents)
+        
+        reloaded = FAISSRetriever(index_path=self.index_path)
+        
+        self.assertEqual(reloaded.index.ntotal, 3)
+        self.assertEqual(reloaded.search('encrypted data at rest', top_k=1)[0]['title'], 'Security')
+    
+    def test_embedding_is_stable_across_processes(self):
+        """A saved index is only useful if other processes embed queries the same way."""
+        outputs = set()
+        for seed in ('1', '2'):
+            env = dict(os.environ, PYTHONHASHSEED=seed, DJANGO_SETTINGS_MODULE='ai_chatbot_leads.settings')
+            result = subprocess.run(
+                [sys.executable, '-c', EMBED_SCRIPT],
+                cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, timeout=60, check=True,
+            )
+            outputs.add(result.stdout.strip())
+        
+        self.assertEqual(len(outputs), 1)
+    
+    def test_clear_empties_saved_index(self):
+        retriever = FAISSRetriever(index_path=self.index_path)
+        retriever.add_documents(self.documents)
+        
+        retriever.clear()
+        
+        self.assertEqual(FAISSRetriever(index_path=self.index_path).index.ntotal, 0)
+        self.assertEqual(retriever.search('pricing'), [])
+    
+    def test_seed_faqs_clear_replaces_index(self):
+        retriever = FAISSRetriever(index_path=self.index_path)
+        retriever.add_documents(self.documents)
+        
+        with patch('chat.management.commands.seed_faqs.retriever', retriever):
+            call_command('seed_faqs', '--clear', stdout=StringIO())
+        
+        reloaded = FAISSRetriever(index_path=self.index_path)
+        self.assertGreater(reloaded.index.ntotal, 0)
+        self.assertEqual(reloaded.index.ntotal, len(reloaded.documents))
+        self.assertNotIn('Pricing', [doc['title'] for doc in reloaded.documents])
+
+
+class BenchRetrieverCommandTestCase(TestCase):
+    """Test cases for the bench_retriever management command."""
+    
+    def test_report_and_baseline_round_trip(self):
+        with tempfile.TemporaryDirectory() as workdir:
+            baseline_path = os.path.join(workdir, 'baseline.json')
+            out = StringIO()
+            call_command(
+                'bench_retriever', '--sizes', '50', '--top-k', '1,3', '--queries', '5',
+                '--save-baseline', baseline_path, stdout=out, stderr=StringIO()
+            )
+            
+            report = json.loads(out.getvalue())
+            size = report['sizes']['50']
+            self.assertEqual(size['documents'], 50)
+            self.assertEqual(size['index_bytes'], 50 * 384 * 4)
+            self.assertEqual(set(size['search']), {'1', '3'})
+            self.assertIn('p95_ms', size['search']['3'])
+            self.assertGreater(size['embed_docs_per_s'], 0)
+            
+            # Pretend the baseline was far faster, so this run has to be flagged
+            with open(baseline_path, encoding='utf-8') as f:
+                baseline = json.load(f)
+            baseline['sizes']['50']['add_documents_s'] = size['add_documents_s'] / 100
+            with open(baseline_path, 'w', encoding='utf-8') as f:
+                json.dump(baseline, f)
+            
+            with self.assertRaises(CommandError):
+                call_command(
+                    'bench_retriever', '--sizes', '50', '--top-k', '1,3', '--queries', '5',
+                    '--baseline', baseline_path, '--tolerance', '10', '--fail-on-regression',
+                    stdout=StringIO(), stderr=StringIO()
+                )
+    
+    def test_find_regressions_direction(self):
+        baseline = {'1000': {'embed_docs_per_s': 1000.0, 'load_s': 1.0, 'index_bytes': 100}}
+        current = {'1000': {'embed_docs_per_s': 700.0, 'load_s': 1.1, 'index_bytes': 100}}
+        
+        regressions = find_regressions(current, baseline, tolerance=0.2)
+        
+        self.assertEqual([r['metric'] for r in regressions], ['1000.embed_docs_per_s'])
+        self.assertEqual(regressions[0]['change'], -0.3)
+    
+    def test_invalid_sizes(self):
+        with self.assertRaises(CommandError):
+            call_command('bench_retriever', '--sizes', '0', stdout=StringIO(), stderr=StringIO())
@@ -0,0 +1,110 @@
+from datetime import timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework import status
+
+from chat.models import Message, Lead, DailyRollup, RollupWatermark
+from chat.services.conversation import SessionRef, conversation_store
+from chat.services.llm_client import FALLBACK_REPLY, QUICK_RESPONSES
+from chat.services.rollups import rollups
+
+
+class RollupsTestCase(TestCase):
+    """Test cases for the incrementally maintained daily rollups."""
+    
+    def setUp(self):
+        self.sessions = []
+        for i in range(3):
+            ref = conversation_store.resolve_session(None)
+            conversation_store.persist_turn(ref, "hello", QUICK_RESPONSES['hello'])
+            conversation_store.persist_turn(SessionRef(ref.id, 'unverified'), f"question {i}", FALLBACK_REPLY if i else "An answer")
+            self.sessions.append(ref.id)
+        Lead.objects.create(email='a@example.com', interest_score=0.8, source_session_id=self.sessions[0])
+        Lead.objects.create(email='b@example.com', interest_score=0.6, source_session_id=self.sessions[0])
+    
+    def today(self):
+        return rollups.stats(1)['days'][0]
+    
+    def test_refresh_counts_sessions_messages_and_leads(self):
+        """Sessions start on their first message; lead_sessions counts each session's first lead once."""
+        processed = rollups.refresh(lag=0)
+        
+        self.assertEqual(processed, {'message': 12, 'lead': 2})
+        self.assertEqual(self.today(), {
+            'day': timezone.localdate().isoformat(),
+            'sessions': 3,
+            'messages': {'user': 6, 'assistant': 6},
+            'leads': 2,
+            'lead_sessions': 1,
+            'lead_rate': 0.3333,
+        })
+        self.assertEqual(rollups.stats(1)['top_canned_replies'], [
+            {'text': QUICK_RESPONSES['hello'], 'count': 3},
+            {'text': FALLBACK_REPLY, 'count': 2},
+        ])
+    
+    def test_refresh_only_processes_new_rows(self):
+        """Later runs start at the watermark; a returning session is not counted again."""
+        rollups.refresh(lag=0)
+        self.assertEqual(rollups.refresh(lag=0), {'message': 0, 'lead': 0})
+        
+        conversation_store.persist_turn(SessionRef(self.sessions[1], 'unverified'), "back again", "Welcome back")
+        Lead.objects.create(email='c@example.com', interest_score=0.7, source_session_id=self.sessions[1])
+        
+        self.assertEqual(rollups.refresh(lag=0), {'message': 2, 'lead': 1})
+        today = self.today()
+        self.assertEqual((today['sessions'], today['messages']['user'], today['lead_sessions']), (3, 7, 2))
+        self.assertEqual(RollupWatermark.objects.get(source='message').last_id, Message.objects.latest('id').id)
+    
+    def test_recent_rows_wait_for_the_lag(self):
+        """Rows younger than the lag are left for a later run."""
+        self.assertEqual(rollups.refresh(lag=3600), {'message': 0, 'lead': 0})
+        
+        Message.objects.filter(id__in=Message.objects.order_by('id').values('id')[:4]).update(
+            timestamp=timezone.now() - timedelta(hours=2)
+        )
+        self.assertEqual(rollups.refresh(lag=3600)['message'], 4)
+    
+    def test_rebuild_matches_incremental(self):
+        """Small incremental batches add up to the same rollups as a full rebuild."""
+        rollups.refresh(batch_size=5, lag=0)
+        incremental = sorted(DailyRollup.objects.values_list('day', 'metric', 'key', 'value'))
+        
+        call_command('refresh_rollups', '--rebuild', '--lag', '0', stdout=StringIO())
+        
+        self.assertEqual(sorted(DailyRollup.objects.values_list('day', 'metric', 'key', 'value')), incremental)
+
+
+class StatsEndpointTestCase(TestCase):
+    """Test cases for /api/stats/."""
+    
+    def setUp(self):
+        today = timezone.localdate()
+        DailyRollup.objects.bulk_create([
+            DailyRollup(day=today, metric='sessions', value=4),
+            DailyRollup(day=today, metric='lead_sessions', value=1),
+            DailyRollup(day=today - timedelta(days=1), metric='sessions', value=6),
+            DailyRollup(day=today - timedelta(days=1), metric='messages', key='user', value=9),
+            DailyRollup(day=today - timedelta(days=40), metric='sessions', value=100),
+        ])
+    
+    def test_serves_window_from_rollups(self):
+        """The window is filled from rollup rows alone, zero days included."""
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/stats/', {'days': 7})
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(len(data['days']), 7)
+        self.assertEqual(data['days'][-1]['lead_rate'], 0.25)
+        self.assertEqual(data['days'][0]['lead_rate'], None)
+        self.assertEqual(data['totals']['sessions'], 10)
+        self.assertEqual(data['totals']['messages'], {'user': 9, 'assistant': 0})
+    
+    def test_days_parameter(self):
+        """days defaults to STATS_DEFAULT_DAYS, is clamped to STATS_MAX_DAYS and must be an integer."""
+        self.assertEqual(len(self.client.get('/api/stats/').json()['days']), 30)
+        self.assertEqual(self.client.get('/api/stats/', {'days': 9999}).json()['totals']['sessions'], 110)
+        self.assertEqual(self.client.get('/api/stats/', {'days': 'week'}).status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,60 @@
+import json
+import os
+import subprocess
+import sys
+from unittest.mock import patch
+from django.conf import settings
+from django.test import SimpleTestCase
+
+from chat.services import warm_up
+
+
+# Seconds `import chat.views` may take after django.setup(); it was ~0.9s with openai and faiss imported eagerly
+IMPORT_BUDGET = 0.5
+
+IMPORT_SCRIPT = """
+import json, sys, time
+import django
+django.setup()
+started = time.perf_counter()
+import chat.views
+elapsed = time.perf_counter() - started
+print(json.dumps({'seconds': elapsed, 'modules': [m for m in ('openai', 'faiss', 'numpy') if m in sys.modules]}))
+"""
+
+
+class ImportBudgetTestCase(SimpleTestCase):
+    """Importing the views must not pay for the OpenAI client or the FAISS index."""
+    
+    def test_import_chat_views_within_budget(self):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE='ai_chatbot_leads.settings', OPENAI_API_KEY='')
+        # Point FAISS_PATH somewhere harmless so a regression can't write an index into the repo
+        env['FAISS_PATH'] = os.path.join(settings.BASE_DIR, '.import-budget-check', 'faiss_index')
+        output = subprocess.run(
+            [sys.executable, '-c', IMPORT_SCRIPT],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, check=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        
+        self.assertEqual(result['modules'], [])
+        self.assertLess(result['seconds'], IMPORT_BUDGET)
+
+
+class WarmUpTestCase(SimpleTestCase):
+    """Test cases for the post-fork warmup hook."""
+    
+    def test_builds_singletons(self):
+        with patch('chat.services.llm_client.get_llm_client') as get_llm_client, \
+             patch('chat.services.retriever.get_retriever') as get_retriever:
+            warm_up()
+        
+        get_llm_client.assert_called_once_with()
+        get_retriever.assert_called_once_with()
+    
+    def test_failure_does_not_raise(self):
+        with patch('chat.services.llm_client.get_llm_client'), \
+             patch('chat.services.retriever.get_retriever', side_effect=OSError("disk full")), \
+             self.assertLogs('chat.services', 'WARNING') as logs:
+            warm_up()
+        
+        self.assertIn('retriever failed: disk full', logs.output[0])
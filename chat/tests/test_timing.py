@@ -0,0 +1,93 @@
+import json
+from unittest.mock import patch
+from django.db import connection
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from chat.services.llm_client import LLMClient
+from chat.services.llm_stub import StubOpenAI
+from chat.services.timing import current_timer, request_timer, span
+
+
+class TimingSpanTestCase(TestCase):
+    """Test cases for request timers and spans."""
+    
+    def test_span_without_timer_is_a_no_op(self):
+        with span('anything'):
+            pass
+        self.assertIsNone(current_timer())
+    
+    def test_spans_with_the_same_name_add_up(self):
+        with request_timer() as timer:
+            for _ in range(3):
+                with span('openai'):
+                    pass
+            with span('persist'):
+                pass
+        
+        spans = timer.as_dict()['spans']
+        self.assertEqual(list(spans), ['openai', 'persist'])
+        self.assertEqual(spans['openai']['count'], 3)
+        self.assertIsNone(current_timer())
+    
+    def test_header_format(self):
+        with request_timer() as timer:
+            timer.add('openai', 0.8125)
+            timer.add('db', 0.001)
+            timer.add('db', 0.002)
+        
+        header = timer.header()
+        self.assertTrue(header.startswith('openai;dur=812.5, db;dur=3.0;desc="2x", total;dur='))
+    
+    def test_db_wrapper_times_queries(self):
+        with request_timer() as timer, connection.execute_wrapper(timer.db_wrapper):
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        
+        self.assertEqual(timer.as_dict()['spans']['db']['count'], 1)
+
+
+class ServerTimingMiddlewareTestCase(TestCase):
+    """Test cases for the Server-Timing header on API responses."""
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.llm = LLMClient()
+        self.llm.client, self.llm._initialized = StubOpenAI(), True
+        patcher = patch('chat.views.get_llm_client', return_value=self.llm)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def _header(self, response):
+        return {entry.split(';')[0]: entry for entry in response['Server-Timing'].split(', ')}
+    
+    def test_chat_turn_breakdown(self):
+        response = self.client.post('/api/chat/', {'message': 'Do you build OCR pipelines?'}, format='json')
+        
+        self.assertEqual(response.status_code, 200)
+        entries = self._header(response)
+        for name in ('session', 'reply', 'quick', 'cache', 'openai', 'persist', 'db', 'total'):
+            self.assertIn(name, entries)
+    
+    def test_quick_response_skips_openai(self):
+        response = self.client.post('/api/chat/', {'message': 'hi'}, format='json')
+        
+        entries = self._header(response)
+        self.assertIn('quick', entries)
+        self.assertNotIn('openai', entries)
+    
+    @override_settings(SERVER_TIMING_LOG=True)
+    def test_structured_log_line(self):
+        with self.assertLogs('chat.timing', level='INFO') as logs:
+            self.client.get('/api/ping/')
+        
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(line['path'], '/api/ping/')
+        self.assertEqual(line['status'], 200)
+        self.assertIn('total_ms', line)
+    
+    @override_settings(SERVER_TIMING_ENABLED=False)
+    def test_disabled(self):
+        response = self.client.get('/api/ping/')
+        
+        self.assertNotIn('Server-Timing', response)
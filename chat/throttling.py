@@ -0,0 +1,74 @@
+from django.conf import settings
+from rest_framework.throttling import BaseThrottle
+
+from .services.metrics import metrics
+from .services.rate_limiter import rate_limiter
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """DRF throttle backed by the shared token-bucket limiter."""
+    scope = 'default'
+    kind = None
+    
+    def get_ident_key(self, request, view):
+        """Return the client identity this throttle limits, or None to skip."""
+        raise NotImplementedError
+    
+    def allow_request(self, request, view):
+        if not settings.RATE_LIMIT_ENABLED:
+            return True
+        
+        ident = self.get_ident_key(request, view)
+        if ident is None:
+            return True
+        
+        rate = settings.RATE_LIMITS[self.scope][self.kind]
+        self.result = rate_limiter.consume(
+            f"ratelimit:{self.scope}:{self.kind}:{ident}",
+            rate['capacity'],
+            rate['refill_rate']
+        )
+        
+        # Keep the tightest bucket for the X-RateLimit-* response headers
+        current = getattr(request._request, 'rate_limit', None)
+        if current is None or self.result['remaining'] < current['remaining']:
+            request._request.rate_limit = self.result
+        
+        if not self.result['allowed']:
+            metrics.increment('rate_limit.rejected', scope=self.scope, kind=self.kind)
+        return self.result['allowed']
+    
+    def wait(self):
+        return self.result['retry_after']
+
+
+class IPThrottle(TokenBucketThrottle):
+    """Limit requests per client IP."""
+    kind = 'ip'
+    
+    def get_ident_key(self, request, view):
+        return self.get_ident(request)
+
+
+class SessionThrottle(TokenBucketThrottle):
+    """Limit requests per chat session."""
+    kind = 'session'
+    
+    def get_ident_key(self, request, view):
+        session_id = view.kwargs.get('session_id')
+        if session_id is None and request.method == 'POST':
+            try:
+                session_id = request.data.get('session_id')
+            except AttributeError:
+                session_id = None
+        return str(session_id) if session_id else None
+
+
+class LLMIPThrottle(IPThrottle):
+    """Per-IP limit for endpoints that call the LLM."""
+    scope = 'llm'
+
+
+class LLMSessionThrottle(SessionThrottle):
+    """Per-session limit for endpoints that call the LLM."""
+    scope = 'llm'
@@ -6,8 +6,16 @@ urlpatterns = [
     path('test/', views.test_endpoint, name='test_endpoint'),
     path('health/', views.health_check, name='health_check'),
     path('chat/', views.chat, name='chat'),
+    path('chat/batch/', views.chat_batch, name='chat_batch'),
     path('session/<uuid:session_id>/history/', views.session_history, name='session_history'),
+    path('session/<uuid:session_id>/lead/', views.session_lead_status, name='session_lead_status'),
     path('leads/', views.leads_list, name='leads_list'),
+    path('metrics/', views.metrics_view, name='metrics'),
+    path('stats/', views.stats_view, name='stats'),
+    path('export/leads/', views.export_leads, name='export_leads'),
+    path('debug/profile/', views.debug_profile, name='debug_profile'),
+    path('debug/memory/', views.debug_memory, name='debug_memory'),
+    path('export/transcripts/', views.export_transcripts, name='export_transcripts'),
     path('', views.frontend_view, name='frontend'),
 ]
 
@@ -1,21 +1,43 @@
+import hashlib
+import hmac
 import uuid
+from django.conf import settings
+from django.db.models import OuterRef, Subquery
 from django.shortcuts import get_object_or_404
 from rest_framework import status
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, throttle_classes
 from rest_framework.response import Response
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 import json
 
-from .models import Session, Message, Lead
+from .models import Session, Message, Lead, LeadJob
 from .serializers import (
-    ChatRequestSerializer, ChatResponseSerializer, 
-    SessionHistorySerializer, LeadSerializer
+    ChatRequestSerializer, ChatResponseSerializer, ChatBatchRequestSerializer,
+    SessionSerializer, MessageSerializer, LeadSerializer
 )
-from .services.llm_client import llm_client
-from .services.retriever import retriever
+from .filters import filter_leads
+from .pagination import InvalidPage, LeadCursorPagination, message_page, parse_page_size
+from .services.deadline import Deadline, db_deadline
+from .services.llm_client import FALLBACK_REPLY, get_llm_client
+from .services.retriever import get_retriever
 from .services.lead_qualifier import lead_qualifier
+from .services.lead_queue import lead_queue
+from .services.conversation import conversation_store
+from .services.page_cache import page_cache
+from .services.exporter import exporter, EXPORT_FORMATS, LEAD_EXPORT_FIELDS, TRANSCRIPT_EXPORT_FIELDS
+from .services.metrics import metrics
+from .services.rollups import rollups
+from .services.timing import span
+from .services.batch import batch_chat
+from .services import profiler
+from .throttling import LLMIPThrottle, LLMSessionThrottle
+
+
+LEAD_LIST_FIELDS = ('id', 'name', 'email', 'interest_score', 'source_session', 'created_at', 'notes')
 
 
 @api_view(['GET', 'HEAD'])
@@ -79,7 +101,48 @@ def health_check(request):
     return Response({"status": "ok", "message": "AI Chatbot is running"})
 
 
+@api_view(['GET'])
+def metrics_view(request):
+    """
+    Expose in-process service metrics (model routing, latencies).
+    
+    GET /api/metrics/ with Authorization: Bearer <METRICS_TOKEN>
+    Returns: {"counters": {...}, "timings": {...}}
+    """
+    if not _bearer_ok(request, settings.METRICS_TOKEN):
+        return Response({'error': 'Metrics need a valid METRICS_TOKEN bearer token'}, status=status.HTTP_403_FORBIDDEN)
+    return Response(metrics.snapshot())
+
+
+@api_view(['GET', 'HEAD'])
+def stats_view(request):
+    """
+    Daily conversation and lead analytics, read from the precomputed rollups.
+    
+    GET /api/stats/?days=30
+    Returns: {"from": date, "to": date, "days": [{"day", "sessions", "messages", "leads",
+              "lead_sessions", "lead_rate"}], "totals": {...}, "top_canned_replies": [{"text", "count"}],
+              "as_of": {"message": time, "lead": time}}
+    
+    Figures are as fresh as the last refresh_rollups run (see as_of).
+    
+    HEAD /api/stats/
+    Returns: Empty response with headers
+    """
+    if request.method == 'HEAD':
+        return Response(status=status.HTTP_200_OK)
+    
+    value = request.query_params.get('days') or settings.STATS_DEFAULT_DAYS
+    try:
+        days = int(value)
+    except ValueError:
+        return Response({'error': f"Invalid days: {value}"}, status=status.HTTP_400_BAD_REQUEST)
+    days = max(1, min(days, settings.STATS_MAX_DAYS))
+    return Response(rollups.stats(days))
+
+
 @api_view(['POST', 'HEAD'])
+@throttle_classes([LLMIPThrottle, LLMSessionThrottle])
 @csrf_exempt
 def chat(request):
     """
@@ -87,7 +150,8 @@ def chat(request):
     
     POST /api/chat/
     Body: {"session_id": "uuid", "message": "user message"}
-    Returns: {"reply": "AI response", "session_id": "uuid", "lead_qualified": bool}
+    Returns: {"reply": "AI response", "session_id": "uuid",
+              "lead_qualified": bool, "lead_status": "none|pending|qualified|skipped"}
     
     HEAD /api/chat/
     Returns: Empty response with headers
@@ -102,104 +166,241 @@ def chat(request):
     session_id = serializer.validated_data.get('session_id')
     message_text = serializer.validated_data['message']
     
-    # Get or create session
-    if session_id:
-        try:
-            session = Session.objects.get(id=session_id)
-        except Session.DoesNotExist:
-            session = Session.objects.create()
-    else:
-        session = Session.objects.create()
+    # Every stage below takes its timeout from this budget
+    deadline = Deadline(settings.CHAT_REQUEST_SLO)
     
-    # Save user message
-    user_message = Message.objects.create(
-        session=session,
-        text=message_text,
-        sender='user'
-    )
+    # Nothing is written until the reply is ready; the whole turn then commits at once
+    with span('session'):
+        session_ref = conversation_store.resolve_session(session_id)
     
-    # Skip retrieval for faster responses
+    # Retrieval is optional; only run it when enabled and the budget allows
     context = None
+    if settings.CHAT_RETRIEVAL_ENABLED:
+        if deadline.allows(settings.CHAT_MIN_RETRIEVAL_BUDGET):
+            with span('retrieval'):
+                context = get_retriever().get_context(message_text, top_k=3)
+        else:
+            deadline.skip('retrieval')
     
     # Generate AI response
     try:
-        reply = llm_client.generate_reply(message_text, str(session.id), context)
+        with span('reply'):
+            reply = get_llm_client().generate_reply(message_text, str(session_ref.id), context, deadline=deadline)
     except Exception as e:
-        reply = f"I apologize, but I'm experiencing technical difficulties. Please try again later."
+        reply = FALLBACK_REPLY
     
-    # Save AI response
-    ai_message = Message.objects.create(
-        session=session,
-        text=reply,
-        sender='assistant'
-    )
-    
-    # Simple lead qualification (only for messages with contact info)
+    # Lead qualification (only for messages with contact info or buying intent)
     lead_data = None
     lead_qualified = False
-    
-    # Only check for leads if message contains email or phone
-    if '@' in message_text or any(word in message_text.lower() for word in ['email', 'contact', 'hire', 'project', 'budget']):
-        try:
-            lead_data = lead_qualifier.qualify_lead(message_text)
-            if lead_qualifier.should_save_lead(lead_data):
-                # Save lead
-                lead = Lead.objects.create(
-                    name=lead_data.get('name'),
-                    email=lead_data.get('email'),
-                    interest_score=lead_data.get('interest_score', 0.0),
-                    source_session=session,
-                    notes=f"Qualified from message: {message_text[:200]}"
-                )
-                lead_qualified = True
-        except Exception as e:
-            # Skip lead qualification on error to maintain speed
-            pass
+    lead_status = 'none'
+    wants_qualification = lead_qualifier.should_qualify(message_text)
+    queue_qualification = wants_qualification and settings.LEAD_QUALIFICATION_MODE == 'queue'
+    
+    # Session upsert, both messages and any queued lead job in one transaction
+    with span('persist'), db_deadline(deadline, floor=settings.CHAT_DB_WRITE_TIMEOUT):
+        session, user_message, ai_message = conversation_store.persist_turn(
+            session_ref, message_text, reply
+        )
+        if queue_qualification:
+            # Qualify in the background; the client polls /api/session/<id>/lead/
+            lead_queue.enqueue(session, message_text)
+            lead_status = 'pending'
+    
+    if wants_qualification and not queue_qualification:
+        if not deadline.allows(settings.CHAT_MIN_QUALIFY_BUDGET):
+            # Qualification is optional work: skip it rather than blow the SLO
+            deadline.skip('qualification')
+            lead_status = 'skipped'
+        else:
+            try:
+                with span('qualify'):
+                    lead_data = lead_qualifier.qualify_lead(message_text, deadline=deadline, session=session)
+                if lead_qualifier.should_save_lead(lead_data):
+                    with span('lead_save'), db_deadline(deadline, floor=settings.CHAT_DB_WRITE_TIMEOUT):
+                        lead_qualifier.save_lead(session, lead_data, message_text)
+                    lead_qualified = True
+                    lead_status = 'qualified'
+            except Exception as e:
+                # Skip lead qualification on error to maintain speed
+                pass
+    
+    metrics.observe('chat.request_duration', deadline.elapsed())
     
     # Prepare response
     response_data = {
         'reply': reply,
         'session_id': session.id,
         'lead_qualified': lead_qualified,
+        'lead_status': lead_status,
         'lead_data': lead_data if lead_qualified else None
     }
     
     return Response(response_data, status=status.HTTP_200_OK)
 
 
+@api_view(['POST'])
+@csrf_exempt
+def chat_batch(request):
+    """
+    Run many chat turns in one request.
+    
+    POST /api/chat/batch/
+    Headers: Authorization: Bearer <CHAT_BATCH_TOKEN>
+    Body: {"items": [{"session_id": "uuid", "message": "..."}, ...],
+           "concurrency": 4}
+    Returns: {"results": [{"index": 0, "status": "ok", "reply": "...", "session_id": "uuid",
+                           "lead_status": "none|pending"}
+                          or {"index": 1, "status": "invalid", "errors": {...}}
+                          or {"index": 2, "status": "skipped|error", "error": "...", "session_id": "uuid"}, ...],
+              "succeeded": int, "failed": int}
+    
+    Items of the same session run in the order given; different sessions run
+    concurrently. Pick a new UUID as session_id to start a conversation that
+    later items continue. Each session's turns are written once its replies are in;
+    items not started within CHAT_BATCH_DEADLINE are skipped, and items whose
+    session could not be saved are returned as errors; both can be resent.
+    """
+    if not _bearer_ok(request, settings.CHAT_BATCH_TOKEN):
+        return Response({'error': 'Batch chat needs a valid CHAT_BATCH_TOKEN bearer token'}, status=status.HTTP_403_FORBIDDEN)
+    
+    serializer = ChatBatchRequestSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    items, results = [], {}
+    for index, raw in enumerate(serializer.validated_data['items']):
+        item = ChatRequestSerializer(data=raw)
+        if item.is_valid():
+            items.append(dict(item.validated_data, index=index))
+        else:
+            results[index] = {'index': index, 'status': 'invalid', 'errors': item.errors}
+    
+    concurrency = min(
+        serializer.validated_data.get('concurrency', settings.CHAT_BATCH_CONCURRENCY),
+        settings.CHAT_BATCH_MAX_CONCURRENCY
+    )
+    if items:
+        for result in batch_chat.run(items, concurrency):
+            results[result['index']] = result
+    
+    ordered = [results[index] for index in sorted(results)]
+    succeeded = sum(1 for result in ordered if result['status'] == 'ok')
+    return Response({'results': ordered, 'succeeded': succeeded, 'failed': len(ordered) - succeeded})
+
+
 @api_view(['GET', 'HEAD'])
 def session_history(request, session_id):
     """
     Get chat history for a session.
     
-    GET /api/session/{session_id}/history/
-    Returns: Session with messages
+    GET /api/session/{session_id}/history/?before=<cursor>&after=<cursor>&limit=50
+    Returns: Session with one page of messages, oldest first, plus cursors:
+             "before" loads older messages (null when there are none) and
+             "after" loads newer ones. Without a cursor the newest page is returned.
+    
+    Responses carry an ETag and Last-Modified derived from the newest message;
+    polls that send them back get 304 Not Modified while nothing has changed.
     
     HEAD /api/session/{session_id}/history/
     Returns: Empty response with headers
     """
+    # One query: the session plus its newest message, which is all the validators need
+    latest = Message.objects.filter(session=OuterRef('pk')).order_by('-timestamp', '-id')
     try:
-        session = Session.objects.get(id=session_id)
+        session = Session.objects.annotate(
+            last_message_id=Subquery(latest.values('id')[:1]),
+            newest_message_at=Subquery(latest.values('timestamp')[:1]),
+        ).get(id=session_id)
     except Session.DoesNotExist:
         return Response(
             {'error': 'Session not found'}, 
             status=status.HTTP_404_NOT_FOUND
         )
     
+    # The body depends on the page requested and the renderer as well as the data
+    version = '|'.join([
+        session.updated_at.isoformat(), str(session.last_message_id),
+        request.META.get('QUERY_STRING', ''), request.accepted_renderer.format,
+    ])
+    etag = f'"{hashlib.sha1(version.encode()).hexdigest()}"'
+    last_modified = max(filter(None, [session.updated_at, session.newest_message_at]))
+    validators = {'ETag': etag, 'Last-Modified': http_date(last_modified.timestamp()), 'Cache-Control': 'no-cache'}
+    
+    not_modified = get_conditional_response(request, etag=etag, last_modified=int(last_modified.timestamp()))
+    if not_modified is not None:
+        for header, value in validators.items():
+            not_modified[header] = value
+        return not_modified
+    
+    if request.method == 'HEAD':
+        return Response(status=status.HTTP_200_OK, headers=validators)
+    
+    try:
+        messages, before, after = message_page(
+            Message.objects.filter(session=session),
+            before=request.query_params.get('before'),
+            after=request.query_params.get('after'),
+            limit=parse_page_size(request.query_params.get('limit'))
+        )
+    except InvalidPage as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    data = SessionSerializer(session).data
+    data['messages'] = MessageSerializer(messages, many=True).data
+    data['before'] = before
+    data['after'] = after
+    return Response(data, headers=validators)
+
+
+@api_view(['GET', 'HEAD'])
+def session_lead_status(request, session_id):
+    """
+    Report the outcome of background lead qualification for a session.
+    
+    GET /api/session/{session_id}/lead/
+    Returns: {"session_id": "uuid", "lead_status": "none|pending|qualified|not_qualified|failed",
+              "lead_qualified": bool, "lead_data": {...}}
+    
+    HEAD /api/session/{session_id}/lead/
+    Returns: Empty response with headers
+    """
     if request.method == 'HEAD':
         return Response(status=status.HTTP_200_OK)
     
-    serializer = SessionHistorySerializer(session)
-    return Response(serializer.data)
+    job = LeadJob.objects.filter(session_id=session_id).select_related('lead').order_by('-created_at').first()
+    
+    if job is None:
+        lead_status = 'none'
+    elif job.status in ('pending', 'running'):
+        lead_status = 'pending'
+    elif job.status == 'failed':
+        lead_status = 'failed'
+    else:
+        lead_status = 'qualified' if job.lead_id else 'not_qualified'
+    
+    lead_data = None
+    if job is not None and job.lead is not None:
+        lead_data = {
+            'name': job.lead.name,
+            'email': job.lead.email,
+            'interest_score': job.lead.interest_score,
+        }
+    
+    return Response({
+        'session_id': session_id,
+        'lead_status': lead_status,
+        'lead_qualified': lead_data is not None,
+        'lead_data': lead_data,
+    })
 
 
 @api_view(['GET', 'HEAD'])
 def leads_list(request):
     """
-    List all qualified leads.
+    List qualified leads, newest first, one cursor page at a time.
     
-    GET /api/leads/
-    Returns: List of leads
+    GET /api/leads/?min_score=0.5&max_score=1&created_after=2024-01-01&created_before=2024-12-31&has_email=true&limit=20
+    Returns: {"next": url, "previous": url, "results": [leads]}
     
     HEAD /api/leads/
     Returns: Empty response with headers
@@ -207,9 +408,149 @@ def leads_list(request):
     if request.method == 'HEAD':
         return Response(status=status.HTTP_200_OK)
     
-    leads = Lead.objects.all()
-    serializer = LeadSerializer(leads, many=True)
-    return Response(serializer.data)
+    # One query per page: only the serialized columns, source_session as its raw id
+    leads = filter_leads(Lead.objects.only(*LEAD_LIST_FIELDS), request.query_params)
+    paginator = LeadCursorPagination()
+    page = paginator.paginate_queryset(leads, request)
+    serializer = LeadSerializer(page, many=True)
+    return paginator.get_paginated_response(serializer.data)
+
+
+def _bearer_ok(request, token) -> bool:
+    """True if the request carries ``Authorization: Bearer <token>`` and a token is configured."""
+    supplied = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+    return bool(token) and hmac.compare_digest(supplied, token)
+
+
+def _export_response(request, rows_for, fields, name):
+    """Shared plumbing for the streaming export endpoints."""
+    if not _bearer_ok(request, settings.EXPORT_TOKEN):
+        return JsonResponse({'error': 'Exports need a valid EXPORT_TOKEN bearer token'}, status=403)
+    
+    fmt = request.GET.get('format', 'ndjson')
+    if fmt not in EXPORT_FORMATS:
+        return JsonResponse({'error': f"format must be one of: {', '.join(EXPORT_FORMATS)}"}, status=400)
+    
+    try:
+        rows = rows_for(request.GET.get('since'))
+    except InvalidPage as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    response = StreamingHttpResponse(exporter.render(rows, fields, fmt), content_type=EXPORT_FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{name}.{fmt}"'
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+@require_http_methods(['GET'])
+def export_leads(request):
+    """
+    Stream all leads as CSV or NDJSON.
+    
+    GET /api/export/leads/?format=csv|ndjson&since=<cursor>
+    Headers: Authorization: Bearer <EXPORT_TOKEN>
+    Returns: One row per lead, oldest change first. Each row carries a "cursor";
+             pass the last one back as ?since= to fetch only leads changed since.
+    """
+    return _export_response(request, exporter.lead_rows, LEAD_EXPORT_FIELDS, 'leads')
+
+
+@require_http_methods(['GET'])
+def export_transcripts(request):
+    """
+    Stream chat messages as CSV or NDJSON.
+    
+    GET /api/export/transcripts/?format=csv|ndjson&since=<cursor>&session=<uuid>
+    Headers: Authorization: Bearer <EXPORT_TOKEN>
+    Returns: One row per message in insertion order, each with a "cursor" for ?since=
+    """
+    session_id = request.GET.get('session')
+    if session_id:
+        try:
+            session_id = uuid.UUID(session_id)
+        except ValueError:
+            return JsonResponse({'error': 'session must be a UUID'}, status=400)
+    
+    return _export_response(
+        request,
+        lambda since: exporter.transcript_rows(since, session_id=session_id),
+        TRANSCRIPT_EXPORT_FIELDS,
+        'transcripts'
+    )
+
+
+def _staff_only(request):
+    """403 response unless the request comes from a logged-in staff user (e.g. via /admin/)."""
+    user = getattr(request, 'user', None)
+    if user is None or not (user.is_active and user.is_staff):
+        return JsonResponse({'error': 'Staff login required'}, status=403)
+    return None
+
+
+@require_http_methods(['GET'])
+def debug_profile(request):
+    """
+    Sample this worker's threads and return the stacks in collapsed (flamegraph) format.
+    
+    GET /api/debug/profile/?seconds=5&interval=0.005
+    Returns: text/plain, one "frame;frame;frame count" line per distinct stack,
+             ready for flamegraph.pl or speedscope
+    
+    Only other threads of the worker serving this request are sampled, and the
+    request holds the worker for up to PROFILE_MAX_SECONDS. This needs threaded
+    workers (gunicorn --threads 2 or more) and is useless on the default single
+    sync worker, which would serve nothing else meanwhile; profile those with
+    ``kill -USR2 <pid>``, which samples in a background thread.
+    """
+    denied = _staff_only(request)
+    if denied is not None:
+        return denied
+    
+    try:
+        seconds = float(request.GET.get('seconds', 5))
+        interval = float(request.GET.get('interval', 0.005))
+    except ValueError:
+        return JsonResponse({'error': 'seconds and interval must be numbers'}, status=400)
+    if not 0 < seconds <= settings.PROFILE_MAX_SECONDS or not 0.001 <= interval <= 1:
+        return JsonResponse(
+            {'error': f"seconds must be in (0, {settings.PROFILE_MAX_SECONDS}] and interval in [0.001, 1]"},
+            status=400
+        )
+    
+    sampler = profiler.sample_cpu(seconds, interval)
+    response = HttpResponse(sampler.collapsed(), content_type='text/plain; charset=utf-8')
+    response['X-Profile-Samples'] = str(sampler.samples)
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+@require_http_methods(['GET'])
+def debug_memory(request):
+    """
+    Report where this worker's memory is.
+    
+    GET /api/debug/memory/?limit=25&group_by=lineno|filename|traceback&start=1
+    Returns: {"pid", "rss_bytes", "max_rss_bytes",
+              "holders": {"faiss_index", "documents", "page_cache", "cache:<alias>", ...},
+              "tracemalloc": {"tracing", "traced_bytes", "allocations": [{"site", "bytes", "count"}]}}
+    
+    Allocation sites need tracemalloc; start the worker with PYTHONTRACEMALLOC=1
+    or pass start=1 to begin tracing from now on.
+    """
+    denied = _staff_only(request)
+    if denied is not None:
+        return denied
+    
+    group_by = request.GET.get('group_by', 'lineno')
+    if group_by not in ('lineno', 'filename', 'traceback'):
+        return JsonResponse({'error': 'group_by must be lineno, filename or traceback'}, status=400)
+    try:
+        limit = min(max(int(request.GET.get('limit', 25)), 1), 500)
+    except ValueError:
+        return JsonResponse({'error': 'limit must be an integer'}, status=400)
+    
+    report = profiler.memory_report(limit=limit, group_by=group_by, start=request.GET.get('start') == '1')
+    return JsonResponse(report, headers={'Cache-Control': 'no-store'})
 
 
 @api_view(['GET', 'HEAD'])
@@ -218,23 +559,22 @@ def frontend_view(request):
     Serve the frontend HTML page.
     
     GET /
-    Returns: Frontend HTML
+    Returns: Frontend HTML, gzip/brotli encoded when the client accepts it,
+             or 304 when If-None-Match carries the current ETag
     
     HEAD /
-    Returns: Empty response with headers
+    Returns: Empty response with the same headers
     """
-    from django.shortcuts import render
-    from django.http import HttpResponse
-    
-    if request.method == 'HEAD':
-        # For HEAD requests, render the template to get proper headers
-        template_response = render(request, 'index.html')
-        response = HttpResponse(status=200)
-        # Copy all headers from the template response
-        for header, value in template_response.items():
-            response[header] = value
-        # Set the correct content-length
-        response['Content-Length'] = str(len(template_response.content))
-        return response
-    
-    return render(request, 'index.html')
+    page = page_cache.get('index.html')
+    encoding = page.negotiate(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    body = page.bodies[encoding]
+    
+    response = HttpResponse(b'' if request.method == 'HEAD' else body, content_type=page.content_type)
+    response['Content-Length'] = str(len(body))
+    response['ETag'] = page.etag(encoding)
+    if encoding != 'identity':
+        response['Content-Encoding'] = encoding
+    # Revalidate every time: the page names hashed static files that change on deploy
+    response['Cache-Control'] = 'no-cache'
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return get_conditional_response(request, etag=response['ETag'], response=response)
@@ -112,8 +112,9 @@ async function loadLeads() {
             throw new Error(`HTTP error! status: ${response.status}`);
         }
         
-        const leads = await response.json();
-        displayLeads(leads);
+        // The API returns one cursor page: {next, previous, results}
+        const page = await response.json();
+        displayLeads(page.results);
         
     } catch (error) {
         console.error('Error loading leads:', error);
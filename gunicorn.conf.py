@@ -0,0 +1,16 @@
+# Gunicorn picks this file up automatically from the working directory.
+# Command-line flags (--bind, --workers, ...) still take precedence.
+
+# Import Django and the URLconf once in the master and fork workers from it. Service
+# singletons (OpenAI client, FAISS index) are created lazily, so nothing that must not
+# cross a fork is built at import time.
+preload_app = True
+
+
+def post_worker_init(worker):
+    """Create each worker's service singletons before it accepts requests."""
+    from chat.services import warm_up
+    from chat.services.profiler import install_signal_handler
+    warm_up()
+    # Runs after gunicorn's own signal setup, so `kill -USR2 <worker pid>` profiles the worker
+    install_signal_handler()
@@ -11,11 +11,15 @@ python manage.py migrate
 echo "Seeding FAQs..."
 python manage.py seed_faqs
 
+# Start the lead qualification worker in the background
+echo "Starting lead worker..."
+python manage.py run_lead_worker &
+
 # Start Gunicorn
 echo "Starting Gunicorn..."
 exec gunicorn ai_chatbot_leads.wsgi:application \
     --bind 0.0.0.0:${PORT:-8000} \
-    --timeout 120 \
+    --timeout ${GUNICORN_TIMEOUT:-30} \
     --workers 1 \
     --access-logfile - \
     --error-logfile -
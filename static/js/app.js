@@ -77,6 +77,8 @@ async function sendMessage() {
         if (data.lead_qualified) {
             leadsCount++;
             showLeadNotification(data.lead_data);
+        } else if (data.lead_status === 'pending') {
+            pollLeadStatus(data.session_id);
         }
         
     } catch (error) {
@@ -91,6 +93,28 @@ async function sendMessage() {
     }
 }
 
+async function pollLeadStatus(sessionId, attempt = 0) {
+    // Lead qualification runs in the background; check back a few times
+    if (attempt >= 5) return;
+    
+    setTimeout(async () => {
+        try {
+            const response = await fetch(`/api/session/${sessionId}/lead/`);
+            if (!response.ok) return;
+            
+            const data = await response.json();
+            if (data.lead_status === 'pending') {
+                pollLeadStatus(sessionId, attempt + 1);
+            } else if (data.lead_qualified) {
+                leadsCount++;
+                showLeadNotification(data.lead_data);
+            }
+        } catch (error) {
+            console.error('Error polling lead status:', error);
+        }
+    }, 1000 * (attempt + 1));
+}
+
 function addMessage(text, sender) {
     const messageDiv = document.createElement('div');
     messageDiv.className = `message ${sender}`;